@@ -26,20 +26,14 @@ except ImportError:
     from mcp.types import Tool, TextContent  # type: ignore
 
 # Import our tools
-from tools.portfolio_tools import query_portfolio, get_projects, get_skills, search_experience
-from tools.interview_tools import ask_interview_question, get_interview_questions
-from tools.rag_tools import semantic_search
-
-# Global portfolio data
-PORTFOLIO_DATA = None
+from tools.dispatch import dispatch_tool
+from tools.portfolio_store import PORTFOLIO_STORE
+from tools.http_client import close_http_session
 
 def load_portfolio():
-    """Load portfolio data from profile.json"""
-    global PORTFOLIO_DATA
+    """Load portfolio data from profile.json into the shared snapshot store"""
     try:
-        profile_path = Path(__file__).parent.parent / "data" / "profile.json"
-        with open(profile_path, 'r', encoding='utf-8') as f:
-            PORTFOLIO_DATA = json.load(f)
+        PORTFOLIO_STORE.load()
         return True
     except Exception as e:
         print(f"Error loading portfolio: {e}")
@@ -56,43 +50,43 @@ except:
 @app.tool()
 async def query_portfolio_tool(query: str) -> str:
     """Query the portfolio for specific information about projects, skills, or experience"""
-    result = await query_portfolio(query, PORTFOLIO_DATA)
+    result = await dispatch_tool("query_portfolio", {"query": query}, PORTFOLIO_STORE.snapshot)
     return json.dumps(result, indent=2)
 
 @app.tool()
 async def get_projects_tool(limit: Optional[int] = None) -> str:
     """Get a list of all projects with details"""
-    result = await get_projects(PORTFOLIO_DATA, limit)
+    result = await dispatch_tool("get_projects", {"limit": limit}, PORTFOLIO_STORE.snapshot)
     return json.dumps(result, indent=2)
 
 @app.tool()
 async def get_skills_tool(category: Optional[str] = None) -> str:
     """Get technical skills and experience areas"""
-    result = await get_skills(PORTFOLIO_DATA, category)
+    result = await dispatch_tool("get_skills", {"category": category}, PORTFOLIO_STORE.snapshot)
     return json.dumps(result, indent=2)
 
 @app.tool()
-async def search_experience_tool(keywords: str) -> str:
+async def search_experience_tool(keywords: str, top_k: int = 10) -> str:
     """Search for specific experience using keywords"""
-    result = await search_experience(keywords, PORTFOLIO_DATA)
+    result = await dispatch_tool("search_experience", {"keywords": keywords, "top_k": top_k}, PORTFOLIO_STORE.snapshot)
     return json.dumps(result, indent=2)
 
 @app.tool()
 async def ask_interview_question_tool(question: str) -> str:
     """Get portfolio-based answer to interview questions"""
-    result = await ask_interview_question(question, PORTFOLIO_DATA)
+    result = await dispatch_tool("ask_interview_question", {"question": question}, PORTFOLIO_STORE.snapshot)
     return json.dumps(result, indent=2)
 
 @app.tool()
 async def get_interview_questions_tool(category: Optional[str] = None) -> str:
     """Get common interview questions by category"""
-    result = await get_interview_questions(category)
+    result = await dispatch_tool("get_interview_questions", {"category": category}, PORTFOLIO_STORE.snapshot)
     return json.dumps(result, indent=2)
 
 @app.tool()
 async def semantic_search_tool(query: str, top_k: int = 5) -> str:
     """Perform semantic vector search using RAG"""
-    result = await semantic_search(query, top_k)
+    result = await dispatch_tool("semantic_search", {"query": query, "top_k": top_k}, PORTFOLIO_STORE.snapshot)
     return json.dumps(result, indent=2)
 
 # Initialize and run
@@ -103,7 +97,10 @@ async def main():
         return
     
     print("✅ Portfolio Digital Twin MCP Server started")
-    print(f"📊 Loaded {len(PORTFOLIO_DATA.get('star_items', []))} portfolio items")
+    print(f"📊 Loaded {len(PORTFOLIO_STORE.snapshot.index)} portfolio items")
+    
+    # Reload profile.json in the background whenever it changes
+    PORTFOLIO_STORE.start_watching()
     
     # Run the server
     options = InitializationOptions(
@@ -112,7 +109,11 @@ async def main():
     )
     
     # Start MCP server
-    await app.run(options)
+    try:
+        await app.run(options)
+    finally:
+        await PORTFOLIO_STORE.stop_watching()
+        await close_http_session()
 
 if __name__ == "__main__":
     print("🚀 Starting Portfolio Digital Twin MCP Server...")
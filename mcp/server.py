@@ -20,32 +20,15 @@ from typing import Optional, Any, Dict, List
 import uvicorn
 
 # Import our custom tools
-from tools.portfolio_tools import (
-    query_portfolio,
-    get_projects,
-    get_skills,
-    search_experience
-)
-from tools.interview_tools import (
-    ask_interview_question,
-    get_interview_questions
-)
-from tools.rag_tools import (
-    semantic_search,
-    embed_query
-)
-
-# Store portfolio data in memory
-PORTFOLIO_DATA = None
+from tools.dispatch import TOOL_HANDLERS, RESULT_CACHE, dispatch_tool
+from tools.answer_cache import ANSWER_CACHE
+from tools.portfolio_store import PORTFOLIO_STORE
+from tools.http_client import open_http_session, close_http_session
 
 def load_portfolio():
-    """Load portfolio data from profile.json"""
-    global PORTFOLIO_DATA
+    """Load portfolio data from profile.json into the shared snapshot store"""
     try:
-        profile_path = Path(__file__).parent.parent / "data" / "profile.json"
-        with open(profile_path, 'r', encoding='utf-8') as f:
-            PORTFOLIO_DATA = json.load(f)
-        return PORTFOLIO_DATA
+        return PORTFOLIO_STORE.load()
     except Exception as e:
         print(f"Error loading portfolio: {e}")
         return None
@@ -53,12 +36,18 @@ def load_portfolio():
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    global PORTFOLIO_DATA
     try:
         print("🚀 Starting Portfolio Digital Twin MCP Server on http://127.0.0.1:3000")
-        load_portfolio()
+        snapshot = load_portfolio()
+        # Reload profile.json in the background whenever it changes
+        PORTFOLIO_STORE.start_watching()
+        # Keep-alive connection pool shared by the RAG tools
+        await open_http_session()
         print("✅ Portfolio Digital Twin MCP Server started")
-        print(f"📊 Loaded {len(PORTFOLIO_DATA.get('star_items', []))} portfolio items")
+        if snapshot is not None:
+            print(f"📊 Loaded {len(snapshot.index)} portfolio items")
+        else:
+            print("⚠️  Portfolio data not loaded; retrying when profile.json changes")
     except Exception as e:
         print(f"❌ Error during startup: {e}")
         import traceback
@@ -67,6 +56,8 @@ async def lifespan(app: FastAPI):
     yield
     
     # Shutdown
+    await PORTFOLIO_STORE.stop_watching()
+    await close_http_session()
     print("🛑 Shutting down Portfolio Digital Twin MCP Server")
 
 # Initialize FastAPI app with lifespan
@@ -140,7 +131,8 @@ async def list_tools():
                 "input_schema": {
                     "type": "object",
                     "properties": {
-                        "keywords": {"type": "string", "description": "Keywords to search"}
+                        "keywords": {"type": "string", "description": "Keywords to search"},
+                        "top_k": {"type": "number", "description": "Maximum number of ranked results"}
                     },
                     "required": ["keywords"]
                 }
@@ -181,43 +173,32 @@ async def list_tools():
         ]
     }
 
+@app.get("/cache_stats")
+async def cache_stats():
+    """Tool result and prepared-answer cache counters"""
+    return {**RESULT_CACHE.stats(), "answer_cache": ANSWER_CACHE.stats()}
+
 @app.post("/call_tool", response_model=ToolResponse)
 async def call_tool(request: ToolRequest):
     """Execute a tool"""
-    if PORTFOLIO_DATA is None:
-        load_portfolio()
+    # One snapshot per request: a concurrent reload never changes data mid-call
+    snapshot = PORTFOLIO_STORE.snapshot
+    if snapshot is None:
+        # Startup load failed: retry off the event loop rather than blocking it
+        await PORTFOLIO_STORE.refresh()
+        snapshot = PORTFOLIO_STORE.snapshot
+    if snapshot is None:
+        return ToolResponse(success=False, error="Portfolio data not loaded")
     
     try:
         args = request.arguments or {}
         
-        # Route to appropriate tool
-        if request.name == "query_portfolio":
-            result = await query_portfolio(args.get("query", ""), PORTFOLIO_DATA)
-        
-        elif request.name == "get_projects":
-            result = await get_projects(PORTFOLIO_DATA, args.get("limit"))
-        
-        elif request.name == "get_skills":
-            result = await get_skills(PORTFOLIO_DATA, args.get("category"))
-        
-        elif request.name == "search_experience":
-            result = await search_experience(args.get("keywords", ""), PORTFOLIO_DATA)
-        
-        elif request.name == "ask_interview_question":
-            result = await ask_interview_question(args.get("question", ""), PORTFOLIO_DATA)
-        
-        elif request.name == "get_interview_questions":
-            result = await get_interview_questions(args.get("category"))
-        
-        elif request.name == "semantic_search":
-            result = await semantic_search(
-                args.get("query", ""),
-                args.get("top_k", 5)
-            )
-        
-        else:
+        # Route to appropriate tool (pure tools are served from the shared result cache)
+        if request.name not in TOOL_HANDLERS:
             raise HTTPException(status_code=404, detail=f"Unknown tool: {request.name}")
         
+        result = await dispatch_tool(request.name, args, snapshot)
+        
         return ToolResponse(success=True, result=result)
     
     except Exception as e:
@@ -12,20 +12,14 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 
 # Import our tools
-from tools.portfolio_tools import query_portfolio, get_projects, get_skills, search_experience
-from tools.interview_tools import ask_interview_question, get_interview_questions
-from tools.rag_tools import semantic_search
-
-# Global portfolio data
-PORTFOLIO_DATA = None
+from tools.dispatch import TOOL_HANDLERS, dispatch_tool
+from tools.portfolio_store import PORTFOLIO_STORE
+from tools.http_client import close_http_session
 
 def load_portfolio():
-    """Load portfolio data from profile.json"""
-    global PORTFOLIO_DATA
+    """Load portfolio data from profile.json into the shared snapshot store"""
     try:
-        profile_path = Path(__file__).parent.parent / "data" / "profile.json"
-        with open(profile_path, 'r', encoding='utf-8') as f:
-            PORTFOLIO_DATA = json.load(f)
+        PORTFOLIO_STORE.load()
         return True
     except Exception as e:
         print(f"Error loading portfolio: {e}", file=sys.stderr)
@@ -97,28 +91,17 @@ def send_tools_list(id):
 async def call_tool(id, name, arguments):
     """Call a specific tool"""
     try:
-        if not PORTFOLIO_DATA:
+        snapshot = PORTFOLIO_STORE.snapshot
+        if not snapshot:
             send_response(id, error="Portfolio data not loaded")
             return
             
-        if name == "query_portfolio":
-            result = await query_portfolio(arguments.get("query", ""), PORTFOLIO_DATA)
-        elif name == "get_projects":
-            result = await get_projects(PORTFOLIO_DATA, arguments.get("limit"))
-        elif name == "get_skills":
-            result = await get_skills(PORTFOLIO_DATA, arguments.get("category"))
-        elif name == "ask_interview_question":
-            result = await ask_interview_question(arguments.get("question", ""), PORTFOLIO_DATA)
-        elif name == "search_experience":
-            result = await search_experience(arguments.get("keywords", ""), PORTFOLIO_DATA)
-        elif name == "get_interview_questions":
-            result = await get_interview_questions(arguments.get("category"))
-        elif name == "semantic_search":
-            result = await semantic_search(arguments.get("query", ""), arguments.get("top_k", 5))
-        else:
+        if name not in TOOL_HANDLERS:
             send_response(id, error=f"Unknown tool: {name}")
             return
         
+        result = await dispatch_tool(name, arguments, snapshot)
+        
         send_response(id, {
             "content": [
                 {
@@ -168,12 +151,16 @@ async def main():
     if not load_portfolio():
         sys.exit(1)
     
-    print(f"✅ Loaded {len(PORTFOLIO_DATA.get('star_items', []))} portfolio items", file=sys.stderr)
+    print(f"✅ Loaded {len(PORTFOLIO_STORE.snapshot.index)} portfolio items", file=sys.stderr)
     
-    # Process stdin
+    # Reload profile.json in the background whenever it changes
+    PORTFOLIO_STORE.start_watching()
+    loop = asyncio.get_running_loop()
+    
+    # Process stdin (read in a worker thread so the watcher keeps running)
     while True:
         try:
-            line = sys.stdin.readline()
+            line = await loop.run_in_executor(None, sys.stdin.readline)
             if not line:
                 break
                 
@@ -186,6 +173,9 @@ async def main():
             break
         except Exception as e:
             print(f"Error: {e}", file=sys.stderr)
+    
+    await PORTFOLIO_STORE.stop_watching()
+    await close_http_session()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
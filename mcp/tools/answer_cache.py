@@ -0,0 +1,320 @@
+"""
+Semantic cache over the prepared answers in data/interview_qa.jsonl
+Each distinct stored question is embedded once into a normalized float32
+matrix; an incoming question is answered from the log when its cosine
+similarity to a stored question clears the threshold. New log records are
+embedded by a background sync, never on the request path.
+"""
+import os
+import sys
+import time
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    # numpy is optional; without it the cache stays disabled
+    np = None
+
+from .qa_store import DEFAULT_QA_PATH, QAStore, get_qa_store, key_hash, normalize_question, to_epoch
+from .rag_tools import embed_query
+
+# Q&A records read from the log per sync step
+SYNC_BATCH = 256
+# Concurrent embedding requests while indexing new questions
+EMBED_CONCURRENCY = 8
+# Minimum seconds between background syncs
+SYNC_INTERVAL = 1.0
+# Per-request limit for embeddings made by the background sync
+SYNC_EMBED_TIMEOUT = 10.0
+# After a failed embedding, the service is left alone for this long, doubling per failure
+EMBED_BACKOFF = 1.0
+EMBED_BACKOFF_MAX = 300.0
+
+
+class SemanticAnswerCache:
+    """
+    Prepared answers keyed by question embedding
+
+    The newest answer per (normalized) question wins. Answers go stale when
+    they are older than max_age_seconds, or when they were generated from a
+    different profile: records carry the profile's content hash (written by
+    the training scripts) and only those matching the current snapshot are
+    served, across restarts too. Records from before the hash was logged are
+    trusted only if written after the profile file last changed.
+    """
+
+    def __init__(self, store: QAStore, threshold: float = 0.92, max_age_seconds: float = 0,
+                 max_entries: int = 2048, use_local: bool = True, lookup_timeout: float = 1.0):
+        self.store = store
+        self.threshold = threshold
+        self.max_age_seconds = max_age_seconds
+        self.max_entries = max_entries
+        self.use_local = use_local
+        self.lookup_timeout = lookup_timeout
+        self._entries: Dict[bytes, dict] = {}  # question hash -> record + "vector"
+        self._unembedded: Dict[bytes, dict] = {}  # read from the log, not embedded yet
+        self._matrix = None
+        self._keys: List[bytes] = []
+        self._dirty = False
+        self._synced = 0  # records of the log already seen
+        self._generation: Optional[int] = None  # index generation _synced refers to
+        self._sync_task: Optional[asyncio.Task] = None
+        self._next_sync = 0.0
+        self._embed_failures_in_row = 0
+        self._embed_retry_at = 0.0
+        self._profile_hash: Optional[str] = None
+        self._profile_modified_at = 0.0
+        self._profile_version = 0
+        self._resync = False  # re-read the whole log: the profile changed
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.embed_failures = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return np is not None and self.threshold <= 1.0
+
+    def observe_profile(self, profile_hash: str, version: int = 0, modified_at: float = 0.0):
+        """
+        Serve only answers generated from this profile (content hash; modified_at
+        is the profile file's mtime). Answers logged for another profile are
+        skipped until it comes back, so the next sync re-reads the whole log.
+        """
+        if version < self._profile_version:
+            return
+        if profile_hash != self._profile_hash:
+            if self._profile_hash is not None:
+                self.invalidations += 1
+            self._profile_hash = profile_hash
+            self._profile_modified_at = modified_at
+            self._resync = True
+        self._profile_version = version
+
+    def _drop(self, predicate):
+        stale = [key for key, entry in self._entries.items() if predicate(key, entry)]
+        for key in stale:
+            del self._entries[key]
+        if stale:
+            self.evictions += len(stale)
+            self._dirty = True
+
+    def _is_fresh(self, entry: dict) -> bool:
+        answered_at = entry["answered_at"]
+        if self._profile_hash is not None:
+            if entry["profile_hash"]:
+                if entry["profile_hash"] != self._profile_hash:
+                    return False
+            elif answered_at < self._profile_modified_at:
+                return False
+        return not self.max_age_seconds or time.time() - answered_at <= self.max_age_seconds
+
+    def _read_new(self, synced: int, generation: Optional[int]) -> Tuple[Dict[bytes, dict], int, int, bool]:
+        """
+        Records appended after the first `synced` ones, newest answer per question
+        (blocking; run off the event loop). Memory follows the number of distinct
+        questions, not the size of the log. Returns (answers, records now seen,
+        index generation, whether the log was truncated or replaced and read
+        again from the start). Only the caller updates the cache's state.
+        """
+        self.store.refresh()
+        reset = self.store.generation != generation or self.store.count < synced
+        if reset:
+            synced = 0
+        latest: Dict[bytes, dict] = {}
+        while synced < self.store.count:
+            _, page = self.store.query(offset=synced, limit=SYNC_BATCH)
+            if not page:
+                break
+            synced += len(page)
+            for record in page:
+                question, answer = record.get("question"), record.get("response")
+                if not question or not answer:
+                    continue
+                entry = {
+                    "question": question,
+                    "answer": answer,
+                    "session": record.get("session", ""),
+                    "timestamp": record.get("timestamp", ""),
+                    "answered_at": to_epoch(record.get("timestamp")) or 0.0,
+                    "profile_hash": record.get("profile_hash", "")
+                }
+                if self._is_fresh(entry):
+                    latest[key_hash(normalize_question(question))] = entry
+        return latest, synced, self.store.generation, reset
+
+    async def _embed(self, text: str, timeout: float) -> Optional[List[float]]:
+        """
+        One embedding within timeout, or None. A failure backs off further calls
+        for a growing interval, so a down service costs nothing per request.
+        """
+        if time.monotonic() < self._embed_retry_at:
+            return None
+        try:
+            vector = await asyncio.wait_for(embed_query(text, self.use_local), timeout)
+        except Exception:
+            vector = None
+        if vector:
+            self._embed_failures_in_row = 0
+            return vector
+        self.embed_failures += 1
+        self._embed_failures_in_row += 1
+        backoff = min(EMBED_BACKOFF * 2 ** (self._embed_failures_in_row - 1), EMBED_BACKOFF_MAX)
+        self._embed_retry_at = time.monotonic() + backoff
+        return None
+
+    async def _embed_all(self, questions: List[str]) -> List[Optional[List[float]]]:
+        semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
+
+        async def embed(question: str):
+            async with semaphore:
+                return await self._embed(question, SYNC_EMBED_TIMEOUT)
+
+        return await asyncio.gather(*(embed(q) for q in questions))
+
+    async def sync(self):
+        """Pick up new answers from the log, embedding each new question once"""
+        async with self._lock:
+            resync, profile_hash = self._resync, self._profile_hash
+            found, synced, generation, reset = await asyncio.to_thread(
+                self._read_new, 0 if resync else self._synced, self._generation)
+            # State changes only from here on, so a cancelled sync loses nothing
+            if resync and profile_hash == self._profile_hash:
+                self._resync = False
+            previous = self._entries
+            if reset or resync:
+                # The log was replaced or the profile changed: start over, but keep
+                # vectors of questions seen before
+                self._entries = {}
+                self._unembedded = {}
+                self._dirty = True
+            self._synced, self._generation = synced, generation
+            self._unembedded.update(found)
+
+            # Questions already embedded only swap in the newer answer
+            pending = []
+            for key, entry in list(self._unembedded.items()):
+                known = previous.get(key)
+                if known is not None:
+                    entry["vector"] = known["vector"]
+                    self._entries[key] = entry
+                    del self._unembedded[key]
+                else:
+                    pending.append((key, entry))
+
+            # Entries stay in _unembedded until embedded; failures are retried by a
+            # later sync, once the embedding backoff has passed
+            vectors = await self._embed_all([entry["question"] for _, entry in pending])
+            for (key, entry), vector in zip(pending, vectors):
+                if not vector or self._unembedded.get(key) is not entry:
+                    continue
+                entry["vector"] = vector
+                self._entries[key] = entry
+                del self._unembedded[key]
+                self._dirty = True
+
+            self._drop(lambda key, entry: not self._is_fresh(entry))
+            self._unembedded = {key: entry for key, entry in self._unembedded.items()
+                                if self._is_fresh(entry)}
+            if len(self._entries) > self.max_entries:
+                # Oldest answers go first
+                newest = sorted(self._entries, key=lambda k: self._entries[k]["answered_at"])[-self.max_entries:]
+                keep = set(newest)
+                self._drop(lambda key, entry: key not in keep)
+            if self._dirty:
+                self._rebuild()
+
+    async def _background_sync(self):
+        try:
+            await self.sync()
+        except Exception as e:
+            print(f"Answer cache sync failed: {e}", file=sys.stderr)
+
+    def schedule_sync(self):
+        """Start a background sync unless one is running or one ran just now"""
+        now = time.monotonic()
+        if (self._sync_task is None or self._sync_task.done()) and now >= self._next_sync:
+            self._next_sync = now + SYNC_INTERVAL
+            self._sync_task = asyncio.create_task(self._background_sync())
+
+    def _rebuild(self):
+        self._keys = list(self._entries)
+        if self._keys:
+            matrix = np.asarray([self._entries[k]["vector"] for k in self._keys], dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self._matrix = matrix / norms
+        else:
+            self._matrix = None
+        self._dirty = False
+
+    async def lookup(self, question: str) -> Optional[Dict[str, Any]]:
+        """
+        The best stored answer for a near-duplicate question, or None. Spends at
+        most lookup_timeout embedding the question; answers logged since the last
+        background sync become visible once it finishes.
+        """
+        if not self.enabled or not question.strip():
+            return None
+        self.schedule_sync()
+        if self._matrix is None:
+            self.misses += 1
+            return None
+
+        vector = await self._embed(question, self.lookup_timeout)
+        # Read after the await: the background sync may have rebuilt the matrix meanwhile
+        matrix, keys = self._matrix, self._keys
+        if not vector or matrix is None or len(vector) != matrix.shape[1]:
+            self.misses += 1
+            return None
+        q = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(q))
+        if norm:
+            q = q / norm
+        scores = matrix @ q
+        best = int(np.argmax(scores))
+        similarity = float(scores[best])
+        entry = self._entries.get(keys[best])
+        if entry is None or similarity < self.threshold or not self._is_fresh(entry):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return {
+            "question": entry["question"],
+            "answer": entry["answer"],
+            "similarity": round(similarity, 4),
+            "session": entry["session"],
+            "timestamp": entry["timestamp"]
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "pending_embeddings": len(self._unembedded),
+            "threshold": self.threshold,
+            "max_age_seconds": self.max_age_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "embed_failures": self.embed_failures,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+
+# ANSWER_CACHE_THRESHOLD above 1 turns the cache off
+ANSWER_CACHE = SemanticAnswerCache(
+    get_qa_store(DEFAULT_QA_PATH),
+    threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92")),
+    max_age_seconds=float(os.getenv("ANSWER_CACHE_MAX_AGE_DAYS", "30")) * 86400,
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2048")),
+    lookup_timeout=float(os.getenv("ANSWER_CACHE_LOOKUP_TIMEOUT", "1.0")),
+    use_local=os.getenv("USE_LOCAL_EMBEDDINGS", "false").lower() == "true"
+)
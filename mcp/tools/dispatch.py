@@ -0,0 +1,68 @@
+"""
+Shared tool dispatcher for the MCP servers
+Routes tool calls by name and serves pure tools from the result cache
+"""
+import os
+from typing import Any, Awaitable, Callable, Dict
+
+from .portfolio_tools import query_portfolio, get_projects, get_skills, search_experience
+from .interview_tools import ask_interview_question, get_interview_questions
+from .rag_tools import semantic_search
+from .portfolio_store import PortfolioSnapshot
+from .search_index import PortfolioIndex
+from .result_cache import ToolResultCache
+from .answer_cache import ANSWER_CACHE
+
+# name -> handler(arguments, index of the request's snapshot)
+TOOL_HANDLERS: Dict[str, Callable[[dict, PortfolioIndex], Awaitable[Any]]] = {
+    "query_portfolio": lambda args, index: query_portfolio(args.get("query", ""), index),
+    "get_projects": lambda args, index: get_projects(index, args.get("limit")),
+    "get_skills": lambda args, index: get_skills(index, args.get("category")),
+    "search_experience": lambda args, index: search_experience(
+        args.get("keywords", ""), index, args.get("top_k", 10)
+    ),
+    "ask_interview_question": lambda args, index: ask_interview_question(args.get("question", ""), index),
+    "get_interview_questions": lambda args, index: get_interview_questions(args.get("category")),
+    "semantic_search": lambda args, index: semantic_search(args.get("query", ""), args.get("top_k", 5)),
+}
+
+# Tools whose result depends only on the profile and their arguments
+# (ask_interview_question also reads the prepared answer log, so it is not one)
+CACHEABLE_TOOLS = frozenset({
+    "query_portfolio",
+    "get_projects",
+    "get_skills",
+    "search_experience",
+    "get_interview_questions",
+})
+
+RESULT_CACHE = ToolResultCache(
+    max_entries=int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "256")),
+    max_bytes=int(os.getenv("TOOL_CACHE_MAX_BYTES", str(8 * 1024 * 1024))),
+    ttl_seconds=float(os.getenv("TOOL_CACHE_TTL_SECONDS", "300")),
+)
+
+
+async def dispatch_tool(name: str, arguments: dict, snapshot: PortfolioSnapshot) -> Any:
+    """
+    Execute a tool by name against one portfolio snapshot
+    Raises ValueError for unknown tools
+    """
+    handler = TOOL_HANDLERS.get(name)
+    if handler is None:
+        raise ValueError(f"Unknown tool: {name}")
+
+    arguments = arguments or {}
+    RESULT_CACHE.observe_profile(snapshot.content_hash, snapshot.version)
+    ANSWER_CACHE.observe_profile(snapshot.content_hash, snapshot.version, snapshot.stat_key[0] / 1e9)
+    if name not in CACHEABLE_TOOLS:
+        return await handler(arguments, snapshot.index)
+
+    key = RESULT_CACHE.make_key(name, arguments, snapshot.content_hash)
+    hit, result = RESULT_CACHE.get(key)
+    if hit:
+        return result
+
+    result = await handler(arguments, snapshot.index)
+    RESULT_CACHE.put(key, result)
+    return result
@@ -0,0 +1,260 @@
+"""
+Query-embedding cache shared by the MCP tools and the chat/training scripts
+Keyed on (model name, normalized text) with an in-memory LRU tier in front of
+an append-only, memory-mapped float32 file per model
+"""
+import os
+import sys
+import mmap
+import asyncio
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .file_lock import file_lock
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent.parent / "data" / ".embedding_cache"
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different spellings share an entry"""
+    return " ".join(text.split())
+
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha1(f"{model}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache for one model
+
+    Disk layout in cache_dir, per model:
+      <model>.f32   rows of little-endian float32, one vector per row
+      <model>.keys  "<sha1> <row>" lines; the first line is "dim <n>"
+      <model>.lock  held while appending, so concurrent writers get distinct rows
+    Vectors are appended before their key line, so a crash can only leave an
+    orphan row, never a key pointing at missing data. Keys written by other
+    processes are picked up on the next miss.
+
+    Async callers use aget/aput, which serve the memory tier inline and run
+    the disk tier in a worker thread so the event loop never waits on it.
+    """
+
+    def __init__(self, model: str, cache_dir: Optional[Path] = DEFAULT_CACHE_DIR, max_memory_entries: int = 1024):
+        self.model = model
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._rows: Dict[str, int] = {}
+        self._dim: Optional[int] = None
+        self._keys_offset = 0
+        self._mmap: Optional[mmap.mmap] = None
+        self._lock = threading.Lock()  # memory tier and counters; never held across I/O
+        self._disk_lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._vectors_path: Optional[Path] = None
+        self._keys_path: Optional[Path] = None
+        if cache_dir is not None:
+            slug = "".join(c if c.isalnum() or c in "-_." else "_" for c in model)
+            try:
+                Path(cache_dir).mkdir(parents=True, exist_ok=True)
+                self._vectors_path = Path(cache_dir) / f"{slug}.f32"
+                self._keys_path = Path(cache_dir) / f"{slug}.keys"
+                self._lock_path = Path(cache_dir) / f"{slug}.lock"
+                self._load_keys()
+            except OSError as e:
+                print(f"Embedding cache disk tier disabled: {e}", file=sys.stderr)
+                self._vectors_path = self._keys_path = None
+
+    # -- disk tier -----------------------------------------------------------
+
+    def _load_keys(self):
+        """Read key lines appended since the last call"""
+        if self._keys_path is None or not self._keys_path.exists():
+            return
+        with open(self._keys_path, "r", encoding="utf-8") as f:
+            f.seek(self._keys_offset)
+            for line in iter(f.readline, ""):
+                if not line.endswith("\n"):
+                    break  # partially written line; retry on the next refresh
+                self._keys_offset = f.tell()
+                parts = line.split()
+                if len(parts) != 2:
+                    continue
+                if parts[0] == "dim":
+                    self._dim = int(parts[1])
+                else:
+                    self._rows[parts[0]] = int(parts[1])
+
+    def _read_row(self, row: int) -> Optional[List[float]]:
+        row_bytes = self._dim * 4
+        end = (row + 1) * row_bytes
+        if self._mmap is None or len(self._mmap) < end:
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            if os.path.getsize(self._vectors_path) < end:
+                return None
+            with open(self._vectors_path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        values = array("f")
+        values.frombytes(self._mmap[row * row_bytes:end])
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values.tolist()
+
+    def _append(self, key: str, vector: Sequence[float]):
+        with file_lock(self._lock_path):
+            # Another process may have set the dimension or stored this key meanwhile
+            self._load_keys()
+            if key in self._rows:
+                return
+            if self._dim is None:
+                self._dim = len(vector)
+                with open(self._keys_path, "a", encoding="utf-8") as f:
+                    f.write(f"dim {self._dim}\n")
+            if len(vector) != self._dim:
+                return
+            row_bytes = self._dim * 4
+            values = array("f", vector)
+            if sys.byteorder == "big":
+                values.byteswap()
+            with open(self._vectors_path, "ab") as f:
+                # Writers hold the lock, so a partial trailing row is from a crashed one
+                size = f.seek(0, os.SEEK_END)
+                if size % row_bytes:
+                    f.truncate(size - size % row_bytes)
+                    size -= size % row_bytes
+                row = size // row_bytes
+                f.write(values.tobytes())
+            with open(self._keys_path, "a", encoding="utf-8") as f:
+                f.write(f"{key} {row}\n")
+            self._keys_offset = self._keys_path.stat().st_size
+            self._rows[key] = row
+
+    def _get_disk(self, key: str) -> Optional[List[float]]:
+        """Disk-tier lookup (blocking: file reads, mmap, key reload)"""
+        vector = None
+        if self._vectors_path is not None:
+            with self._disk_lock:
+                if key not in self._rows:
+                    self._load_keys()
+                row = self._rows.get(key)
+                if row is not None and self._dim:
+                    try:
+                        vector = self._read_row(row)
+                    except (OSError, ValueError):
+                        vector = None
+        with self._lock:
+            if vector is None:
+                self.misses += 1
+                return None
+            self._remember(key, vector)
+            self.disk_hits += 1
+        return list(vector)
+
+    def _put_disk(self, key: str, vector: List[float]):
+        """Disk-tier write (blocking: takes the lock file and appends)"""
+        with self._disk_lock:
+            if key in self._rows:
+                return
+            try:
+                self._append(key, vector)
+            except OSError as e:
+                print(f"Embedding cache write failed: {e}", file=sys.stderr)
+
+    # -- public API ----------------------------------------------------------
+
+    def get_memory(self, text: str) -> Optional[List[float]]:
+        """Memory-tier lookup only; never touches the disk, so safe on an event loop"""
+        key = cache_key(self.model, text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is None:
+                return None
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return list(vector)
+
+    def get(self, text: str) -> Optional[List[float]]:
+        """A copy of the cached vector, so callers may mutate it freely"""
+        vector = self.get_memory(text)
+        if vector is not None:
+            return vector
+        return self._get_disk(cache_key(self.model, text))
+
+    async def aget(self, text: str) -> Optional[List[float]]:
+        """get() for async callers: memory hits inline, the disk tier in a worker thread"""
+        vector = self.get_memory(text)
+        if vector is not None or self._vectors_path is None:
+            if vector is None:
+                with self._lock:
+                    self.misses += 1
+            return vector
+        return await asyncio.to_thread(self._get_disk, cache_key(self.model, text))
+
+    def _put_memory(self, text: str, vector: Sequence[float]) -> Tuple[str, List[float]]:
+        key = cache_key(self.model, text)
+        vector = [float(v) for v in vector]
+        with self._lock:
+            self._remember(key, vector)
+        return key, vector
+
+    def put(self, text: str, vector: Sequence[float]):
+        if not vector:
+            return
+        key, vector = self._put_memory(text, vector)
+        if self._vectors_path is not None:
+            self._put_disk(key, vector)
+
+    async def aput(self, text: str, vector: Sequence[float]):
+        """put() for async callers: the disk append runs in a worker thread"""
+        if not vector:
+            return
+        key, vector = self._put_memory(text, vector)
+        if self._vectors_path is not None:
+            await asyncio.to_thread(self._put_disk, key, vector)
+
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "model": self.model,
+            "memory_entries": len(self._memory),
+            "disk_entries": len(self._rows),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+        }
+
+
+_CACHES: Dict[str, EmbeddingCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_embedding_cache(model: str) -> EmbeddingCache:
+    """Process-wide cache for a model, configured from the environment"""
+    with _CACHES_LOCK:
+        cache = _CACHES.get(model)
+        if cache is None:
+            cache_dir = os.getenv("EMBEDDING_CACHE_DIR")
+            disk = os.getenv("EMBEDDING_CACHE_DISK", "true").lower() == "true"
+            cache = EmbeddingCache(
+                model,
+                cache_dir=(Path(cache_dir) if cache_dir else DEFAULT_CACHE_DIR) if disk else None,
+                max_memory_entries=int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "1024"))
+            )
+            _CACHES[model] = cache
+        return cache
@@ -0,0 +1,83 @@
+"""
+Compact wire formats for the local embedding server's /embed endpoint
+
+Binary (Content-Type: application/octet-stream): a 16-byte header followed by
+rows*dim little-endian float32 or float16 values, row-major
+    magic b"EMBV" | version u8 | dtype u8 | reserved u16 | rows u32 | dim u32
+
+Base64 (JSON): {"dtype": "float16", "shape": [rows, dim], "data": "<base64 of the same payload>"}
+"""
+import sys
+import json
+import base64
+import struct
+from array import array
+from typing import List, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    # Decoding falls back to the standard library when numpy is missing
+    np = None
+
+BINARY_MEDIA_TYPE = "application/octet-stream"
+HEADER = struct.Struct("<4sBBHII")
+MAGIC = b"EMBV"
+VERSION = 1
+DTYPE_CODES = {"float32": 1, "float16": 2}
+DTYPE_NAMES = {code: name for name, code in DTYPE_CODES.items()}
+DTYPE_SIZES = {"float32": 4, "float16": 2}
+
+
+def pack_header(dtype: str, rows: int, dim: int) -> bytes:
+    return HEADER.pack(MAGIC, VERSION, DTYPE_CODES[dtype], 0, rows, dim)
+
+
+def _decode_values(payload, dtype: str, rows: int, dim: int) -> List[List[float]]:
+    expected = rows * dim * DTYPE_SIZES[dtype]
+    if len(payload) < expected:
+        raise ValueError(f"Embedding payload truncated: {len(payload)} < {expected} bytes")
+    if np is not None:
+        matrix = np.frombuffer(payload, dtype="<f4" if dtype == "float32" else "<f2", count=rows * dim)
+        return matrix.astype(np.float32).reshape(rows, dim).tolist()
+    if dtype == "float32":
+        values = array("f")
+        values.frombytes(bytes(payload[:expected]))
+        if sys.byteorder == "big":
+            values.byteswap()
+        flat = values.tolist()
+    else:
+        flat = [v for (v,) in struct.iter_unpack("<e", bytes(payload[:expected]))]
+    return [flat[r * dim:(r + 1) * dim] for r in range(rows)]
+
+
+def decode_binary(body: bytes) -> List[List[float]]:
+    """Decode a binary /embed response into a list of vectors"""
+    if len(body) < HEADER.size:
+        raise ValueError("Embedding payload shorter than header")
+    magic, version, dtype_code, _, rows, dim = HEADER.unpack_from(body)
+    if magic != MAGIC or version != VERSION or dtype_code not in DTYPE_NAMES:
+        raise ValueError("Unrecognized embedding payload header")
+    return _decode_values(memoryview(body)[HEADER.size:], DTYPE_NAMES[dtype_code], rows, dim)
+
+
+def decode_base64(obj: dict) -> List[List[float]]:
+    rows, dim = obj["shape"]
+    return _decode_values(base64.b64decode(obj["data"]), obj.get("dtype", "float32"), rows, dim)
+
+
+def decode_embed_response(body: bytes, content_type: Optional[str]) -> List[List[float]]:
+    """
+    Decode any /embed response shape (binary, base64 or plain JSON lists)
+    Older servers that ignore the format request still decode correctly
+    """
+    if content_type and content_type.split(";")[0].strip() == BINARY_MEDIA_TYPE:
+        return decode_binary(body)
+    data = json.loads(body)
+    if "data" in data and "shape" in data:
+        return decode_base64(data)
+    if "embedding" in data:
+        return [data["embedding"]]
+    if "embeddings" in data:
+        return data["embeddings"]
+    raise ValueError("Local embed returned unexpected shape")
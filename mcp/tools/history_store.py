@@ -0,0 +1,365 @@
+"""
+Chat history persistence for the chat/training scripts
+A turn is saved with one batched request (LPUSH + LTRIM + EXPIRE) through
+Upstash's /pipeline (or /multi-exec) endpoint instead of one round trip per command;
+SessionHistoryCache adds a write-behind layer for long-running servers
+"""
+import abc
+import json
+import time
+import asyncio
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import aiohttp
+import requests
+
+from .http_client import get_http_session
+
+Command = List[str]
+
+
+def encode_message(message: Any) -> str:
+    return message if isinstance(message, str) else json.dumps(message)
+
+
+def parse_history(raw: Optional[Sequence[str]]) -> List[dict]:
+    """LRANGE output is newest-first; return it chronological"""
+    history = []
+    for s in list(raw or [])[::-1]:
+        try:
+            history.append(json.loads(s))
+        except Exception:
+            # Plain strings are treated as user content
+            history.append({'role': 'user', 'content': str(s)})
+    return history
+
+
+def turn_commands(key: str, messages: Sequence[Any], max_len: Optional[int], ttl: Optional[int]) -> List[Command]:
+    """Commands that persist one or more messages (pushed in order, so the last is newest)"""
+    commands = [['LPUSH', key, *[encode_message(m) for m in messages]]]
+    if max_len:
+        commands.append(['LTRIM', key, '0', str(max_len - 1)])
+    if ttl:
+        commands.append(['EXPIRE', key, str(ttl)])
+    return commands
+
+
+class HistoryStore(abc.ABC):
+    """
+    Subclasses implement pipeline()/apipeline(): run a list of commands in one
+    round trip and return one result per command
+    """
+
+    @abc.abstractmethod
+    def pipeline(self, commands: List[Command]) -> List[Any]:
+        """Run commands in one round trip (blocking)"""
+
+    @abc.abstractmethod
+    async def apipeline(self, commands: List[Command]) -> List[Any]:
+        """Run commands in one round trip on the event loop"""
+
+    def load(self, key: str, limit: int) -> List[dict]:
+        return parse_history(self.pipeline([['LRANGE', key, '0', str(limit - 1)]])[0])
+
+    def load_with(self, key: str, limit: int, extra: List[Command]) -> Tuple[List[dict], List[Any]]:
+        """Load history plus the results of extra commands, in the same round trip"""
+        results = self.pipeline([['LRANGE', key, '0', str(limit - 1)], *extra])
+        return parse_history(results[0]), results[1:]
+
+    def append(self, key: str, messages: Sequence[Any], max_len: Optional[int] = None, ttl: Optional[int] = None,
+               extra: Optional[List[Command]] = None):
+        self.pipeline(turn_commands(key, messages, max_len, ttl) + list(extra or []))
+
+    async def aload(self, key: str, limit: int) -> List[dict]:
+        return parse_history((await self.apipeline([['LRANGE', key, '0', str(limit - 1)]]))[0])
+
+    async def aappend(self, key: str, messages: Sequence[Any], max_len: Optional[int] = None, ttl: Optional[int] = None,
+                      extra: Optional[List[Command]] = None):
+        await self.apipeline(turn_commands(key, messages, max_len, ttl) + list(extra or []))
+
+
+class UpstashHistoryStore(HistoryStore):
+    """Upstash Redis REST; transaction=True uses /multi-exec so a turn is applied atomically"""
+
+    def __init__(self, rest_url: str, token: str, transaction: bool = False, timeout: float = 20):
+        self.url = rest_url.rstrip('/') + ('/multi-exec' if transaction else '/pipeline')
+        self.headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+        self.timeout = timeout
+
+    @staticmethod
+    def _results(body: Any) -> List[Any]:
+        if not isinstance(body, list):
+            raise RuntimeError(f'Upstash pipeline returned unexpected body: {body}')
+        results = []
+        for entry in body:
+            if isinstance(entry, dict) and entry.get('error'):
+                raise RuntimeError(f"Upstash command error: {entry['error']}")
+            results.append(entry.get('result') if isinstance(entry, dict) else entry)
+        return results
+
+    def pipeline(self, commands: List[Command]) -> List[Any]:
+        r = requests.post(self.url, json=commands, headers=self.headers, timeout=self.timeout)
+        if r.status_code >= 400:
+            raise RuntimeError(f'Upstash pipeline error {r.status_code}: {r.text}')
+        return self._results(r.json())
+
+    async def apipeline(self, commands: List[Command]) -> List[Any]:
+        session = await get_http_session()
+        async with session.post(self.url, json=commands, headers=self.headers,
+                                timeout=aiohttp.ClientTimeout(total=self.timeout)) as r:
+            if r.status >= 400:
+                raise RuntimeError(f'Upstash pipeline error {r.status}: {await r.text()}')
+            return self._results(await r.json(content_type=None))
+
+
+class InMemoryHistoryStore(HistoryStore):
+    """
+    In-process stand-in for tests, implementing the same command subset
+    (LPUSH, LRANGE, LTRIM, EXPIRE, GET, SET, DEL). Expired keys are only
+    dropped when touched again, so it is not meant for serving traffic.
+    """
+
+    def __init__(self):
+        self.lists: Dict[str, List[str]] = defaultdict(list)
+        self.strings: Dict[str, str] = {}
+        self.expires: Dict[str, float] = {}
+        self.round_trips = 0
+
+    def _expire_stale(self, key: str):
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.lists.pop(key, None)
+            self.strings.pop(key, None)
+            self.expires.pop(key, None)
+
+    @staticmethod
+    def _slice(values: List[str], start: int, stop: int) -> List[str]:
+        n = len(values)
+        start = max(start + n if start < 0 else start, 0)
+        stop = stop + n if stop < 0 else stop
+        return values[start:stop + 1]
+
+    def _execute(self, command: Command) -> Any:
+        name, key, *args = command
+        name = name.upper()
+        self._expire_stale(key)
+        # Reads of missing keys must not create them
+        values = self.lists.get(key, [])
+        if name == 'LPUSH':
+            values = self.lists[key]
+            values[:0] = list(reversed(args))
+            return len(values)
+        if name == 'LRANGE':
+            return self._slice(values, int(args[0]), int(args[1]))
+        if name == 'LTRIM':
+            trimmed = self._slice(values, int(args[0]), int(args[1]))
+            if trimmed:
+                self.lists[key] = trimmed
+            else:
+                self.lists.pop(key, None)
+            return 'OK'
+        if name == 'EXPIRE':
+            if not values and key not in self.strings:
+                return 0
+            self.expires[key] = time.monotonic() + int(args[0])
+            return 1
+        if name == 'GET':
+            return self.strings.get(key)
+        if name == 'SET':
+            self.strings[key] = args[0]
+            self.expires.pop(key, None)
+            if len(args) >= 3 and args[1].upper() == 'EX':
+                self.expires[key] = time.monotonic() + int(args[2])
+            return 'OK'
+        if name == 'DEL':
+            existed = bool(self.lists.pop(key, None)) | (self.strings.pop(key, None) is not None)
+            self.expires.pop(key, None)
+            return int(existed)
+        raise ValueError(f'Unsupported command: {name}')
+
+    def pipeline(self, commands: List[Command]) -> List[Any]:
+        self.round_trips += 1
+        return [self._execute(command) for command in commands]
+
+    async def apipeline(self, commands: List[Command]) -> List[Any]:
+        return self.pipeline(commands)
+
+
+def create_history_store(rest_url: Optional[str], token: Optional[str],
+                         transaction: bool = False) -> Optional[HistoryStore]:
+    """Upstash when configured; None (no history is kept) otherwise"""
+    if rest_url and token:
+        return UpstashHistoryStore(rest_url, token, transaction=transaction)
+    return None
+
+
+class _Session:
+    __slots__ = ('history', 'pending', 'last_used')
+
+    def __init__(self, history: List[dict]):
+        self.history = history
+        self.pending: List[dict] = []
+        self.last_used = time.monotonic()
+
+
+class SessionHistoryCache:
+    """
+    Write-behind cache of recent history per session key
+
+    Loads hit Redis only the first time a session is seen; appended turns are
+    served from memory immediately and written back later, coalesced into one
+    pipeline request per flush across all dirty sessions. Flushes happen every
+    flush_interval seconds, or as soon as flush_max_pending messages are waiting.
+    Idle and least-recently-used sessions are evicted (after their pending
+    messages are handed to the next flush), bounding memory.
+
+    The cache assumes this process is the only writer for the keys it serves.
+    """
+
+    def __init__(self, store: HistoryStore, max_history: int, ttl: Optional[int] = None,
+                 max_sessions: int = 1000, idle_seconds: float = 900,
+                 flush_interval: float = 2.0, flush_max_pending: int = 64):
+        self.store = store
+        self.max_history = max_history
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.flush_interval = flush_interval
+        self.flush_max_pending = flush_max_pending
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._evicted: List[tuple] = []  # (key, messages) still to be written
+        self._writing: set = set()  # keys in the flush request currently in flight
+        self._pending_count = 0
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
+        self.flush_errors = 0
+
+    async def load(self, key: str) -> List[dict]:
+        session = self._sessions.get(key)
+        if session is None:
+            self.misses += 1
+            if key in self._writing or any(k == key for k, _ in self._evicted):
+                # Evicted with messages not yet in Redis: write them before reading
+                await self.flush()
+            history = await self.store.aload(key, self.max_history)
+            # Another request may have filled the slot while we awaited
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = _Session(history)
+                self._adopt_evicted(key, session)
+                self._evict()
+        else:
+            self.hits += 1
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(key)
+        return list(session.history)
+
+    async def append(self, key: str, messages: Sequence[dict]):
+        if key not in self._sessions:
+            await self.load(key)
+        session = self._sessions[key]
+        session.history.extend(messages)
+        del session.history[:-self.max_history]
+        session.pending.extend(messages)
+        session.last_used = time.monotonic()
+        self._pending_count += len(messages)
+        if self._pending_count >= self.flush_max_pending:
+            self._wakeup.set()
+
+    def _adopt_evicted(self, key: str, session: _Session):
+        """Take back messages of an evicted session whose flush failed, so none go missing"""
+        kept = []
+        for k, messages in self._evicted:
+            if k == key:
+                session.history.extend(messages)
+                session.pending.extend(messages)
+            else:
+                kept.append((k, messages))
+        if len(kept) != len(self._evicted):
+            del session.history[:-self.max_history]
+            self._evicted = kept
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._sessions:
+            key, session = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - session.last_used < self.idle_seconds:
+                break
+            del self._sessions[key]
+            if session.pending:
+                self._evicted.append((key, session.pending))
+
+    async def flush(self):
+        """Write every pending message in one pipeline request"""
+        async with self._flush_lock:
+            self._evict()
+            batches = self._evicted
+            self._evicted = []
+            for key, session in self._sessions.items():
+                if session.pending:
+                    batches.append((key, session.pending))
+                    session.pending = []
+            self._pending_count = 0
+            if not batches:
+                return
+            commands = []
+            for key, messages in batches:
+                commands.extend(turn_commands(key, messages, self.max_history, self.ttl))
+            self._writing = {key for key, _ in batches}
+            try:
+                await self.store.apipeline(commands)
+                self.flushes += 1
+            except Exception as e:
+                # Keep the messages for the next attempt, ahead of newer ones
+                self.flush_errors += 1
+                print(f"Warning: history flush failed, will retry: {e}")
+                for key, messages in batches:
+                    session = self._sessions.get(key)
+                    if session is not None:
+                        session.pending[:0] = messages
+                    else:
+                        self._evicted.append((key, messages))
+                    self._pending_count += len(messages)
+            finally:
+                self._writing = set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background flusher and write out everything still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "sessions": len(self._sessions),
+            "pending_messages": self._pending_count,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors
+        }
@@ -0,0 +1,45 @@
+"""
+Shared async HTTP client for outbound calls (embeddings, Upstash Vector)
+One keep-alive connection pool per process, opened in the server lifespan
+"""
+import os
+from typing import Optional
+
+import aiohttp
+
+_SESSION: Optional[aiohttp.ClientSession] = None
+
+
+def _timeout_from_env() -> aiohttp.ClientTimeout:
+    return aiohttp.ClientTimeout(
+        total=float(os.getenv("HTTP_TIMEOUT_SECONDS", "10")),
+        connect=float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+    )
+
+
+async def open_http_session() -> aiohttp.ClientSession:
+    """Create the shared session (idempotent); call from the server's startup"""
+    global _SESSION
+    if _SESSION is None or _SESSION.closed:
+        connector = aiohttp.TCPConnector(
+            limit=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+            limit_per_host=int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "10")),
+            keepalive_timeout=float(os.getenv("HTTP_KEEPALIVE_SECONDS", "30"))
+        )
+        _SESSION = aiohttp.ClientSession(connector=connector, timeout=_timeout_from_env())
+    return _SESSION
+
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """Return the shared session, opening it lazily for callers without a lifespan"""
+    if _SESSION is None or _SESSION.closed:
+        return await open_http_session()
+    return _SESSION
+
+
+async def close_http_session():
+    """Close the pool; call from the server's shutdown"""
+    global _SESSION
+    if _SESSION is not None and not _SESSION.closed:
+        await _SESSION.close()
+    _SESSION = None
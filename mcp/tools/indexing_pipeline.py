@@ -0,0 +1,896 @@
+"""
+Streaming indexing pipeline shared by the indexer scripts
+documents -> chunker -> embedder -> sinks, built from generators so only the
+batches in flight are held in memory. Each sink keeps a manifest of chunk id ->
+content hash, so a run only embeds what some sink is missing and deletes what
+disappeared from the source.
+"""
+import os
+import re
+import abc
+import json
+import time
+import queue
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import requests
+
+from .prompt_budget import estimate_tokens
+from .vector_store import LocalVectorStore
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+STAR_SECTIONS = ("situation", "task", "action", "result")
+
+# OpenAI embeddings limits per request (inputs) and per input (tokens)
+OPENAI_MAX_INPUTS = 2048
+OPENAI_MAX_TOKENS_PER_INPUT = 8191
+
+
+def sha_id(*parts) -> str:
+    h = hashlib.sha1()
+    for p in parts:
+        h.update(str(p).encode("utf-8"))
+    return h.hexdigest()
+
+
+def rate(count: int, seconds: float) -> str:
+    return f"{count / seconds:.1f} chunks/s" if seconds > 0 else "n/a"
+
+
+# -- documents and chunkers ----------------------------------------------------
+
+@dataclass
+class Document:
+    """One source item; sections are (name, text) pairs in display order"""
+    id: str
+    title: str
+    sections: List[Tuple[str, str]]
+
+
+@dataclass
+class Chunk:
+    """
+    text is what gets embedded; metadata is what the sinks store alongside
+    the vector and always carries source_id, title, section, chunk_index and content
+    """
+    id: str
+    text: str
+    metadata: dict = field(default_factory=dict)
+
+
+Chunker = Callable[[Document], Iterable[Chunk]]
+
+
+def profile_documents(profile: dict) -> Iterator[Document]:
+    """STAR items from profile.json"""
+    for item in profile.get("star_items") or []:
+        title = item.get("title", "")
+        sections = []
+        for sec in STAR_SECTIONS:
+            content = item.get(sec) or item.get(sec.capitalize())
+            if content:
+                sections.append((sec, content))
+        yield Document(id=item.get("id") or sha_id(title[:24]), title=title, sections=sections)
+
+
+def chunk_id(source_id: str, section: str, index: int) -> str:
+    # The first chunk of a section keeps the plain id, so unsplit sections have stable ids
+    return f"{source_id}-{section}" if index == 0 else f"{source_id}-{section}-{index}"
+
+
+def make_chunk(doc: Document, section: str, index: int, content: str, text: str) -> Chunk:
+    return Chunk(
+        id=chunk_id(doc.id, section, index),
+        text=text,
+        metadata={
+            "source_id": doc.id,
+            "title": doc.title,
+            "section": section.capitalize(),
+            "chunk_index": index,
+            "content": content,
+        }
+    )
+
+
+TokenCounter = Callable[[str], int]
+
+# A sentence may end at . ! or ? (plus closing quotes/brackets) followed by
+# whitespace; line breaks always end one
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])[\"')\]]*\s+|\s*\n\s*")
+# Words whose trailing period does not end a sentence
+ABBREVIATIONS = frozenset({
+    "mr.", "mrs.", "ms.", "dr.", "prof.", "sr.", "jr.", "st.", "vs.", "approx.",
+    "e.g.", "i.e.", "cf.", "fig.", "inc.", "ltd.", "co.", "corp.", "dept.", "jan.", "feb.",
+    "mar.", "apr.", "jun.", "jul.", "aug.", "sep.", "sept.", "oct.", "nov.", "dec.",
+})
+# Initials and dotted acronyms: "J.", "U.S."
+_INITIALS = re.compile(r"(?:[a-z]\.)+")
+
+
+def _ends_sentence(text: str, match: "re.Match") -> bool:
+    """
+    Whether a candidate break is a real sentence end: a period followed by a
+    lowercase letter, or after an abbreviation or initial, is not
+    """
+    if "\n" in match.group(0):
+        return True
+    if text[match.start() - 1] != ".":
+        return True
+    following = text[match.end():match.end() + 1]
+    if following.islower():
+        return False
+    # Abbreviations are short, so a bounded look-back keeps the scan linear
+    word = text[max(match.start() - 24, 0):match.start()].rsplit(None, 1)[-1].lstrip("\"'([").lower()
+    return word not in ABBREVIATIONS and not _INITIALS.fullmatch(word)
+
+
+def split_sentences(text: str) -> Iterator[str]:
+    """Sentences in order, found in one left-to-right scan"""
+    start = 0
+    for match in _SENTENCE_BREAK.finditer(text):
+        if not _ends_sentence(text, match):
+            continue
+        sentence = text[start:match.start() + len(match.group(0).rstrip())].strip()
+        if sentence:
+            yield sentence
+        start = match.end()
+    tail = text[start:].strip()
+    if tail:
+        yield tail
+
+
+def _split_long_sentence(sentence: str, tokens: int, count_tokens: TokenCounter,
+                         max_tokens: int) -> Iterator[Tuple[str, int]]:
+    """Word windows for a sentence that alone exceeds the budget"""
+    words = sentence.split()
+    per_window = max(1, len(words) * max_tokens // max(tokens, 1))
+    i = 0
+    while i < len(words):
+        size = min(per_window, len(words) - i)
+        piece = " ".join(words[i:i + size])
+        piece_tokens = count_tokens(piece)
+        # The per-word estimate can run over; shrink until the window fits
+        while piece_tokens > max_tokens and size > 1:
+            size = max(1, size * max_tokens // piece_tokens)
+            piece = " ".join(words[i:i + size])
+            piece_tokens = count_tokens(piece)
+        yield piece, piece_tokens
+        i += size
+
+
+def token_chunks(text: str, count_tokens: TokenCounter, max_tokens: int, overlap_tokens: int = 0) -> List[str]:
+    """
+    Pack whole sentences into chunks of at most max_tokens tokens, repeating
+    up to overlap_tokens worth of trailing sentences at the start of the next
+    chunk. Every sentence is tokenized once, so the cost is linear in the text.
+    """
+    max_tokens = max(int(max_tokens), 1)
+    overlap_tokens = min(max(int(overlap_tokens), 0), max_tokens // 2)
+
+    chunks: List[str] = []
+    current: "deque[Tuple[str, int]]" = deque()
+    current_tokens = 0
+    fresh = False  # current holds something beyond the carried-over overlap
+
+    def emit():
+        nonlocal current_tokens, fresh
+        chunks.append(" ".join(s for s, _ in current))
+        # Keep the trailing sentences that fit in the overlap budget
+        carried, carried_tokens = deque(), 0
+        for sentence, tokens in reversed(current):
+            if carried_tokens + tokens > overlap_tokens:
+                break
+            carried.appendleft((sentence, tokens))
+            carried_tokens += tokens
+        current.clear()
+        current.extend(carried)
+        current_tokens = carried_tokens
+        fresh = False
+
+    for sentence in split_sentences(text):
+        tokens = count_tokens(sentence)
+        pieces = [(sentence, tokens)] if tokens <= max_tokens else \
+            _split_long_sentence(sentence, tokens, count_tokens, max_tokens)
+        for piece, piece_tokens in pieces:
+            if current and current_tokens + piece_tokens > max_tokens:
+                if fresh:
+                    emit()
+                # Drop overlap that would not leave room for the next piece
+                while current and current_tokens + piece_tokens > max_tokens:
+                    current_tokens -= current.popleft()[1]
+            current.append((piece, piece_tokens))
+            current_tokens += piece_tokens
+            fresh = True
+    if fresh:
+        chunks.append(" ".join(s for s, _ in current))
+    return chunks
+
+
+def section_chunker(count_tokens: Optional[TokenCounter] = None, max_tokens: int = 256,
+                    overlap_tokens: int = 0) -> Chunker:
+    """
+    Chunks per STAR section, embedded with their title and section name.
+    With a token counter, sections longer than max_tokens (header included)
+    are split on sentence boundaries; without one each section is one chunk.
+    """
+    def chunker(doc: Document) -> Iterator[Chunk]:
+        for section, content in doc.sections:
+            header = f"{doc.title} — {section.capitalize()}: "
+            if count_tokens is None:
+                yield make_chunk(doc, section, 0, content, header + content)
+                continue
+            budget = max(max_tokens - count_tokens(header), 16)
+            for i, piece in enumerate(token_chunks(content, count_tokens, budget, overlap_tokens)):
+                yield make_chunk(doc, section, i, piece, header + piece)
+    return chunker
+
+
+def item_chunker(count_tokens: TokenCounter, max_tokens: int = 256, overlap_tokens: int = 0) -> Chunker:
+    """The whole item (title plus every section) as one text, split on sentence boundaries"""
+    def chunker(doc: Document) -> Iterator[Chunk]:
+        parts = ([doc.title] if doc.title else []) + [content for _, content in doc.sections]
+        full_text = "\n".join(parts)
+        for i, piece in enumerate(token_chunks(full_text, count_tokens, max_tokens, overlap_tokens)):
+            yield make_chunk(doc, "item", i, piece, piece)
+    return chunker
+
+
+def chunk_documents(documents: Iterable[Document], chunker: Chunker) -> Iterator[Chunk]:
+    for doc in documents:
+        yield from chunker(doc)
+
+
+# -- embedders -----------------------------------------------------------------
+
+class Embedder(abc.ABC):
+    """
+    name identifies the model in manifests; load() is only called when
+    something needs embedding, so an up-to-date run never loads a model.
+    count_tokens() measures text the way the model will see it and
+    max_input_tokens is the longest input the model embeds without truncating.
+    """
+    name = "embedder"
+    max_input_tokens = 512
+    # Texts per embed() call with the default batches()
+    batch_size = 64
+
+    def count_tokens(self, text: str) -> int:
+        return estimate_tokens(text)
+
+    def load(self):
+        pass
+
+    def batches(self, chunks: Iterable[Chunk]) -> Iterator[List[Chunk]]:
+        batch = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @abc.abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """One vector per text, in order"""
+
+
+class SentenceTransformerEmbedder(Embedder):
+    # Reserved for [CLS]/[SEP] (or <s>/</s>) around every input
+    SPECIAL_TOKENS = 2
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", batch_size: int = 64, max_seq_length: int = 256):
+        self.name = model_name
+        self.batch_size = batch_size
+        # all-MiniLM-L6-v2 truncates at 256 word pieces; updated from the model once loaded
+        self.max_seq_length = max_seq_length
+        self.model = None
+        self._tokenizer = None
+
+    @property
+    def max_input_tokens(self) -> int:
+        return self.max_seq_length - self.SPECIAL_TOKENS
+
+    def _load_tokenizer(self):
+        """Just the tokenizer (no weights), so chunking does not need the model loaded"""
+        if self.model is not None:
+            return self.model.tokenizer
+        try:
+            from transformers import AutoTokenizer
+            name = self.name if "/" in self.name else f"sentence-transformers/{self.name}"
+            return AutoTokenizer.from_pretrained(name)
+        except Exception as e:
+            print(f"Tokenizer for {self.name} unavailable ({e}); estimating token counts")
+            return False
+
+    def count_tokens(self, text: str) -> int:
+        if self._tokenizer is None:
+            self._tokenizer = self._load_tokenizer()
+        if not self._tokenizer:
+            return estimate_tokens(text)
+        return len(self._tokenizer.encode(text, add_special_tokens=False))
+
+    def load(self):
+        if self.model is not None:
+            return
+        try:
+            from sentence_transformers import SentenceTransformer
+        except Exception:
+            raise RuntimeError("Missing dependency 'sentence-transformers'. Install with: pip install "
+                               "sentence-transformers or enable USE_OPENAI_EMBEDDINGS=true to use OpenAI embeddings")
+        self.model = SentenceTransformer(self.name)
+        if getattr(self.model, "max_seq_length", None):
+            self.max_seq_length = self.model.max_seq_length
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        embeddings = self.model.encode(texts, show_progress_bar=False)
+        return [list(map(float, e)) for e in embeddings]
+
+
+def token_counter(model: str) -> TokenCounter:
+    """Exact counts with tiktoken, else ~3 characters per token (errs on the high side)"""
+    try:
+        import tiktoken
+    except ImportError:
+        return lambda text: len(text) // 3 + 1
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        encoding = tiktoken.get_encoding("cl100k_base")
+    return lambda text: len(encoding.encode(text))
+
+
+class OpenAIEmbedder(Embedder):
+    """
+    Token-budgeted batches: at most max_inputs texts and max_tokens tokens per request.
+    A text longer than the per-input limit is embedded as word windows that fit it,
+    and its vector is their token-weighted mean, so every chunk still gets one vector.
+    """
+    max_input_tokens = OPENAI_MAX_TOKENS_PER_INPUT
+
+    def __init__(self, model: str = "text-embedding-3-small", max_inputs: int = OPENAI_MAX_INPUTS,
+                 max_tokens: int = 250000, attempts: int = 3):
+        self.model = model
+        self.name = f"openai:{model}"
+        self.max_inputs = max_inputs
+        self.max_tokens = max_tokens
+        self.attempts = attempts
+        self.count_tokens = token_counter(model)
+        self.client = None
+
+    def load(self):
+        if self.client is not None:
+            return
+        try:
+            from openai import OpenAI
+        except ImportError:
+            raise RuntimeError("Missing dependency 'openai'. Install with: pip install 'openai>=1.0'")
+        if not os.environ.get("OPENAI_API_KEY"):
+            raise RuntimeError("OPENAI_API_KEY required for OpenAI embeddings")
+        self.client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+
+    def batches(self, chunks: Iterable[Chunk]) -> Iterator[List[Chunk]]:
+        batch, batch_inputs, batch_tokens = [], 0, 0
+        for chunk in chunks:
+            tokens = self.count_tokens(chunk.text)
+            inputs = -(-tokens // OPENAI_MAX_TOKENS_PER_INPUT) or 1
+            if inputs > 1:
+                print(f"Chunk {chunk.id} exceeds {OPENAI_MAX_TOKENS_PER_INPUT} tokens, "
+                      f"embedding it as ~{inputs} windows")
+            if batch and (batch_inputs + inputs > self.max_inputs or batch_tokens + tokens > self.max_tokens):
+                yield batch
+                batch, batch_inputs, batch_tokens = [], 0, 0
+            batch.append(chunk)
+            batch_inputs += inputs
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+    def _windows(self, text: str) -> List[Tuple[str, int]]:
+        tokens = self.count_tokens(text)
+        if tokens <= OPENAI_MAX_TOKENS_PER_INPUT:
+            return [(text, tokens)]
+        return list(_split_long_sentence(text, tokens, self.count_tokens, OPENAI_MAX_TOKENS_PER_INPUT))
+
+    def _create(self, texts: List[str]) -> List[List[float]]:
+        data = self.client.embeddings.create(model=self.model, input=texts).data
+        # Results carry their input position; do not rely on response order
+        return [list(map(float, d.embedding)) for d in sorted(data, key=lambda d: d.index)]
+
+    def _create_with_retries(self, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.attempts):
+            try:
+                return self._create(texts)
+            except Exception as e:
+                print(f"Embedding error (batch of {len(texts)}, attempt {attempt+1}): {e}")
+                if attempt + 1 == self.attempts:
+                    raise
+                time.sleep(1 + attempt * 2)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        windows = [self._windows(text) for text in texts]
+        if all(len(w) == 1 for w in windows):
+            return self._create_with_retries(texts)
+        vectors = iter(self._create_with_retries([piece for w in windows for piece, _ in w]))
+        combined = []
+        for pieces in windows:
+            if len(pieces) == 1:
+                combined.append(next(vectors))
+                continue
+            weighted = [(next(vectors), tokens) for _, tokens in pieces]
+            total = sum(tokens for _, tokens in weighted) or 1
+            mean = [sum(vector[i] * tokens for vector, tokens in weighted) / total
+                    for i in range(len(weighted[0][0]))]
+            # OpenAI vectors are unit length; keep the mean comparable with them
+            norm = sum(v * v for v in mean) ** 0.5 or 1.0
+            combined.append([v / norm for v in mean])
+        return combined
+
+
+def embed_stream(chunks: Iterable[Chunk], embedder: Embedder, concurrency: int = 1
+                 ) -> Iterator[Tuple[List[Chunk], Optional[List[List[float]]]]]:
+    """
+    (batch, vectors) in chunk order; vectors is None when the batch failed
+    With concurrency > 1 up to that many batches are embedded at once
+    """
+    def run(batch):
+        try:
+            return embedder.embed([c.text for c in batch])
+        except Exception as e:
+            print(f"Failed to embed {len(batch)} chunks ({batch[0].id} .. {batch[-1].id}): {e}")
+            return None
+
+    if concurrency <= 1:
+        for batch in embedder.batches(chunks):
+            yield batch, run(batch)
+        return
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        window = deque()
+        for batch in embedder.batches(chunks):
+            window.append((batch, pool.submit(run, batch)))
+            if len(window) >= concurrency:
+                done, future = window.popleft()
+                yield done, future.result()
+        while window:
+            done, future = window.popleft()
+            yield done, future.result()
+
+
+# -- manifests -----------------------------------------------------------------
+
+def chunk_hash(model_name: str, chunk: Chunk) -> str:
+    # Model, embedded text and stored metadata: a change to any of them is re-upserted
+    return sha_id(model_name, "\0", chunk.text, "\0", json.dumps(chunk.metadata, sort_keys=True))
+
+
+def load_manifest(path: Path, model_name: str, target: str) -> Dict[str, str]:
+    """
+    Chunk id -> hash already stored in target; empty if the manifest is
+    missing or for another target. Ids written with another model are kept
+    with an empty hash, so they count as changed (or removed) rather than unknown.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("target") != target:
+        return {}
+    chunks = dict(manifest.get("chunks") or {})
+    if manifest.get("model") != model_name:
+        return {cid: "" for cid in chunks}
+    return chunks
+
+
+def save_manifest(path: Path, model_name: str, target: str, hashes: Dict[str, str]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"model": model_name, "target": target, "chunks": hashes}, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def diff_manifest(current: Dict[str, str], previous: Dict[str, str]) -> Tuple[List[str], List[str], List[str]]:
+    """(added, changed, removed) chunk ids"""
+    added = [cid for cid in current if cid not in previous]
+    changed = [cid for cid in current if cid in previous and previous[cid] != current[cid]]
+    removed = sorted(cid for cid in previous if cid not in current)
+    return added, changed, removed
+
+
+def report_diff(label: str, current: Dict[str, str], added: List[str], changed: List[str],
+                removed: List[str], verbose: bool):
+    unchanged = len(current) - len(added) - len(changed)
+    print(f"{label}: {len(added)} added, {len(changed)} changed, {len(removed)} removed, {unchanged} unchanged")
+    if verbose:
+        for mark, ids in (("+", added), ("~", changed), ("-", removed)):
+            for cid in ids:
+                print(f"  {mark} {cid}")
+
+
+# -- sinks ---------------------------------------------------------------------
+
+class Sink(abc.ABC):
+    """
+    A vector destination with its own manifest
+    plan() decides what this sink needs, write() receives embedded records
+    ({"id", "vector", "metadata"}) for those chunks, finish() completes the
+    writes, deletes removed ids and only then saves the manifest. The
+    manifest only moves to the new hash for chunks actually written in this
+    run; anything planned but not written (failed embedding, stopped run)
+    keeps its old hash and is retried by the next run.
+    """
+    label = "sink"
+
+    def __init__(self, manifest_path: Path, target: str):
+        self.manifest_path = Path(manifest_path)
+        self.target = target
+        self.model = ""
+        self.todo: Set[str] = set()
+        self.done: Set[str] = set()  # ids from todo handed to write() in this run
+        self.removed: List[str] = []
+        self.written = 0
+        self._previous: Dict[str, str] = {}
+
+    def previous(self, model_name: str) -> Dict[str, str]:
+        return load_manifest(self.manifest_path, model_name, self.target)
+
+    def plan(self, hashes: Dict[str, str], model_name: str, full: bool = False, verbose: bool = False) -> Set[str]:
+        self.model = model_name
+        previous = self.previous(model_name)
+        if full:
+            previous = {cid: "" for cid in previous}
+        self._previous = previous
+        added, changed, self.removed = diff_manifest(hashes, previous)
+        report_diff(self.label, hashes, added, changed, self.removed, verbose)
+        self.todo = set(added) | set(changed)
+        return self.todo
+
+    @property
+    def failed(self) -> Optional[str]:
+        return None
+
+    @abc.abstractmethod
+    def write(self, records: List[dict]):
+        """Store embedded records (may be asynchronous until complete())"""
+
+    @abc.abstractmethod
+    def delete(self, ids: List[str]):
+        """Remove vectors of chunks that disappeared from the source"""
+
+    def complete(self):
+        """Wait for outstanding writes; raise if any failed"""
+
+    def manifest_hashes(self, hashes: Dict[str, str], ids: Optional[Iterable[str]] = None) -> Dict[str, str]:
+        """
+        Manifest entries for ids (default: every current chunk): the new hash if
+        the chunk was unchanged or written in this run, else its old hash if it
+        had one, so the next run sees it as changed (or new) again
+        """
+        entries = {}
+        for cid in hashes if ids is None else ids:
+            if cid not in self.todo or cid in self.done:
+                entries[cid] = hashes[cid]
+            elif self._previous.get(cid):
+                entries[cid] = self._previous[cid]
+        return entries
+
+    def finish(self, hashes: Dict[str, str]):
+        self.complete()
+        if self.removed:
+            self.delete(self.removed)
+            print(f"{self.label}: deleted {len(self.removed)} stale vectors")
+        save_manifest(self.manifest_path, self.model, self.target, self.manifest_hashes(hashes))
+
+    def summary(self) -> str:
+        return f"{self.label}: {self.written} chunks written"
+
+
+def upstash_manifest_path(index: str) -> Path:
+    return DATA_DIR / "vector_store" / f"upstash-{index}.manifest.json"
+
+
+def upsert_vectors(rest_url: str, token: str, vectors: List[dict]):
+    # Upstash Vector REST API expects the vectors as a direct JSON array, not wrapped
+    url = f"{rest_url.rstrip('/')}/upsert"
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    resp = requests.post(url, json=vectors, headers=headers, timeout=30)
+    if resp.status_code >= 400:
+        raise RuntimeError(f"Upsert failed {resp.status_code}: {resp.text}")
+    return resp.json()
+
+
+def delete_vectors(rest_url: str, token: str, ids: List[str]):
+    url = f"{rest_url.rstrip('/')}/delete"
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    resp = requests.delete(url, json=ids, headers=headers, timeout=30)
+    if resp.status_code >= 400:
+        raise RuntimeError(f"Delete failed {resp.status_code}: {resp.text}")
+    return resp.json()
+
+
+class UpstashRestSink(Sink):
+    """
+    Upstash Vector over REST, with upload workers draining a bounded queue of
+    batches so embedding the next batch overlaps with uploading the previous
+    ones. write() blocks while the queue is full (backpressure); a failing
+    batch is retried with backoff by its worker without holding up the
+    producer or the other workers.
+    """
+
+    def __init__(self, rest_url: str, token: str, index: str, manifest_path: Optional[Path] = None,
+                 batch_size: int = 64, workers: int = 4, queue_depth: int = 8, max_retries: int = 3):
+        super().__init__(manifest_path or upstash_manifest_path(index or "default"),
+                         f"{rest_url.rstrip('/')}#{index}")
+        self.label = f"Upstash index {index}"
+        self.rest_url = rest_url
+        self.token = token
+        self.batch_size = batch_size
+        self.workers = max(workers, 1)
+        self.queue_depth = max(queue_depth, 1)
+        self.max_retries = max_retries
+        self.errors: List[Tuple[str, Exception]] = []
+        self.started_at = None
+        self.finished_at = None
+        self._queue: Optional[queue.Queue] = None
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._sent = 0
+
+    def _start(self):
+        self._queue = queue.Queue(maxsize=self.queue_depth)
+        self._threads = [threading.Thread(target=self._work, daemon=True) for _ in range(self.workers)]
+        for t in self._threads:
+            t.start()
+
+    def _upload(self, label: str, vectors: List[dict]):
+        attempts = 0
+        while True:
+            try:
+                res = upsert_vectors(self.rest_url, self.token, vectors)
+                print(f"Upserted batch {label}: {res}")
+                return
+            except Exception as e:
+                attempts += 1
+                print(f"Upsert error (batch {label}): {e}")
+                if attempts > self.max_retries:
+                    print(f"Giving up on batch {label} after {self.max_retries} retries")
+                    raise
+                backoff = 2 ** attempts
+                print(f"Retrying batch {label} in {backoff}s...")
+                time.sleep(backoff)
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            label, vectors = item
+            with self._lock:
+                if self.started_at is None:
+                    self.started_at = time.perf_counter()
+            try:
+                self._upload(label, vectors)
+                with self._lock:
+                    self.written += len(vectors)
+            except Exception as e:
+                with self._lock:
+                    self.errors.append((label, e))
+            finally:
+                with self._lock:
+                    self.finished_at = time.perf_counter()
+
+    @property
+    def failed(self) -> Optional[str]:
+        if not self.errors:
+            return None
+        label, error = self.errors[0]
+        return f"{len(self.errors)} upload batches failed (first: {label}: {error})"
+
+    def write(self, records: List[dict]):
+        if self._queue is None:
+            self._start()
+        for i in range(0, len(records), self.batch_size):
+            vectors = records[i:i + self.batch_size]
+            # Blocks only when queue_depth batches are already waiting
+            self._queue.put((f"{self._sent}-{self._sent + len(vectors)}", vectors))
+            self._sent += len(vectors)
+
+    def complete(self):
+        if self._queue is not None:
+            for _ in self._threads:
+                self._queue.put(None)
+            for t in self._threads:
+                t.join()
+            self._queue = None
+        if self.failed:
+            raise RuntimeError(self.failed)
+
+    def delete(self, ids: List[str]):
+        delete_vectors(self.rest_url, self.token, ids)
+
+    def summary(self) -> str:
+        seconds = (self.finished_at - self.started_at) if self.started_at and self.finished_at else 0.0
+        return (f"{self.label}: {self.written} chunks in {seconds:.2f}s "
+                f"({rate(self.written, seconds)}, {self.workers} workers)")
+
+
+class UpstashIndexSink(Sink):
+    """Upstash Vector through the upstash-vector client (upstash_vector.Index)"""
+
+    def __init__(self, index_client, rest_url: str, index: str, manifest_path: Optional[Path] = None,
+                 batch_size: int = 16):
+        super().__init__(manifest_path or upstash_manifest_path(index or "default"),
+                         f"{rest_url.rstrip('/')}#{index}")
+        self.label = f"Upstash index {index}"
+        self.client = index_client
+        self.index = index
+        self.batch_size = batch_size
+        self._buffer: List[dict] = []
+
+    def _flush(self, records: List[dict]):
+        from upstash_vector import Vector  # type: ignore
+        print(f"Upserting batch of {len(records)} vectors...")
+        self.client.upsert(vectors=[Vector(id=r["id"], vector=r["vector"], metadata=r["metadata"])
+                                    for r in records], index=self.index)
+        self.written += len(records)
+
+    def write(self, records: List[dict]):
+        self._buffer.extend(records)
+        while len(self._buffer) >= self.batch_size:
+            self._flush(self._buffer[:self.batch_size])
+            self._buffer = self._buffer[self.batch_size:]
+
+    def complete(self):
+        if self._buffer:
+            self._flush(self._buffer)
+            self._buffer = []
+
+    def delete(self, ids: List[str]):
+        self.client.delete(ids=ids)
+
+
+class LocalStoreSink(Sink):
+    """
+    The in-process LocalVectorStore at <prefix>.json (+ its matrix), merged: vectors of
+    unchanged chunks are reused from the existing store. The store is one
+    matrix, so it is assembled in memory when the run finishes.
+    """
+
+    def __init__(self, prefix: str):
+        super().__init__(Path(str(prefix) + ".manifest.json"), str(Path(prefix).resolve()))
+        self.label = f"Local store {prefix}"
+        self.prefix = Path(prefix)
+        self._existing: Dict[str, Tuple[List[float], dict]] = {}
+        self._fresh: Dict[str, Tuple[List[float], dict]] = {}
+        self._stale = False
+
+    def previous(self, model_name: str) -> Dict[str, str]:
+        previous = super().previous(model_name)
+        self._existing = {}
+        if previous:
+            try:
+                store = LocalVectorStore.load(self.prefix, mmap=False)
+                if store.model == model_name:
+                    self._existing = {cid: (store.matrix[row], store.metadata[row])
+                                      for row, cid in enumerate(store.ids)}
+            except (OSError, ValueError, KeyError):
+                pass
+        # A manifest entry without its vector (store replaced by hand) is treated as missing
+        return {cid: h for cid, h in previous.items() if cid in self._existing}
+
+    def plan(self, hashes: Dict[str, str], model_name: str, full: bool = False, verbose: bool = False) -> Set[str]:
+        todo = super().plan(hashes, model_name, full, verbose)
+        # Removed chunks simply drop out of the rebuilt matrix
+        self._stale = len(self._existing) != len(hashes) or bool(self.removed)
+        self.removed = []
+        return todo
+
+    @property
+    def up_to_date(self) -> bool:
+        return not self.todo and not self._stale
+
+    def write(self, records: List[dict]):
+        for r in records:
+            self._fresh[r["id"]] = (r["vector"], r["metadata"])
+        self.written += len(records)
+
+    def delete(self, ids: List[str]):
+        """Nothing to do: removed chunks simply drop out of the rebuilt matrix"""
+
+    def finish(self, hashes: Dict[str, str]):
+        if self.up_to_date:
+            return
+        ids, vectors, metadata = [], [], []
+        for cid in hashes:
+            entry = self._fresh.get(cid) or self._existing.get(cid)
+            if entry is None:
+                continue
+            ids.append(cid)
+            vectors.append(entry[0])
+            metadata.append(entry[1])
+        store = LocalVectorStore.build(ids, vectors, metadata, model=self.model)
+        store.save(self.prefix)
+        # Changed chunks that were not re-embedded keep their old vector and old hash
+        save_manifest(self.manifest_path, self.model, self.target, self.manifest_hashes(hashes, ids))
+        print(f"Wrote local vector store ({len(store)} x {store.dim}, {self.written} re-embedded) "
+              f"to {self.prefix}.json")
+
+
+# -- pipeline ------------------------------------------------------------------
+
+def run_pipeline(make_chunks: Callable[[], Iterable[Chunk]], embedder: Embedder, sinks: List[Sink],
+                 full: bool = False, dry_run: bool = False, concurrency: int = 1,
+                 expected_dim: Optional[int] = None) -> dict:
+    """
+    Plan every sink from one pass over the chunks (ids and hashes only), then
+    stream a second pass through the embedder, writing each batch to the sinks
+    that need it. make_chunks must return a fresh iterator on every call.
+    """
+    hashes = {c.id: chunk_hash(embedder.name, c) for c in make_chunks()}
+    print(f"Found {len(hashes)} chunks.")
+    todo: Set[str] = set()
+    for sink in sinks:
+        todo |= sink.plan(hashes, embedder.name, full=full, verbose=dry_run)
+
+    stats = {"chunks": len(hashes), "todo": len(todo), "embedded": 0, "failed": 0, "embed_seconds": 0.0}
+    if dry_run:
+        print(f"Dry run: {len(todo)} chunks would be embedded; nothing was written.")
+        return stats
+    if not todo and not any(sink.removed for sink in sinks) and \
+            all(getattr(sink, "up_to_date", True) for sink in sinks):
+        print("Everything is up to date.")
+        return stats
+
+    run_started = time.perf_counter()
+    if todo:
+        embedder.load()
+        print(f"Embedding {len(todo)} chunks with model: {embedder.name}")
+        pending = (c for c in make_chunks() if c.id in todo)
+        batch_started = time.perf_counter()
+        for batch, vectors in embed_stream(pending, embedder, concurrency):
+            stats["embed_seconds"] += time.perf_counter() - batch_started
+            if vectors is None:
+                stats["failed"] += len(batch)
+            else:
+                if expected_dim and stats["embedded"] == 0 and len(vectors[0]) != expected_dim:
+                    print(f"Warning: embedding dim {len(vectors[0])} != EMBEDDING_DIM {expected_dim}. "
+                          f"Update Upstash index or EMBEDDING_DIM.")
+                stats["embedded"] += len(batch)
+                records = [{"id": c.id, "vector": v, "metadata": c.metadata} for c, v in zip(batch, vectors)]
+                for sink in sinks:
+                    wanted = [r for r in records if r["id"] in sink.todo]
+                    if wanted:
+                        sink.write(wanted)
+                        sink.done.update(r["id"] for r in wanted)
+            failed = next((sink.failed for sink in sinks if sink.failed), None)
+            if failed:
+                print(f"Stopping: {failed}")
+                break
+            batch_started = time.perf_counter()
+
+    # Every sink is finished (and saves its manifest) even if another one fails
+    errors = []
+    for sink in sinks:
+        try:
+            sink.finish(hashes)
+        except Exception as e:
+            errors.append(f"{sink.label}: {e}")
+
+    print(f"Embedding: {stats['embedded']} chunks in {stats['embed_seconds']:.2f}s "
+          f"({rate(stats['embedded'], stats['embed_seconds'])})")
+    for sink in sinks:
+        print(sink.summary())
+    if stats["failed"]:
+        print(f"{stats['failed']} chunks failed to embed; they will be retried on the next run")
+    print(f"Total: {time.perf_counter() - run_started:.2f}s")
+    if errors:
+        raise RuntimeError("; ".join(errors))
+    return stats
@@ -1,10 +1,13 @@
 """
 Interview simulation and question tools for MCP server
 """
-import os
-import json
+import asyncio
 from typing import Optional
 
+from .search_index import PortfolioIndex, tokenize
+from .qa_store import DEFAULT_QA_PATH, get_qa_store
+from .answer_cache import ANSWER_CACHE
+
 # Common interview questions by category
 INTERVIEW_QUESTIONS = {
     "technical": [
@@ -38,55 +41,35 @@ INTERVIEW_QUESTIONS = {
     ]
 }
 
-async def ask_interview_question(question: str, portfolio_data: dict) -> dict:
+async def ask_interview_question(question: str, index: PortfolioIndex) -> dict:
     """
     Answer an interview question using portfolio data
     Returns structured answer with specific examples
     """
-    # Build context from portfolio
-    context_parts = []
-    for item in portfolio_data.get("star_items", [])[:8]:
-        context = f"**{item.get('title', '')}**\n"
-        if item.get('situation'):
-            context += f"Situation: {item.get('situation')}\n"
-        if item.get('task'):
-            context += f"Task: {item.get('task')}\n"
-        if item.get('action'):
-            context += f"Action: {item.get('action')}\n"
-        if item.get('result'):
-            context += f"Result: {item.get('result')}\n"
-        context_parts.append(context)
-    
-    portfolio_context = "\n\n".join(context_parts)
-    
-    # Find relevant examples
-    relevant_examples = []
-    question_lower = question.lower()
+    # Portfolio context is built once per loaded profile
+    portfolio_context = index.interview_context
     
-    for item in portfolio_data.get("star_items", []):
-        text = " ".join([
-            item.get("title", ""),
-            item.get("action", ""),
-            item.get("result", "")
-        ]).lower()
-        
-        # Simple relevance matching
-        if any(word in text for word in question_lower.split() if len(word) > 4):
-            relevant_examples.append({
-                "title": item.get("title", ""),
-                "situation": item.get("situation", ""),
-                "task": item.get("task", ""),
-                "action": item.get("action", ""),
-                "result": item.get("result", "")
-            })
+    # Find relevant examples via the inverted index
+    question_words = {word for word in tokenize(question) if len(word) > 4}
+    matched = set()
+    for word in question_words:
+        matched |= index.docs_for(word, fields=("title", "action", "result"))
+    relevant_examples = [index.star_view(doc_id) for doc_id in sorted(matched)]
     
-    return {
+    result = {
         "question": question,
         "portfolio_context": portfolio_context,
         "relevant_examples": relevant_examples[:3],  # Top 3 most relevant
         "suggestion": "Use the STAR method to structure your answer: Situation, Task, Action, Result",
         "note": "For AI-generated answer, use this context with an LLM like Ollama"
     }
+    
+    # A prepared answer to the same (or a paraphrased) question skips generation downstream
+    cached = await ANSWER_CACHE.lookup(question)
+    if cached is not None:
+        result["cached_answer"] = cached
+        result["note"] = "A prepared answer to a near-identical question is in cached_answer"
+    return result
 
 async def get_interview_questions(category: Optional[str] = None) -> dict:
     """
@@ -112,27 +95,31 @@ async def get_interview_questions(category: Optional[str] = None) -> dict:
         "questions": all_questions
     }
 
-async def get_prepared_answers(portfolio_data: dict) -> dict:
+async def get_prepared_answers(portfolio_data: dict, session: Optional[str] = None,
+                               question: Optional[str] = None, since: Optional[str] = None,
+                               until: Optional[str] = None, offset: int = 0, limit: Optional[int] = None) -> dict:
     """
-    Get pre-generated answers from interview training data
+    Get pre-generated answers from interview training data (all of them unless
+    a limit is given). Filtered and paged through the sidecar index, so only
+    the returned records are parsed
     """
     try:
-        qa_file = os.path.join(os.path.dirname(__file__), "..", "..", "data", "interview_qa.jsonl")
-        answers = []
-        
-        if os.path.exists(qa_file):
-            with open(qa_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    if line.strip():
-                        qa_pair = json.loads(line)
-                        answers.append({
-                            "question": qa_pair.get("question", ""),
-                            "answer": qa_pair.get("response", ""),
-                            "timestamp": qa_pair.get("timestamp", "")
-                        })
-        
+        # Index refresh and record reads are file I/O, kept off the event loop
+        total, records = await asyncio.to_thread(
+            get_qa_store(DEFAULT_QA_PATH).query,
+            session=session, question=question, since=since, until=until, offset=offset, limit=limit
+        )
+        answers = [{
+            "question": qa_pair.get("question", ""),
+            "answer": qa_pair.get("response", ""),
+            "timestamp": qa_pair.get("timestamp", ""),
+            "session": qa_pair.get("session", "")
+        } for qa_pair in records]
+
         return {
-            "total_answers": len(answers),
+            "total_answers": total,
+            "offset": offset,
+            "limit": limit,
             "prepared_answers": answers
         }
     except Exception as e:
@@ -0,0 +1,68 @@
+"""
+Compiled multi-pattern keyword matcher (Aho-Corasick)
+Scans text once and reports every keyword that occurs as a substring,
+regardless of how many keywords the taxonomy contains
+"""
+from collections import deque
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+
+class KeywordMatcher:
+    """
+    Case-insensitive Aho-Corasick automaton over (pattern, payload) pairs
+    Several payloads may share a pattern; scan() returns the payloads hit
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, Any]]):
+        self.payloads: List[Any] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+
+        for pattern, payload in entries:
+            pattern = pattern.lower()
+            if not pattern:
+                continue
+            self.payloads.append(payload)
+            self._add(pattern, len(self.payloads) - 1)
+        self._link()
+
+    def _add(self, pattern: str, payload_id: int):
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(payload_id)
+
+    def _link(self):
+        """Breadth-first construction of failure links and merged outputs"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def scan(self, text: str) -> Set[Any]:
+        """Return the payloads of every pattern found in text"""
+        goto, fail, out = self._goto, self._fail, self._out
+        hits: Set[int] = set()
+        state = 0
+        for ch in text.lower():
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                hits.update(out[state])
+        return {self.payloads[i] for i in hits}
@@ -0,0 +1,74 @@
+"""
+Streaming client for Ollama's /api/generate shared by the chat/training scripts
+Returns the `context` token array Ollama reports when generation is done, so a
+caller can pass it back on the next turn and only the new text needs prefill
+"""
+import os
+import json
+from typing import Callable, List, Optional, Tuple
+
+import requests
+
+# Continuing a context longer than this risks overflowing the model's window
+# (num_ctx); callers fall back to a full, token-budgeted prompt instead
+CONTEXT_MAX_TOKENS = int(os.getenv("OLLAMA_CONTEXT_MAX_TOKENS", "3072"))
+
+
+def generate(ollama_url: str, model: str, prompt: str, context: Optional[List[int]] = None,
+             options: Optional[dict] = None, timeout: float = 120,
+             on_token: Optional[Callable[[str], None]] = None) -> Tuple[str, Optional[List[int]]]:
+    """Run one generation; returns (response text, context to continue from)"""
+    url = ollama_url.rstrip('/') + '/api/generate'
+    payload = {'model': model, 'prompt': prompt, 'stream': True}
+    if context:
+        payload['context'] = context
+    if options:
+        payload['options'] = options
+    r = requests.post(url, json=payload, headers={'Content-Type': 'application/json'}, timeout=timeout, stream=True)
+    if not r.ok:
+        raise RuntimeError(f'Ollama API error {r.status_code}: {r.text}')
+
+    # Ollama /api/generate returns newline-delimited JSON: each line is {"response": "token", "done": false}
+    response_text = []
+    new_context = None
+    for line in r.iter_lines(decode_unicode=True):
+        if not line:
+            continue
+        try:
+            chunk = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if chunk.get('error'):
+            raise RuntimeError(f"Ollama error: {chunk['error']}")
+        if 'response' in chunk:
+            response_text.append(chunk['response'])
+            if on_token is not None:
+                on_token(chunk['response'])
+        if chunk.get('done'):
+            new_context = chunk.get('context')
+            break
+    return ''.join(response_text).strip(), new_context
+
+
+def usable_context(context: Optional[List[int]], max_tokens: int = CONTEXT_MAX_TOKENS) -> Optional[List[int]]:
+    """The context if it is worth continuing from, else None"""
+    if not context or len(context) > max_tokens:
+        return None
+    return context
+
+
+def pack_context(model: str, context: List[int]) -> str:
+    return json.dumps({'model': model, 'context': context})
+
+
+def unpack_context(raw: Optional[str], model: str) -> Optional[List[int]]:
+    """Decode a stored context; contexts from another model are useless"""
+    if not raw:
+        return None
+    try:
+        data = json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get('model') != model:
+        return None
+    return usable_context(data.get('context'))
@@ -0,0 +1,155 @@
+"""
+Hot-reloadable portfolio data
+Watches data/profile.json and atomically swaps in a versioned snapshot
+(profile + derived search index) whenever the file content changes
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Tuple
+
+from .search_index import PortfolioIndex, build_index
+
+try:
+    from watchfiles import awatch  # type: ignore
+except ImportError:
+    # watchfiles is optional; fall back to mtime polling
+    awatch = None
+
+PROFILE_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "profile.json"
+
+
+def content_hash(raw: bytes) -> str:
+    """Identifies a profile version; logged with generated answers so they can be matched to it"""
+    return hashlib.sha256(raw).hexdigest()
+
+
+def profile_content_hash(path: Path = PROFILE_PATH) -> Optional[str]:
+    """content_hash of the profile on disk, or None if it cannot be read"""
+    try:
+        with open(path, "rb") as f:
+            return content_hash(f.read())
+    except OSError:
+        return None
+
+
+@dataclass(frozen=True)
+class PortfolioSnapshot:
+    """Immutable view of one profile version and everything derived from it"""
+    version: int
+    data: dict
+    index: PortfolioIndex
+    content_hash: str
+    stat_key: Tuple[int, int]
+    loaded_at: float
+
+
+class PortfolioStore:
+    """
+    Holds the current PortfolioSnapshot
+    Readers take `store.snapshot` once per request and keep using it, so a
+    reload never changes data under an in-flight request
+    """
+
+    def __init__(self, path: Path = PROFILE_PATH, poll_interval: float = 1.0):
+        self.path = Path(path)
+        self.poll_interval = poll_interval
+        self._snapshot: Optional[PortfolioSnapshot] = None
+        self._watch_task: Optional[asyncio.Task] = None
+        self.reload_errors = 0
+
+    @property
+    def snapshot(self) -> Optional[PortfolioSnapshot]:
+        return self._snapshot
+
+    def _stat_key(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _read(self, stat_key: Tuple[int, int]) -> Optional[PortfolioSnapshot]:
+        """Parse the file and build derived indexes (blocking; run off the event loop)"""
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        digest = content_hash(raw)
+        current = self._snapshot
+        if current is not None and current.content_hash == digest:
+            return None
+        data = json.loads(raw.decode("utf-8"))
+        return PortfolioSnapshot(
+            version=(current.version + 1) if current else 1,
+            data=data,
+            index=build_index(data),
+            content_hash=digest,
+            stat_key=stat_key,
+            loaded_at=time.time()
+        )
+
+    def load(self) -> PortfolioSnapshot:
+        """Synchronous load used at startup; raises if the profile is unreadable"""
+        stat_key = self._stat_key() or (0, 0)
+        snapshot = self._read(stat_key)
+        if snapshot is not None:
+            self._snapshot = snapshot
+        return self._snapshot
+
+    async def refresh(self) -> bool:
+        """Reload if the file changed on disk; returns True when a new version was swapped in"""
+        stat_key = self._stat_key()
+        current = self._snapshot
+        if stat_key is None or (current is not None and current.stat_key == stat_key):
+            return False
+        try:
+            snapshot = await asyncio.to_thread(self._read, stat_key)
+        except Exception as e:
+            # Keep serving the last good snapshot (e.g. file saved mid-write)
+            self.reload_errors += 1
+            print(f"Error reloading portfolio: {e}", file=sys.stderr)
+            return False
+        if snapshot is None:
+            # Touched but unchanged: remember the stat so we stop re-hashing it
+            if current is not None:
+                self._snapshot = PortfolioSnapshot(
+                    current.version, current.data, current.index,
+                    current.content_hash, stat_key, current.loaded_at
+                )
+            return False
+        self._snapshot = snapshot
+        print(f"🔄 Reloaded portfolio v{snapshot.version} "
+              f"({len(snapshot.index)} items)", file=sys.stderr)
+        return True
+
+    async def _watch(self):
+        if awatch is not None:
+            async for _ in awatch(self.path.parent, debounce=200):
+                await self.refresh()
+        else:
+            while True:
+                await asyncio.sleep(self.poll_interval)
+                await self.refresh()
+
+    def start_watching(self) -> asyncio.Task:
+        """Start the background watcher on the running event loop"""
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(self._watch())
+        return self._watch_task
+
+    async def stop_watching(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+
+# Shared store for the MCP servers in this process
+PORTFOLIO_STORE = PortfolioStore(poll_interval=float(os.getenv("PROFILE_POLL_SECONDS", "1.0")))
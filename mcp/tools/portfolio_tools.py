@@ -4,57 +4,65 @@ Portfolio query and data access tools for MCP server
 import json
 from typing import Any, Optional, List, Dict
 
-async def query_portfolio(query: str, portfolio_data: dict) -> dict:
+from .keyword_matcher import KeywordMatcher
+from .search_index import PortfolioIndex, tokenize
+
+# Skill taxonomy used by get_skills
+SKILL_KEYWORDS = {
+    "frontend": ["html", "css", "javascript", "react", "next.js", "tailwind", "responsive", "ui", "ux"],
+    "backend": ["python", "node", "api", "database", "redis", "upstash"],
+    "tools": ["git", "vscode", "figma", "vercel"],
+    "practices": ["accessibility", "wcag", "testing", "optimization", "performance"]
+}
+
+# Technology names reported per project, in display order
+TECH_KEYWORDS = [
+    "HTML", "CSS", "JavaScript", "React", "Next.js", "Node.js",
+    "Python", "Tailwind", "TypeScript", "Git", "API", "REST",
+    "Redis", "Upstash", "Vercel", "WCAG", "Lighthouse"
+]
+
+# One automaton for every taxonomy: payloads are (taxonomy, category, keyword)
+KEYWORD_MATCHER = KeywordMatcher(
+    [(kw, ("skills", category, kw)) for category, kws in SKILL_KEYWORDS.items() for kw in kws]
+    + [(tech, ("technologies", None, tech)) for tech in TECH_KEYWORDS]
+)
+
+async def query_portfolio(query: str, index: PortfolioIndex) -> dict:
     """
     Query portfolio using natural language
     Returns relevant information based on the query
     """
-    query_lower = query.lower()
     results = {
         "query": query,
         "matches": []
     }
     
-    # Search through STAR items
-    for item in portfolio_data.get("star_items", []):
-        # Check if query matches title, situation, task, action, or result
-        searchable = " ".join([
-            item.get("title", ""),
-            item.get("situation", ""),
-            item.get("task", ""),
-            item.get("action", ""),
-            item.get("result", "")
-        ]).lower()
-        
-        # Simple keyword matching
-        query_words = query_lower.split()
-        if any(word in searchable for word in query_words if len(word) > 3):
-            results["matches"].append({
-                "title": item.get("title", ""),
-                "situation": item.get("situation", ""),
-                "task": item.get("task", ""),
-                "action": item.get("action", ""),
-                "result": item.get("result", ""),
-                "relevance": "high" if all(word in searchable for word in query_words if len(word) > 3) else "medium"
-            })
+    # Keyword matching against the precomputed inverted index
+    query_words = {word for word in tokenize(query) if len(word) > 3}
+    hits = [index.docs_for(word) for word in query_words]
+    matched = set().union(*hits) if hits else set()
+    
+    for doc_id in sorted(matched):
+        match = index.star_view(doc_id)
+        match["relevance"] = "high" if all(doc_id in docs for docs in hits) else "medium"
+        results["matches"].append(match)
     
     return results
 
-async def get_projects(portfolio_data: dict, limit: Optional[int] = None) -> dict:
+async def get_projects(index: PortfolioIndex, limit: Optional[int] = None) -> dict:
     """
     Get list of all projects from portfolio
     """
-    star_items = portfolio_data.get("star_items", [])
-    
     # Filter to projects (items with clear deliverables/results)
     projects = []
-    for item in star_items:
+    for doc_id, item in enumerate(index.items):
         projects.append({
             "title": item.get("title", ""),
             "description": item.get("situation", "") + " " + item.get("task", ""),
             "actions": item.get("action", ""),
             "results": item.get("result", ""),
-            "technologies": extract_technologies(item)
+            "technologies": _technologies_from_hits(item_keyword_hits(index, doc_id))
         })
     
     if limit:
@@ -65,47 +73,17 @@ async def get_projects(portfolio_data: dict, limit: Optional[int] = None) -> dic
         "projects": projects
     }
 
-async def get_skills(portfolio_data: dict, category: Optional[str] = None) -> dict:
+async def get_skills(index: PortfolioIndex, category: Optional[str] = None) -> dict:
     """
     Extract and categorize skills from portfolio
     """
-    skills = {
-        "frontend": set(),
-        "backend": set(),
-        "tools": set(),
-        "practices": set()
-    }
+    skills = {category_name: set() for category_name in SKILL_KEYWORDS}
     
-    # Extract skills from all STAR items
-    for item in portfolio_data.get("star_items", []):
-        text = " ".join([
-            item.get("action", ""),
-            item.get("result", "")
-        ])
-        
-        # Frontend technologies
-        frontend_keywords = ["html", "css", "javascript", "react", "next.js", "tailwind", "responsive", "ui", "ux"]
-        for kw in frontend_keywords:
-            if kw.lower() in text.lower():
-                skills["frontend"].add(kw)
-        
-        # Backend/tools
-        backend_keywords = ["python", "node", "api", "database", "redis", "upstash"]
-        for kw in backend_keywords:
-            if kw.lower() in text.lower():
-                skills["backend"].add(kw)
-        
-        # Tools
-        tool_keywords = ["git", "vscode", "figma", "vercel"]
-        for kw in tool_keywords:
-            if kw.lower() in text.lower():
-                skills["tools"].add(kw)
-        
-        # Practices
-        practice_keywords = ["accessibility", "wcag", "testing", "optimization", "performance"]
-        for kw in practice_keywords:
-            if kw.lower() in text.lower():
-                skills["practices"].add(kw)
+    # Extract skills from all STAR items (one automaton scan per item, cached)
+    for doc_id in range(len(index)):
+        for taxonomy, skill_category, kw in item_keyword_hits(index, doc_id):
+            if taxonomy == "skills":
+                skills[skill_category].add(kw)
     
     # Convert sets to lists
     skills_list = {k: sorted(list(v)) for k, v in skills.items()}
@@ -121,60 +99,44 @@ async def get_skills(portfolio_data: dict, category: Optional[str] = None) -> di
         "total_count": sum(len(v) for v in skills_list.values())
     }
 
-async def search_experience(keywords: str, portfolio_data: dict) -> dict:
+async def search_experience(keywords: str, index: PortfolioIndex, top_k: Optional[int] = 10) -> dict:
     """
     Search for specific experience using keywords
+    Results are ranked with BM25F (title, action and result weighted) and
+    only the top_k best matches are returned
     """
-    keywords_lower = keywords.lower().split()
-    matches = []
+    total_matches, ranked = index.bm25_search(keywords, top_k)
     
-    for item in portfolio_data.get("star_items", []):
-        text = " ".join([
-            item.get("title", ""),
-            item.get("situation", ""),
-            item.get("task", ""),
-            item.get("action", ""),
-            item.get("result", "")
-        ]).lower()
-        
-        # Calculate match score
-        match_count = sum(1 for kw in keywords_lower if kw in text)
-        
-        if match_count > 0:
-            matches.append({
-                "title": item.get("title", ""),
-                "match_score": match_count,
-                "situation": item.get("situation", ""),
-                "task": item.get("task", ""),
-                "action": item.get("action", ""),
-                "result": item.get("result", "")
-            })
-    
-    # Sort by match score
-    matches.sort(key=lambda x: x["match_score"], reverse=True)
+    matches = []
+    for doc_id, score in ranked:
+        match = {"title": index.items[doc_id].get("title", ""), "match_score": round(score, 4)}
+        match.update(index.star_view(doc_id))
+        matches.append(match)
     
     return {
         "keywords": keywords,
-        "matches_found": len(matches),
+        "matches_found": total_matches,
         "results": matches
     }
 
-def extract_technologies(item: Dict) -> List[str]:
-    """Extract technology names from a STAR item"""
-    text = " ".join([
+def _keyword_text(item: Dict) -> str:
+    """Text scanned for skills and technologies"""
+    return " ".join([
         item.get("action", ""),
         item.get("result", "")
     ])
-    
-    tech_keywords = [
-        "HTML", "CSS", "JavaScript", "React", "Next.js", "Node.js",
-        "Python", "Tailwind", "TypeScript", "Git", "API", "REST",
-        "Redis", "Upstash", "Vercel", "WCAG", "Lighthouse"
-    ]
-    
-    found = []
-    for tech in tech_keywords:
-        if tech.lower() in text.lower():
-            found.append(tech)
-    
-    return found
+
+def _technologies_from_hits(hits) -> List[str]:
+    return [tech for tech in TECH_KEYWORDS if ("technologies", None, tech) in hits]
+
+def item_keyword_hits(index: PortfolioIndex, doc_id: int) -> frozenset:
+    """Keyword hits for one STAR item, cached on the index until the profile changes"""
+    hits = index.keyword_hits.get(doc_id)
+    if hits is None:
+        hits = frozenset(KEYWORD_MATCHER.scan(_keyword_text(index.items[doc_id])))
+        index.keyword_hits[doc_id] = hits
+    return hits
+
+def extract_technologies(item: Dict) -> List[str]:
+    """Extract technology names from a STAR item"""
+    return _technologies_from_hits(KEYWORD_MATCHER.scan(_keyword_text(item)))
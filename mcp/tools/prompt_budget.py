@@ -0,0 +1,182 @@
+"""
+Token-budgeted prompt assembly for the chat scripts
+Splits a fixed token budget between retrieved context and conversation history;
+history that no longer fits is folded into a short extractive summary that is
+cached per session and extended incrementally as the conversation grows
+"""
+import os
+import re
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Per-message overhead for the "Role: " prefix and separators
+MESSAGE_OVERHEAD_TOKENS = 4
+# Summary lines remembered per session
+MAX_SUMMARY_LINES = 256
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap upper-leaning estimate of subword tokens: ~4 characters per token
+    for English prose, but never fewer than the number of words
+    """
+    if not text:
+        return 0
+    return max(len(text.split()), (len(text) + 3) // 4)
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """Cut text to roughly budget tokens, on a word boundary"""
+    if budget <= 0:
+        return ""
+    if estimate_tokens(text) <= budget:
+        return text
+    cut = text[:budget * 4]
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    while cut and estimate_tokens(cut + "…") > budget:
+        cut = cut.rsplit(" ", 1)[0] if " " in cut else cut[:-1]
+    return cut + "…" if cut else ""
+
+
+def message_tokens(message: dict) -> int:
+    return estimate_tokens(str(message.get("content", ""))) + MESSAGE_OVERHEAD_TOKENS
+
+
+def _message_digest(message: dict) -> str:
+    raw = f"{message.get('role', '')}\x00{message.get('content', '')}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def summarize_message(message: dict, max_tokens: int = 40) -> str:
+    """One extractive line per message: role plus its first sentence"""
+    role = "Assistant" if message.get("role") == "assistant" else "User"
+    content = " ".join(str(message.get("content", "")).split())
+    first = _SENTENCE_END.split(content, 1)[0] if content else ""
+    return f"{role}: {truncate_to_tokens(first, max_tokens)}"
+
+
+@dataclass
+class PromptParts:
+    """What fits in the budget; callers render it in their own prompt format"""
+    context: List[str]
+    history: List[dict]
+    summary: str = ""
+    tokens: int = 0
+    dropped_messages: int = 0
+    stats: Dict[str, int] = field(default_factory=dict)
+
+
+class PromptBudget:
+    """
+    Allocation, after the fixed text (instructions + question) is paid for:
+      context  up to context_share of what is left, best-ranked blocks first
+      history  everything else, newest messages first; when older messages do
+               not fit, up to summary_tokens are set aside for their summary
+    Unused context budget flows to history.
+    """
+
+    def __init__(self, max_tokens: int = 2048, context_share: float = 0.6,
+                 summary_tokens: int = 200, max_sessions: int = 1024):
+        self.max_tokens = max_tokens
+        self.context_share = context_share
+        self.summary_tokens = summary_tokens
+        self.max_sessions = max_sessions
+        # session -> {message digest: summary line}, oldest first
+        self._summaries: "OrderedDict[str, OrderedDict[str, str]]" = OrderedDict()
+
+    def _fit_context(self, blocks: Sequence[str], budget: int) -> Tuple[List[str], int]:
+        kept, used = [], 0
+        for block in blocks:
+            if not block:
+                continue
+            cost = estimate_tokens(block)
+            if used + cost > budget:
+                room = budget - used
+                # Keep a truncated block only if a useful amount still fits
+                if room >= 32:
+                    block = truncate_to_tokens(block, room)
+                    kept.append(block)
+                    used += estimate_tokens(block)
+                break
+            kept.append(block)
+            used += cost
+        return kept, used
+
+    def _summary(self, session: Optional[str], dropped: List[dict], kept: List[dict], budget: int) -> str:
+        """
+        Rolling summary of older messages. Lines are cached per session by
+        message digest, so each message is summarized once, and messages that
+        have since slid out of the stored history window stay in the summary
+        """
+        if not dropped or budget <= 0:
+            return ""
+        if session is None:
+            lines = [summarize_message(m) for m in dropped]
+        else:
+            cache = self._summaries.get(session)
+            if cache is None:
+                cache = self._summaries[session] = OrderedDict()
+            self._summaries.move_to_end(session)
+            while len(self._summaries) > self.max_sessions:
+                self._summaries.popitem(last=False)
+            for message in dropped:
+                digest = _message_digest(message)
+                if digest not in cache:
+                    cache[digest] = summarize_message(message)
+            while len(cache) > MAX_SUMMARY_LINES:
+                cache.popitem(last=False)
+            recent = {_message_digest(m) for m in kept}
+            lines = [line for digest, line in cache.items() if digest not in recent]
+        # Oldest lines fall off first when the summary outgrows its budget
+        while lines and estimate_tokens("\n".join(lines)) > budget:
+            lines.pop(0)
+        return "\n".join(lines)
+
+    def fit(self, fixed_text: str, context_blocks: Sequence[str] = (), history: Sequence[dict] = (),
+            session: Optional[str] = None) -> PromptParts:
+        fixed = estimate_tokens(fixed_text)
+        remaining = max(self.max_tokens - fixed, 0)
+
+        context, context_used = self._fit_context(context_blocks, int(remaining * self.context_share))
+        history_budget = remaining - context_used
+
+        history = list(history)
+        total_history = sum(message_tokens(m) for m in history)
+        summary_budget = 0
+        if total_history > history_budget:
+            summary_budget = min(self.summary_tokens, history_budget // 4)
+        recent_budget = history_budget - summary_budget
+
+        kept: List[dict] = []
+        used = 0
+        for message in reversed(history):
+            cost = message_tokens(message)
+            if used + cost > recent_budget:
+                break
+            kept.append(message)
+            used += cost
+        kept.reverse()
+        dropped = history[:len(history) - len(kept)]
+
+        summary = self._summary(session, dropped, kept, summary_budget)
+        summary_used = estimate_tokens(summary)
+        return PromptParts(
+            context=context,
+            history=kept,
+            summary=summary,
+            tokens=fixed + context_used + used + summary_used,
+            dropped_messages=len(dropped),
+            stats={"fixed": fixed, "context": context_used, "history": used, "summary": summary_used}
+        )
+
+
+def budget_from_env() -> PromptBudget:
+    return PromptBudget(
+        max_tokens=int(os.getenv("PROMPT_MAX_TOKENS", "2048")),
+        context_share=float(os.getenv("PROMPT_CONTEXT_SHARE", "0.6")),
+        summary_tokens=int(os.getenv("PROMPT_SUMMARY_TOKENS", "200"))
+    )
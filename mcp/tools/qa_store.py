@@ -0,0 +1,335 @@
+"""
+Indexed reader for the interview Q&A log (data/interview_qa.jsonl)
+A binary sidecar (<file>.idx) holds one fixed-width entry per record - byte
+offset, length, session hash, question hash and timestamp - so listing,
+filtering and paging only touch the index and the lines on the requested
+page. The index is extended incrementally as training runs append to the log,
+and session/question filters go through in-memory posting lists built from it.
+"""
+import os
+import json
+import struct
+import hashlib
+import threading
+from array import array
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .file_lock import file_lock
+
+DEFAULT_QA_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "interview_qa.jsonl"
+# magic, version, generation (bumped on every rebuild), record count, bytes of the
+# log covered, digests of the first and the last bytes of that range
+HEADER = struct.Struct("<4sHHQQ20s20s")
+MAGIC = b"QAIX"
+VERSION = 3
+# offset, length, session hash, question hash, timestamp (epoch seconds, 0 if unknown)
+ENTRY = struct.Struct("<QI8s8sd")
+# The first and last bytes of the indexed range identify the log; if either
+# changes the log was replaced
+HEAD_BYTES = 4096
+# Index entries scanned per read when filtering
+SCAN_BLOCK = 4096
+
+Entry = Tuple[int, int, bytes, bytes, float]
+TimeBound = Union[str, datetime, float, None]
+
+
+def key_hash(value: str) -> bytes:
+    return hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest()
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(question.lower().split())
+
+
+def to_epoch(value: TimeBound) -> Optional[float]:
+    """ISO string / datetime / epoch seconds -> epoch seconds"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return value.timestamp()
+
+
+class QAStore:
+    """
+    Streaming, indexed access to an append-only JSONL log of Q&A records
+
+    Unfiltered pages seek straight into the index. Session and question
+    filters read only the index entries listed for that key (two 8-byte
+    positions per record are kept in memory); time-range-only filters scan
+    the index in SCAN_BLOCK steps, since timestamps are not guaranteed to be
+    in log order. Only the records on the requested page are parsed.
+
+    Writers only ever append to the log itself; the index is maintained under
+    a thread lock and a lock file, so threads and processes sharing a log may
+    all refresh it. A rebuild replaces the index file and bumps its
+    generation, so readers can tell their offsets into the old index no
+    longer apply.
+    """
+
+    def __init__(self, path: Union[str, Path], index_path: Union[str, Path, None] = None):
+        self.path = Path(path)
+        self.index_path = Path(index_path) if index_path else self.path.with_name(self.path.name + ".idx")
+        self.lock_path = self.index_path.with_name(self.index_path.name + ".lock")
+        self.count = 0
+        self.indexed_size = 0
+        self.head_digest = b""
+        self.tail_digest = b""
+        self.generation = 0
+        self._stat_key: Optional[Tuple[int, int, int]] = None
+        self._lock = threading.Lock()
+        # index position lists per session / question hash, covering the first
+        # _postings_count entries of index generation _postings_generation
+        self._by_session: Dict[bytes, array] = {}
+        self._by_question: Dict[bytes, array] = {}
+        self._postings_count = 0
+        self._postings_generation: Optional[int] = None
+
+    # -- index maintenance -------------------------------------------------
+
+    def _head_digest(self, f, size: int) -> bytes:
+        f.seek(0)
+        return hashlib.sha1(f.read(min(size, HEAD_BYTES))).digest()
+
+    def _tail_digest(self, f, size: int) -> bytes:
+        start = max(size - HEAD_BYTES, 0)
+        f.seek(start)
+        return hashlib.sha1(f.read(size - start)).digest()
+
+    def _write_header(self, idx):
+        idx.seek(0)
+        idx.write(HEADER.pack(MAGIC, VERSION, self.generation, self.count, self.indexed_size,
+                              self.head_digest, self.tail_digest))
+
+    def _reset(self):
+        self.count, self.indexed_size, self.head_digest, self.tail_digest = 0, 0, b"", b""
+
+    def _open_index(self):
+        """Load the header, discarding an index that is corrupt or from another version"""
+        self._reset()
+        try:
+            with open(self.index_path, "rb") as idx:
+                raw = idx.read(HEADER.size)
+                size = os.fstat(idx.fileno()).st_size
+        except FileNotFoundError:
+            return
+        try:
+            magic, version, generation, count, indexed_size, head, tail = HEADER.unpack(raw)
+        except struct.error:
+            return
+        if magic != MAGIC or version != VERSION:
+            return
+        # A later rebuild must still look new to readers of this index
+        self.generation = generation
+        if size >= HEADER.size + count * ENTRY.size:
+            self.count, self.indexed_size, self.head_digest, self.tail_digest = count, indexed_size, head, tail
+
+    @staticmethod
+    def _entry_for(offset: int, line: bytes) -> Optional[Entry]:
+        if not line.strip():
+            return None
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(record, dict):
+            return None
+        return (
+            offset,
+            len(line),
+            key_hash(str(record.get("session", ""))),
+            key_hash(normalize_question(str(record.get("question", "")))),
+            to_epoch(record.get("timestamp")) or 0.0
+        )
+
+    def refresh(self) -> int:
+        """Index lines appended since the last call; returns how many were added"""
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            self._reset()
+            self._stat_key = None
+            return 0
+        # Size alone misses a log replaced by one of the same length
+        stat_key = (st.st_size, st.st_mtime_ns, st.st_ino)
+        if stat_key == self._stat_key:
+            return 0
+        with self._lock, file_lock(self.lock_path):
+            # Another thread or process may have extended (or rebuilt) the index meanwhile
+            self._open_index()
+            added = self._extend()
+            self._stat_key = stat_key
+            return added
+
+    def _extend(self) -> int:
+        size = self.path.stat().st_size
+
+        with open(self.path, "rb") as log:
+            rebuild = size < self.indexed_size or not self.index_path.exists()
+            if not rebuild and self.indexed_size:
+                rebuild = (self._head_digest(log, self.indexed_size) != self.head_digest
+                           or self._tail_digest(log, self.indexed_size) != self.tail_digest)
+            if not rebuild and size == self.indexed_size:
+                return 0
+            if rebuild or not self.indexed_size:
+                # Built in a new file and swapped in, so readers of the old one are unaffected
+                self._reset()
+                self.generation = (self.generation + 1) & 0xFFFF
+                target = self.index_path.with_name(self.index_path.name + ".tmp")
+                idx = open(target, "w+b")
+            else:
+                target = None
+                idx = open(self.index_path, "r+b")
+
+            with idx:
+                # Drop entries written after the last header update (an interrupted refresh)
+                idx.truncate(HEADER.size + self.count * ENTRY.size)
+                idx.seek(0, os.SEEK_END)
+                if idx.tell() < HEADER.size:
+                    idx.write(b"\0" * HEADER.size)
+
+                added = 0
+                log.seek(self.indexed_size)
+                offset = self.indexed_size
+                for line in log:
+                    if not line.endswith(b"\n"):
+                        break  # a record still being written; picked up next time
+                    entry = self._entry_for(offset, line.rstrip(b"\r\n"))
+                    offset += len(line)
+                    if entry is not None:
+                        idx.write(ENTRY.pack(*entry))
+                        added += 1
+
+                self.count += added
+                self.indexed_size = offset
+                self.head_digest = self._head_digest(log, offset)
+                self.tail_digest = self._tail_digest(log, offset)
+                self._write_header(idx)
+            if target is not None:
+                os.replace(target, self.index_path)
+        return added
+
+    def _sync_postings(self):
+        """Add index entries written since the last call to the posting lists (holds _lock)"""
+        if self._postings_generation != self.generation or self._postings_count > self.count:
+            self._by_session, self._by_question = {}, {}
+            self._postings_count, self._postings_generation = 0, self.generation
+        position = self._postings_count
+        for _, _, session_hash, question_hash, _ in self._scan(position):
+            self._by_session.setdefault(session_hash, array("Q")).append(position)
+            self._by_question.setdefault(question_hash, array("Q")).append(position)
+            position += 1
+        self._postings_count = position
+
+    # -- queries -----------------------------------------------------------
+
+    def _entries_at(self, positions: Sequence[int]) -> Iterator[Entry]:
+        """Index entries at the given (ascending) positions"""
+        with open(self.index_path, "rb") as idx:
+            for position in positions:
+                if position >= self.count:
+                    return
+                idx.seek(HEADER.size + position * ENTRY.size)
+                raw = idx.read(ENTRY.size)
+                if len(raw) < ENTRY.size:
+                    return
+                yield ENTRY.unpack(raw)
+
+    def _scan(self, start: int = 0) -> Iterator[Entry]:
+        with open(self.index_path, "rb") as idx:
+            idx.seek(HEADER.size + start * ENTRY.size)
+            remaining = self.count - start
+            while remaining > 0:
+                block = idx.read(min(remaining, SCAN_BLOCK) * ENTRY.size)
+                if not block:
+                    return
+                remaining -= len(block) // ENTRY.size
+                yield from ENTRY.iter_unpack(block)
+
+    def read(self, entries: List[Entry]) -> List[dict]:
+        """Parse just the given records from the log"""
+        records = []
+        with open(self.path, "rb") as log:
+            for offset, length, *_ in entries:
+                log.seek(offset)
+                try:
+                    records.append(json.loads(log.read(length)))
+                except ValueError:
+                    continue
+        return records
+
+    def query(self, session: Optional[str] = None, question: Optional[str] = None,
+              since: TimeBound = None, until: TimeBound = None,
+              offset: int = 0, limit: Optional[int] = None) -> Tuple[int, List[dict]]:
+        """
+        Records matching every given filter, in log order
+        Returns (total matches, records[offset:offset + limit]); limit=None returns them all
+        """
+        self.refresh()
+        offset = max(offset, 0)
+        end = None if limit is None else offset + max(limit, 0)
+        if not self.count:
+            return 0, []
+
+        session_hash = key_hash(session) if session is not None else None
+        question_hash = key_hash(normalize_question(question)) if question is not None else None
+        since_ts, until_ts = to_epoch(since), to_epoch(until)
+
+        # Unfiltered pages are a direct seek into the index
+        if session_hash is None and question_hash is None and since_ts is None and until_ts is None:
+            page = []
+            for entry in self._scan(min(offset, self.count)):
+                if end is not None and offset + len(page) >= end:
+                    break
+                page.append(entry)
+            return self.count, self.read(page)
+
+        if session_hash is None and question_hash is None:
+            entries = self._scan()
+        else:
+            # Only the entries listed for the most selective key are read
+            with self._lock:
+                self._sync_postings()
+                lists = []
+                if session_hash is not None:
+                    lists.append(self._by_session.get(session_hash, ()))
+                if question_hash is not None:
+                    lists.append(self._by_question.get(question_hash, ()))
+                positions = min(lists, key=len)[:]
+            entries = self._entries_at(positions)
+
+        total, page = 0, []
+        for entry in entries:
+            _, _, entry_session, entry_question, ts = entry
+            if session_hash is not None and entry_session != session_hash:
+                continue
+            if question_hash is not None and entry_question != question_hash:
+                continue
+            if since_ts is not None and ts < since_ts:
+                continue
+            if until_ts is not None and ts > until_ts:
+                continue
+            if offset <= total and (end is None or total < end):
+                page.append(entry)
+            total += 1
+        return total, self.read(page)
+
+
+_STORES: Dict[Path, QAStore] = {}
+
+
+def get_qa_store(path: Union[str, Path]) -> QAStore:
+    """One store per log, so the index header is read once per process"""
+    path = Path(path).resolve()
+    store = _STORES.get(path)
+    if store is None:
+        store = _STORES[path] = QAStore(path)
+    return store
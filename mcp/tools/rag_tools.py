@@ -1,25 +1,43 @@
 """
 RAG (Retrieval-Augmented Generation) tools using Upstash Vector
+or the in-process local vector store
 """
 import os
-import requests
+import asyncio
 from typing import Optional, List, Dict
 
+from .embedding_cache import get_embedding_cache
+from .embedding_codec import BINARY_MEDIA_TYPE, decode_embed_response
+from .http_client import get_http_session
+from .vector_store import get_local_store
+
+# Model names key the embedding cache; keep in sync with serve_local_embeddings.py
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+# Wire format requested from the local embedding server ("binary", "base64" or "json")
+EMBED_WIRE_FORMAT = os.getenv("EMBED_WIRE_FORMAT", "binary")
+EMBED_WIRE_DTYPE = os.getenv("EMBED_WIRE_DTYPE", "float32")
+
 async def semantic_search(query: str, top_k: int = 5) -> dict:
     """
-    Perform semantic search using Upstash Vector
+    Perform semantic search using Upstash Vector, or the local vector store
+    when VECTOR_BACKEND=local
     """
     try:
-        # Get environment variables
-        vector_url = os.getenv("UPSTASH_VECTOR_REST_URL")
-        vector_token = os.getenv("UPSTASH_VECTOR_REST_TOKEN")
+        backend = os.getenv("VECTOR_BACKEND", "upstash").lower()
         use_local = os.getenv("USE_LOCAL_EMBEDDINGS", "false").lower() == "true"
         
-        if not vector_url or not vector_token:
-            return {
-                "error": "Upstash Vector credentials not configured",
-                "results": []
-            }
+        if backend == "local":
+            # Load (or pick up a re-indexed) store off the event loop
+            store = await asyncio.to_thread(get_local_store)
+        else:
+            vector_url = os.getenv("UPSTASH_VECTOR_REST_URL")
+            vector_token = os.getenv("UPSTASH_VECTOR_REST_TOKEN")
+            if not vector_url or not vector_token:
+                return {
+                    "error": "Upstash Vector credentials not configured",
+                    "results": []
+                }
         
         # Get query embedding
         query_vector = await embed_query(query, use_local)
@@ -30,42 +48,31 @@ async def semantic_search(query: str, top_k: int = 5) -> dict:
                 "results": []
             }
         
-        # Query Upstash Vector
-        response = requests.post(
-            f"{vector_url.rstrip('/')}/query",
-            headers={
-                "Authorization": f"Bearer {vector_token}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "vector": query_vector,
-                "topK": top_k,
-                "includeMetadata": True,
-                "includeVectors": False
-            },
-            timeout=10
-        )
-        
-        if not response.ok:
-            return {
-                "error": f"Vector query failed: {response.status_code}",
-                "results": []
-            }
+        if backend == "local":
+            matches = store.query(query_vector, int(top_k))
+        else:
+            matches = await _query_upstash(vector_url, vector_token, query_vector, top_k)
+            if isinstance(matches, dict) and "error" in matches:
+                return {
+                    "error": matches["error"],
+                    "results": []
+                }
         
-        data = response.json()
         results = []
         
-        for match in data:
+        for match in matches:
+            metadata = match.get("metadata") or {}
             results.append({
                 "id": match.get("id", ""),
                 "score": match.get("score", 0.0),
-                "metadata": match.get("metadata", {}),
-                "text": match.get("metadata", {}).get("text", "")
+                "metadata": metadata,
+                "text": metadata.get("text") or metadata.get("content", "")
             })
         
         return {
             "query": query,
             "top_k": top_k,
+            "backend": backend,
             "results_found": len(results),
             "results": results
         }
@@ -76,23 +83,61 @@ async def semantic_search(query: str, top_k: int = 5) -> dict:
             "results": []
         }
 
+async def _query_upstash(vector_url: str, vector_token: str, query_vector: List[float], top_k: int):
+    """Top-k query against the remote Upstash Vector index"""
+    session = await get_http_session()
+    async with session.post(
+        f"{vector_url.rstrip('/')}/query",
+        headers={
+            "Authorization": f"Bearer {vector_token}",
+            "Content-Type": "application/json"
+        },
+        json={
+            "vector": query_vector,
+            "topK": top_k,
+            "includeMetadata": True,
+            "includeVectors": False
+        }
+    ) as response:
+        if not response.ok:
+            return {"error": f"Vector query failed: {response.status}"}
+        
+        data = await response.json(content_type=None)
+    
+    # Upstash wraps matches as {"result": [...]}
+    return data.get("result", []) if isinstance(data, dict) else data
+
 async def embed_query(query: str, use_local: bool = True) -> Optional[List[float]]:
     """
     Generate embedding vector for a query
+    Repeat queries are served from the shared embedding cache
     """
+    cache = get_embedding_cache(LOCAL_EMBEDDING_MODEL if use_local else f"openai:{OPENAI_EMBEDDING_MODEL}")
+    cached = await cache.aget(query)
+    if cached is not None:
+        return cached
+    
+    vector = await _embed_remote(query, use_local)
+    if vector:
+        await cache.aput(query, vector)
+    return vector
+
+async def _embed_remote(query: str, use_local: bool) -> Optional[List[float]]:
+    """Call the local embedding service or OpenAI"""
     try:
+        session = await get_http_session()
+        
         if use_local:
             # Use local embedding service
             local_url = os.getenv("LOCAL_EMBEDDING_SERVICE_URL", "http://127.0.0.1:8000")
-            response = requests.post(
+            async with session.post(
                 f"{local_url.rstrip('/')}/embed",
-                json={"input": query},
-                timeout=10
-            )
-            
-            if response.ok:
-                data = response.json()
-                return data.get("embedding", data.get("embeddings", [[]])[0])
+                headers={"Accept": f"{BINARY_MEDIA_TYPE}, application/json"},
+                json={"input": query, "format": EMBED_WIRE_FORMAT, "dtype": EMBED_WIRE_DTYPE}
+            ) as response:
+                if response.ok:
+                    body = await response.read()
+                    return decode_embed_response(body, response.headers.get("Content-Type"))[0]
         
         else:
             # Use OpenAI embeddings (fallback)
@@ -100,22 +145,20 @@ async def embed_query(query: str, use_local: bool = True) -> Optional[List[float
             if not openai_key:
                 return None
             
-            response = requests.post(
+            async with session.post(
                 "https://api.openai.com/v1/embeddings",
                 headers={
                     "Authorization": f"Bearer {openai_key}",
                     "Content-Type": "application/json"
                 },
                 json={
-                    "model": "text-embedding-3-small",
+                    "model": OPENAI_EMBEDDING_MODEL,
                     "input": query
-                },
-                timeout=10
-            )
-            
-            if response.ok:
-                data = response.json()
-                return data.get("data", [{}])[0].get("embedding")
+                }
+            ) as response:
+                if response.ok:
+                    data = await response.json(content_type=None)
+                    return data.get("data", [{}])[0].get("embedding")
         
         return None
     
@@ -134,16 +177,15 @@ async def get_vector_stats() -> dict:
         if not vector_url or not vector_token:
             return {"error": "Upstash Vector credentials not configured"}
         
-        response = requests.get(
+        session = await get_http_session()
+        async with session.get(
             f"{vector_url.rstrip('/')}/info",
-            headers={"Authorization": f"Bearer {vector_token}"},
-            timeout=10
-        )
-        
-        if response.ok:
-            return response.json()
-        
-        return {"error": f"Failed to get vector stats: {response.status_code}"}
+            headers={"Authorization": f"Bearer {vector_token}"}
+        ) as response:
+            if response.ok:
+                return await response.json(content_type=None)
+            
+            return {"error": f"Failed to get vector stats: {response.status}"}
     
     except Exception as e:
         return {"error": f"Stats query failed: {str(e)}"}
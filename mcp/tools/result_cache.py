@@ -0,0 +1,113 @@
+"""
+LRU + TTL cache for MCP tool results
+Keys combine the tool name, normalized arguments and the profile content hash,
+so any change to data/profile.json invalidates every cached result
+"""
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+def normalize_arguments(arguments: Optional[dict]) -> str:
+    """Canonical JSON for tool arguments: sorted keys, no None values, 5.0 == 5"""
+    def normalize(value):
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        if isinstance(value, dict):
+            return {k: normalize(v) for k, v in value.items() if v is not None}
+        if isinstance(value, (list, tuple)):
+            return [normalize(v) for v in value]
+        return value
+
+    return json.dumps(normalize(arguments or {}), sort_keys=True, separators=(",", ":"), default=str)
+
+
+class ToolResultCache:
+    """
+    Least-recently-used cache bounded by entry count, approximate bytes and TTL
+    Cached results are shared between callers and must be treated as read-only
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 8 * 1024 * 1024, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._profile_hash: Optional[str] = None
+        self._profile_version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(name: str, arguments: Optional[dict], profile_hash: str) -> str:
+        return f"{name}|{normalize_arguments(arguments)}|{profile_hash}"
+
+    def observe_profile(self, profile_hash: str, version: int = 0):
+        """
+        Drop everything when a newer profile content hash shows up
+        Requests still finishing on an older version do not flush the cache again
+        """
+        if version < self._profile_version:
+            return
+        if self._profile_hash is not None and profile_hash != self._profile_hash:
+            self.clear()
+            self.invalidations += 1
+        self._profile_hash = profile_hash
+        self._profile_version = version
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None
+        value, size, expires_at = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, value
+
+    def put(self, key: str, value: Any):
+        try:
+            size = len(json.dumps(value, default=str)) + len(key)
+        except (TypeError, ValueError):
+            return
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, size, time.monotonic() + self.ttl_seconds)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
@@ -0,0 +1,89 @@
+"""
+Crash-safe output for interview training runs
+Each Q&A record is appended and fsynced as soon as it completes, and a
+manifest next to the output records which (session, question, model,
+prompt hash) tuples are done, so an interrupted run can resume where it stopped
+"""
+import os
+import json
+import hashlib
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+
+RunKey = Tuple[str, str, str, str]
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+def append_jsonl(path: Path, record: dict):
+    """Append one JSON line and make it durable before returning"""
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def manifest_path_for(output: Path) -> Path:
+    output = Path(output)
+    return output.with_name(output.stem + ".manifest.jsonl")
+
+
+class RunManifest:
+    """Append-only JSONL of completed work items"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.done: Set[RunKey] = set()
+        self.sessions: List[Tuple[str, str]] = []  # (session, model) in first-seen order
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    key = (entry["session"], entry["question"], entry["model"], entry["prompt_hash"])
+                except (ValueError, KeyError, TypeError):
+                    continue  # torn last line from a crash
+                self.done.add(key)
+                if (key[0], key[2]) not in self.sessions:
+                    self.sessions.append((key[0], key[2]))
+
+    def is_done(self, session: str, question: str, model: str, phash: str) -> bool:
+        return (session, question, model, phash) in self.done
+
+    def mark_done(self, session: str, question: str, model: str, phash: str):
+        append_jsonl(self.path, {
+            "session": session, "question": question, "model": model,
+            "prompt_hash": phash, "completed_at": datetime.now().isoformat()
+        })
+        self.done.add((session, question, model, phash))
+        if (session, model) not in self.sessions:
+            self.sessions.append((session, model))
+
+    def latest_session(self, model: Optional[str] = None) -> Optional[str]:
+        for session, session_model in reversed(self.sessions):
+            if model is None or session_model == model:
+                return session
+        return None
+
+
+class TrainingLog:
+    """Q&A output file plus its manifest; the record is written before the manifest entry"""
+
+    def __init__(self, output: Path, manifest: Optional[Path] = None):
+        self.output = Path(output)
+        self.output.parent.mkdir(parents=True, exist_ok=True)
+        self.manifest = RunManifest(manifest or manifest_path_for(self.output))
+        self.written = 0
+
+    def record(self, qa: dict, model: str, phash: str):
+        # A crash between the two writes repeats one question on resume; it never loses one
+        append_jsonl(self.output, qa)
+        self.manifest.mark_done(qa.get("session", ""), qa["question"], model, phash)
+        self.written += 1
@@ -0,0 +1,148 @@
+"""
+Inverted index over portfolio STAR items
+Built once per loaded profile and shared by the portfolio and interview tools
+"""
+import heapq
+import math
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+# Fields indexed for every STAR item, in display order
+STAR_FIELDS = ("title", "situation", "task", "action", "result")
+
+# BM25F parameters: per-field boosts and length normalisation
+FIELD_WEIGHTS = {"title": 3.0, "situation": 1.0, "task": 1.0, "action": 2.0, "result": 1.5}
+FIELD_B = {"title": 0.5, "situation": 0.75, "task": 0.75, "action": 0.75, "result": 0.75}
+BM25_K1 = 1.2
+
+# Keeps dotted/suffixed tech names such as "next.js", "node.js" and "c#" intact
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.+#][a-z0-9]+)*[+#]*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase and split text into index terms"""
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+def _rank_key(entry: Tuple[int, float]) -> Tuple[float, int]:
+    """Order by score, breaking ties in profile order"""
+    return entry[1], -entry[0]
+
+
+class PortfolioIndex:
+    """
+    Tokenized inverted index: term -> {item position -> {field -> term frequency}}
+    """
+
+    def __init__(self, portfolio_data: dict):
+        self.source = portfolio_data
+        self.items: List[dict] = list(portfolio_data.get("star_items", []) or [])
+        self.postings: Dict[str, Dict[int, Dict[str, int]]] = {}
+        self.field_lengths: List[Dict[str, int]] = []
+
+        for doc_id, item in enumerate(self.items):
+            lengths = {}
+            for field in STAR_FIELDS:
+                terms = tokenize(item.get(field, "") or "")
+                lengths[field] = len(terms)
+                for term in terms:
+                    fields = self.postings.setdefault(term, {}).setdefault(doc_id, {})
+                    fields[field] = fields.get(field, 0) + 1
+            self.field_lengths.append(lengths)
+
+        # STAR payloads returned by the tools, built once instead of per call
+        self.star_views: List[dict] = [
+            {field: item.get(field, "") for field in STAR_FIELDS}
+            for item in self.items
+        ]
+
+        self.impacts = self._compute_impacts()
+        # Per-item keyword taxonomy hits, filled lazily by the portfolio tools
+        self.keyword_hits: Dict[int, FrozenSet[tuple]] = {}
+        self._interview_context: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def _compute_impacts(self) -> Dict[str, Dict[int, float]]:
+        """
+        Precompute the BM25F contribution of every (term, item) posting so a
+        query only sums impacts for its own terms
+        """
+        total = len(self.items)
+        avg_lengths = {
+            field: (sum(lengths[field] for lengths in self.field_lengths) / total) or 1.0
+            for field in STAR_FIELDS
+        } if total else {}
+
+        impacts: Dict[str, Dict[int, float]] = {}
+        for term, posting in self.postings.items():
+            df = len(posting)
+            idf = math.log(1.0 + (total - df + 0.5) / (df + 0.5))
+            term_impacts = {}
+            for doc_id, field_tf in posting.items():
+                lengths = self.field_lengths[doc_id]
+                pseudo_tf = 0.0
+                for field, tf in field_tf.items():
+                    b = FIELD_B[field]
+                    norm = 1.0 - b + b * lengths[field] / avg_lengths[field]
+                    pseudo_tf += FIELD_WEIGHTS[field] * tf / norm
+                term_impacts[doc_id] = idf * pseudo_tf / (BM25_K1 + pseudo_tf)
+            impacts[term] = term_impacts
+        return impacts
+
+    def bm25_search(self, query: str, top_k: Optional[int] = 10) -> Tuple[int, List[Tuple[int, float]]]:
+        """
+        Rank items for a query with BM25F
+        Returns (number of matching items, [(item position, score)] best first)
+        """
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            for doc_id, impact in self.impacts.get(term, {}).items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + impact
+
+        # Heap selection avoids sorting every match on large profiles
+        top_k = int(top_k) if top_k is not None else None
+        if top_k is None or top_k >= len(scores):
+            ranked = sorted(scores.items(), key=_rank_key, reverse=True)
+        else:
+            ranked = heapq.nlargest(max(top_k, 0), scores.items(), key=_rank_key)
+        return len(scores), ranked
+
+    def docs_for(self, term: str, fields: Optional[Iterable[str]] = None) -> Set[int]:
+        """Item positions containing term, optionally restricted to some fields"""
+        posting = self.postings.get(term)
+        if not posting:
+            return set()
+        if fields is None:
+            return set(posting)
+        wanted = set(fields)
+        return {doc_id for doc_id, tf in posting.items() if wanted.intersection(tf)}
+
+    @property
+    def interview_context(self) -> str:
+        """STAR summary of the first 8 items used as interview answer context"""
+        if self._interview_context is None:
+            context_parts = []
+            for item in self.items[:8]:
+                context = f"**{item.get('title', '')}**\n"
+                if item.get('situation'):
+                    context += f"Situation: {item.get('situation')}\n"
+                if item.get('task'):
+                    context += f"Task: {item.get('task')}\n"
+                if item.get('action'):
+                    context += f"Action: {item.get('action')}\n"
+                if item.get('result'):
+                    context += f"Result: {item.get('result')}\n"
+                context_parts.append(context)
+            self._interview_context = "\n\n".join(context_parts)
+        return self._interview_context
+
+    def star_view(self, doc_id: int) -> dict:
+        """Fresh copy of an item's STAR fields, safe for callers to mutate"""
+        return dict(self.star_views[doc_id])
+
+
+def build_index(portfolio_data: dict) -> PortfolioIndex:
+    """Build the index for a freshly loaded profile (held by its PortfolioSnapshot)"""
+    return PortfolioIndex(portfolio_data)
@@ -0,0 +1,166 @@
+"""
+In-process vector index for small corpora
+Keeps every embedding in one contiguous, L2-normalized float32 matrix so a
+top-k cosine query is a single matrix-vector product plus argpartition
+"""
+import os
+import re
+import json
+import time
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    # numpy is only needed for the local vector backend
+    np = None
+
+DEFAULT_STORE_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "vector_store" / "portfolio"
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("numpy is required for the local vector store (pip install numpy)")
+
+
+class LocalVectorStore:
+    """
+    Files for a store at <prefix>:
+      <prefix>.<version>.npy  float32 matrix, rows normalized to unit length (memory-mapped on load)
+      <prefix>.json           {"model", "dim", "matrix", "ids", "metadata"}, aligned with the
+                              rows of the matrix file it names
+    Each save writes a new matrix file and then swaps the sidecar, so a reader
+    always pairs metadata with the matrix it was written for.
+    """
+
+    def __init__(self, matrix, ids: List[str], metadata: List[dict], model: Optional[str] = None):
+        _require_numpy()
+        if len(ids) != len(metadata) or len(ids) != matrix.shape[0]:
+            raise ValueError("ids, metadata and matrix rows must align")
+        self.matrix = matrix
+        self.ids = ids
+        self.metadata = metadata
+        self.model = model
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return int(self.matrix.shape[1]) if self.matrix.ndim == 2 else 0
+
+    @classmethod
+    def build(cls, ids: List[str], vectors: Sequence[Sequence[float]], metadata: List[dict],
+              model: Optional[str] = None) -> "LocalVectorStore":
+        """Create a store from raw vectors, normalizing each row once"""
+        _require_numpy()
+        if not len(ids):
+            return cls(np.zeros((0, 0), dtype=np.float32), [], [], model)
+        matrix = np.ascontiguousarray(np.asarray(vectors, dtype=np.float32))
+        if matrix.ndim != 2:
+            matrix = matrix.reshape(len(ids), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+        return cls(matrix, list(ids), list(metadata), model)
+
+    @staticmethod
+    def _sidecar_path(prefix: Path) -> Path:
+        return prefix.with_suffix(".json")
+
+    @staticmethod
+    def _matrix_name(sidecar_path: Path, sidecar: dict) -> str:
+        # Stores written before versioned matrices keep theirs at <prefix>.npy
+        return sidecar.get("matrix") or sidecar_path.stem + ".npy"
+
+    def save(self, prefix: Path):
+        """
+        Write a new versioned matrix, then atomically replace the sidecar that
+        points at it; readers see either the old store or the new one, whole
+        """
+        prefix = Path(prefix)
+        prefix.parent.mkdir(parents=True, exist_ok=True)
+        json_path = self._sidecar_path(prefix)
+        previous = None
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                previous = self._matrix_name(json_path, json.load(f))
+        except (OSError, ValueError):
+            pass
+
+        matrix_name = f"{json_path.stem}.{time.time_ns():x}.npy"
+        tmp_npy = json_path.with_name(matrix_name + ".tmp")
+        tmp_json = json_path.with_suffix(".json.tmp")
+        with open(tmp_npy, "wb") as f:
+            np.save(f, np.ascontiguousarray(self.matrix, dtype=np.float32))
+        os.replace(tmp_npy, json_path.with_name(matrix_name))
+        with open(tmp_json, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model, "dim": self.dim, "matrix": matrix_name,
+                       "ids": self.ids, "metadata": self.metadata}, f)
+        os.replace(tmp_json, json_path)
+        self._prune(json_path, keep={matrix_name, previous})
+
+    @staticmethod
+    def _prune(json_path: Path, keep: set):
+        """
+        Remove matrices older than the previous one; that one is kept for
+        readers that loaded the old sidecar just before the swap
+        """
+        versioned = re.compile(re.escape(json_path.stem) + r"(\.[0-9a-f]+)?\.npy")
+        for path in json_path.parent.iterdir():
+            if versioned.fullmatch(path.name) and path.name not in keep:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass  # still mapped by a reader on Windows; removed by a later save
+
+    @classmethod
+    def load(cls, prefix: Path, mmap: bool = True) -> "LocalVectorStore":
+        _require_numpy()
+        json_path = cls._sidecar_path(Path(prefix))
+        with open(json_path, "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        matrix = np.load(json_path.with_name(cls._matrix_name(json_path, sidecar)),
+                         mmap_mode="r" if mmap else None)
+        return cls(matrix, sidecar["ids"], sidecar["metadata"], sidecar.get("model"))
+
+    def query(self, vector: Sequence[float], top_k: int = 5) -> List[dict]:
+        """Top-k rows by cosine similarity, best first"""
+        count = len(self.ids)
+        top_k = min(int(top_k), count)
+        if top_k <= 0:
+            return []
+        q = np.asarray(vector, dtype=np.float32)
+        if q.shape[0] != self.dim:
+            raise ValueError(f"Query dimension {q.shape[0]} != store dimension {self.dim}")
+        norm = float(np.linalg.norm(q))
+        if norm:
+            q = q / norm
+        scores = self.matrix @ q
+        if top_k < count:
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            top = np.arange(count)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            {"id": self.ids[i], "score": float(scores[i]), "metadata": self.metadata[i]}
+            for i in top
+        ]
+
+
+_LOADED: Optional[Tuple[tuple, LocalVectorStore]] = None
+
+
+def get_local_store(prefix: Optional[Path] = None) -> LocalVectorStore:
+    """
+    Load (and memoize) the configured store, reloading when the indexer rewrites
+    it; the sidecar names its matrix, so its stat identifies the whole store
+    """
+    global _LOADED
+    prefix = Path(prefix or os.getenv("LOCAL_VECTOR_STORE", str(DEFAULT_STORE_PATH)))
+    st = os.stat(prefix.with_suffix(".json"))
+    stat_key = (str(prefix), st.st_mtime_ns, st.st_size)
+    if _LOADED is None or _LOADED[0] != stat_key:
+        _LOADED = (stat_key, LocalVectorStore.load(prefix))
+    return _LOADED[1]
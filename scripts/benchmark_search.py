@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+scripts/benchmark_search.py
+
+Compare the BM25F-ranked search_experience against the original substring
+keyword counter, for both latency and ranking quality.
+
+Latency is measured on the real profile replicated --scale times (ids and titles
+made unique) so the effect of profile size is visible. Ranking quality uses a
+small set of labelled queries against the unreplicated profile and reports
+precision@1 and mean reciprocal rank (MRR).
+
+Usage:
+  python scripts/benchmark_search.py
+  python scripts/benchmark_search.py --scale 200 --repeat 50 --top-k 5
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'mcp'))
+
+from tools.portfolio_tools import search_experience  # noqa: E402
+from tools.search_index import build_index  # noqa: E402
+
+
+# query -> id of the STAR item a recruiter would expect first
+LABELLED_QUERIES = {
+    'laravel movie reviews': 'proj-movie-reviews-laravel',
+    'oauth authentication': 'proj-person-app-enhanced',
+    'crud operations person app': 'proj-person-crud-app',
+    'student management': 'proj-student-management-system',
+    'rag chatbot vector search': 'proj-rag-chatbot',
+    'e-commerce api': 'proj-api-ecommerce-laravel',
+    'community health monitoring': 'proj-community-health-monitoring',
+    'cv website ai generation': 'proj-professional-cv-website',
+    'development environment setup': 'proj-dev-environment-setup',
+    'digital twin portfolio': 'proj-digital-twin-portfolio',
+}
+
+
+def legacy_search_experience(keywords: str, portfolio_data: dict) -> dict:
+    """The original implementation: substring keyword counting, full sort"""
+    keywords_lower = keywords.lower().split()
+    matches = []
+
+    for item in portfolio_data.get("star_items", []):
+        text = " ".join([
+            item.get("title", ""),
+            item.get("situation", ""),
+            item.get("task", ""),
+            item.get("action", ""),
+            item.get("result", "")
+        ]).lower()
+
+        match_count = sum(1 for kw in keywords_lower if kw in text)
+
+        if match_count > 0:
+            matches.append({
+                "id": item.get("id", ""),
+                "title": item.get("title", ""),
+                "match_score": match_count,
+            })
+
+    matches.sort(key=lambda x: x["match_score"], reverse=True)
+    return {"keywords": keywords, "matches_found": len(matches), "results": matches}
+
+
+def replicate_profile(profile: dict, scale: int) -> dict:
+    items = []
+    for n in range(scale):
+        for item in profile.get('star_items', []):
+            copy = dict(item)
+            copy['id'] = f"{item.get('id', 'item')}-{n}"
+            copy['title'] = f"{item.get('title', '')} #{n}"
+            items.append(copy)
+    return {**profile, 'star_items': items}
+
+
+def ranked_ids(result: dict, profile: dict) -> List[str]:
+    by_title = {item.get('title'): item.get('id') for item in profile.get('star_items', [])}
+    return [r.get('id') or by_title.get(r.get('title')) for r in result.get('results', [])]
+
+
+def time_calls(fn: Callable[[str], dict], queries: List[str], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        for q in queries:
+            start = time.perf_counter()
+            fn(q)
+            samples.append((time.perf_counter() - start) * 1000.0)
+    return samples
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def ranking_quality(fn: Callable[[str], dict], profile: dict) -> Dict[str, float]:
+    hits_at_1 = 0
+    reciprocal_ranks = []
+    for query, expected in LABELLED_QUERIES.items():
+        ids = ranked_ids(fn(query), profile)
+        rank = ids.index(expected) + 1 if expected in ids else None
+        hits_at_1 += 1 if rank == 1 else 0
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+    return {
+        'p@1': hits_at_1 / len(LABELLED_QUERIES),
+        'mrr': statistics.mean(reciprocal_ranks),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark search_experience ranking engines')
+    parser.add_argument('--input', default='data/profile.json', help='Path to profile.json')
+    parser.add_argument('--scale', type=int, default=100, help='Replicate the profile this many times for latency')
+    parser.add_argument('--repeat', type=int, default=20, help='Passes over the query set per engine')
+    parser.add_argument('--top-k', type=int, default=10, help='top_k passed to the BM25 engine')
+    args = parser.parse_args()
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        profile = json.load(f)
+
+    loop = asyncio.new_event_loop()
+
+    def bm25_for(data: dict) -> Callable[[str], dict]:
+        index = build_index(data)
+        return lambda q: loop.run_until_complete(search_experience(q, index, args.top_k))
+
+    def legacy_for(data: dict) -> Callable[[str], dict]:
+        return lambda q: legacy_search_experience(q, data)
+
+    print(f"📊 Ranking quality on {len(LABELLED_QUERIES)} labelled queries "
+          f"({len(profile.get('star_items', []))} items)")
+    for name, fn in (('legacy', legacy_for(profile)), ('bm25f', bm25_for(profile))):
+        quality = ranking_quality(fn, profile)
+        print(f"  {name:<7} p@1={quality['p@1']:.2f}  mrr={quality['mrr']:.3f}")
+
+    large = replicate_profile(profile, args.scale)
+    start = time.perf_counter()
+    build_index(large)
+    build_ms = (time.perf_counter() - start) * 1000.0
+    queries = list(LABELLED_QUERIES)
+
+    print(f"\n⏱️  Latency over {len(large['star_items'])} items "
+          f"({args.repeat} x {len(queries)} queries, index build {build_ms:.1f} ms)")
+    for name, fn in (('legacy', legacy_for(large)), ('bm25f', bm25_for(large))):
+        samples = time_calls(fn, queries, args.repeat)
+        print(f"  {name:<7} p50={percentile(samples, 50):.3f} ms  "
+              f"p99={percentile(samples, 99):.3f} ms  mean={statistics.mean(samples):.3f} ms")
+
+    loop.close()
+
+
+if __name__ == '__main__':
+    main()
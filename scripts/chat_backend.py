@@ -3,15 +3,21 @@
 scripts/chat_backend.py
 
 FastAPI backend for chat that:
- - loads session history from Upstash Redis (REST /commands)
+ - loads session history from Upstash Redis (REST /pipeline)
  - embeds the user's query (local embed server or OpenAI)
  - queries Upstash Vector for top-k matches
  - builds a prompt including context and asks Ollama
  - persists updated history back to Upstash Redis
  - returns JSON { reply, matches }
+ - POST /chat/stream streams the same pipeline as NDJSON (or SSE): matches first,
+   then tokens as Ollama generates them
+
+History loading and query embedding run concurrently, and history is written
+back by a background task after the reply is sent. Each response carries a
+Server-Timing header (and a "timings" field) with per-stage milliseconds.
 
 Run:
-  python -m pip install fastapi uvicorn requests
+  python -m pip install fastapi uvicorn aiohttp
   uvicorn scripts.chat_backend:app --reload --port 5000
 
 Env vars:
@@ -22,14 +28,27 @@ Env vars:
   OLLAMA_URL, OLLAMA_MODEL
 """
 
-from typing import List, Any, Optional
+from typing import List, Any, AsyncIterator, Awaitable, Dict, Optional, Set
 import os
+import sys
 import json
-import requests
-from fastapi import FastAPI, HTTPException
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import aiohttp
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-app = FastAPI(title="Chat Backend")
+# Shared helpers live with the MCP tools
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'mcp'))
+from tools.embedding_cache import get_embedding_cache  # noqa: E402
+from tools.embedding_codec import BINARY_MEDIA_TYPE, decode_embed_response  # noqa: E402
+from tools.history_store import SessionHistoryCache, create_history_store  # noqa: E402
+from tools.prompt_budget import budget_from_env  # noqa: E402
+from tools.http_client import close_http_session, get_http_session, open_http_session  # noqa: E402
 
 # Environment
 UPSTASH_REDIS_REST_URL = os.getenv('UPSTASH_REDIS_REST_URL')
@@ -40,7 +59,10 @@ UPSTASH_VECTOR_INDEX = os.getenv('UPSTASH_VECTOR_INDEX')
 
 USE_LOCAL = str(os.getenv('USE_LOCAL_EMBEDDINGS', '')).lower() == 'true'
 LOCAL_EMBEDDING_URL = os.getenv('LOCAL_EMBEDDING_URL', 'http://127.0.0.1:8000')
+LOCAL_EMBEDDING_MODEL = os.getenv('LOCAL_EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
 EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'text-embedding-3-small')
+EMBED_WIRE_FORMAT = os.getenv('EMBED_WIRE_FORMAT', 'binary')
+EMBED_WIRE_DTYPE = os.getenv('EMBED_WIRE_DTYPE', 'float32')
 
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
@@ -50,6 +72,24 @@ OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama2')
 MAX_HISTORY = int(os.getenv('MAX_HISTORY_MESSAGES', '20'))
 SESSION_TTL = int(os.getenv('SESSION_TTL_SECONDS', '86400'))
 
+# Keeps prompt size (and Ollama prefill time) flat as sessions grow
+PROMPT_BUDGET = budget_from_env()
+
+# One pipelined round trip per load and per saved turn; None (no history) when Redis is not configured
+HISTORY_STORE = create_history_store(
+    UPSTASH_REDIS_REST_URL, UPSTASH_REDIS_REST_TOKEN,
+    transaction=os.getenv('HISTORY_TRANSACTION', 'false').lower() == 'true'
+)
+# Write-behind session cache: repeat turns skip the Redis read, writes are coalesced.
+# Opt-in (HISTORY_WRITE_BEHIND=true): assumes this process is the only writer for a session.
+SESSION_CACHE = SessionHistoryCache(
+    HISTORY_STORE, MAX_HISTORY, ttl=SESSION_TTL,
+    max_sessions=int(os.getenv('SESSION_CACHE_MAX_SESSIONS', '1000')),
+    idle_seconds=float(os.getenv('SESSION_CACHE_IDLE_SECONDS', '900')),
+    flush_interval=float(os.getenv('HISTORY_FLUSH_SECONDS', '2')),
+    flush_max_pending=int(os.getenv('HISTORY_FLUSH_MAX_PENDING', '64'))
+) if HISTORY_STORE is not None and os.getenv('HISTORY_WRITE_BEHIND', 'false').lower() == 'true' else None
+
 
 class ChatRequest(BaseModel):
     sessionId: Optional[str] = 'anonymous'
@@ -57,87 +97,118 @@ class ChatRequest(BaseModel):
     top_k: Optional[int] = 3
 
 
-def upstash_redis_command(command: List[Any]):
-    if not UPSTASH_REDIS_REST_URL or not UPSTASH_REDIS_REST_TOKEN:
-        raise RuntimeError('Missing Upstash Redis REST URL/token')
-    url = UPSTASH_REDIS_REST_URL.rstrip('/') + '/commands'
-    headers = {'Authorization': f'Bearer {UPSTASH_REDIS_REST_TOKEN}', 'Content-Type': 'application/json'}
-    r = requests.post(url, json={'command': command}, headers=headers, timeout=20)
-    if r.status_code >= 400:
-        raise RuntimeError(f'Upstash Redis command failed: {r.status_code} {r.text}')
-    return r.json().get('result')
-
+def _timeout(total: Optional[float], sock_read: Optional[float] = None) -> aiohttp.ClientTimeout:
+    return aiohttp.ClientTimeout(total=total, sock_connect=10, sock_read=sock_read)
 
-def redis_lrange(key: str, start: int, stop: int):
-    return upstash_redis_command(['LRANGE', key, str(start), str(stop)])
 
+class StageTimer:
+    """Collects per-stage wall time (ms) for one request"""
 
-def redis_lpush(key: str, *values: Any):
-    return upstash_redis_command(['LPUSH', key, *[json.dumps(v) if not isinstance(v, str) else v for v in values]])
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
 
+    async def run(self, name: str, awaitable: Awaitable):
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.record(name, start)
 
-def redis_ltrim(key: str, start: int, stop: int):
-    return upstash_redis_command(['LTRIM', key, str(start), str(stop)])
+    def record(self, name: str, start: float):
+        self.stages[name] = round((time.perf_counter() - start) * 1000, 1)
 
+    def summary(self) -> Dict[str, float]:
+        return {**self.stages, 'total': round((time.perf_counter() - self.started) * 1000, 1)}
 
-def redis_expire(key: str, seconds: int):
-    return upstash_redis_command(['EXPIRE', key, str(seconds)])
+    def header(self) -> str:
+        return ', '.join(f'{name};dur={ms}' for name, ms in self.summary().items())
 
 
-def embed_text_local(text: str):
+async def embed_text_local(text: str):
+    cache = get_embedding_cache(LOCAL_EMBEDDING_MODEL)
+    cached = await cache.aget(text)
+    if cached is not None:
+        return cached
     url = LOCAL_EMBEDDING_URL.rstrip('/') + '/embed'
-    r = requests.post(url, json={'input': text}, timeout=30)
-    if not r.ok:
-        raise RuntimeError(f'Local embed error {r.status_code}: {r.text}')
-    j = r.json()
-    if 'embedding' in j:
-        return j['embedding']
-    if 'embeddings' in j:
-        return j['embeddings'][0]
-    raise RuntimeError('Local embed returned unexpected shape')
-
-
-def embed_text_openai(text: str):
+    body = {'input': text, 'format': EMBED_WIRE_FORMAT, 'dtype': EMBED_WIRE_DTYPE}
+    headers = {'Accept': f'{BINARY_MEDIA_TYPE}, application/json'}
+    session = await get_http_session()
+    async with session.post(url, json=body, headers=headers, timeout=_timeout(30)) as r:
+        if r.status >= 400:
+            raise RuntimeError(f'Local embed error {r.status}: {await r.text()}')
+        content = await r.read()
+        content_type = r.headers.get('Content-Type')
+    try:
+        emb = decode_embed_response(content, content_type)[0]
+    except (ValueError, KeyError, IndexError) as e:
+        raise RuntimeError(f'Local embed returned unexpected shape: {e}')
+    await cache.aput(text, emb)
+    return emb
+
+
+async def embed_text_openai(text: str):
+    cache = get_embedding_cache(f'openai:{EMBEDDING_MODEL}')
+    cached = await cache.aget(text)
+    if cached is not None:
+        return cached
     if not OPENAI_API_KEY:
         raise RuntimeError('OPENAI_API_KEY missing')
     url = 'https://api.openai.com/v1/embeddings'
     headers = {'Authorization': f'Bearer {OPENAI_API_KEY}', 'Content-Type': 'application/json'}
     body = {'model': EMBEDDING_MODEL, 'input': text}
-    r = requests.post(url, json=body, headers=headers, timeout=30)
-    if not r.ok:
-        raise RuntimeError(f'OpenAI embed error {r.status_code}: {r.text}')
-    j = r.json()
-    return j['data'][0]['embedding']
+    session = await get_http_session()
+    async with session.post(url, json=body, headers=headers, timeout=_timeout(30)) as r:
+        if r.status >= 400:
+            raise RuntimeError(f'OpenAI embed error {r.status}: {await r.text()}')
+        j = await r.json(content_type=None)
+    emb = j['data'][0]['embedding']
+    await cache.aput(text, emb)
+    return emb
 
 
-def query_upstash_vector(vector: List[float], top_k: int):
+async def query_upstash_vector(vector: List[float], top_k: int):
     if not UPSTASH_VECTOR_REST_URL or not UPSTASH_VECTOR_REST_TOKEN or not UPSTASH_VECTOR_INDEX:
         raise RuntimeError('Missing Upstash Vector configuration env vars')
     url = UPSTASH_VECTOR_REST_URL.rstrip('/') + f'/v1/index/{UPSTASH_VECTOR_INDEX}/query'
     headers = {'Authorization': f'Bearer {UPSTASH_VECTOR_REST_TOKEN}', 'Content-Type': 'application/json'}
     payload = {'vector': vector, 'top_k': top_k, 'include_metadata': True}
-    r = requests.post(url, json=payload, headers=headers, timeout=30)
-    if not r.ok:
-        raise RuntimeError(f'Upstash Vector query error {r.status_code}: {r.text}')
-    return r.json()
-
-
-def build_prompt_from_context(context_texts: List[str], question: str) -> str:
-    ctx = '\n'.join([f"- {c}" for c in context_texts if c])
-    prompt = f"Use the following context to answer the question. If the answer isn't in the context, say you don't know.\n\nContext:\n{ctx}\n\nUser: {question}\nAssistant:"
-    return prompt
-
-
-def call_ollama(prompt: str, max_tokens: int = 800, temperature: float = 0.2):
+    session = await get_http_session()
+    async with session.post(url, json=payload, headers=headers, timeout=_timeout(30)) as r:
+        if r.status >= 400:
+            raise RuntimeError(f'Upstash Vector query error {r.status}: {await r.text()}')
+        return await r.json(content_type=None)
+
+
+def build_prompt_from_context(context_texts: List[str], question: str,
+                              history: Optional[List[dict]] = None, session: Optional[str] = None) -> str:
+    instructions = "Use the following context to answer the question. If the answer isn't in the context, say you don't know."
+    question_text = f"User: {question}\nAssistant:"
+    parts = PROMPT_BUDGET.fit(f"{instructions}\n\n{question_text}", context_texts, history or [], session)
+    ctx = '\n'.join([f"- {c}" for c in parts.context])
+    sections = [instructions, f"Context:\n{ctx}"]
+    if parts.summary:
+        sections.append(f"Earlier in the conversation (summary):\n{parts.summary}")
+    if parts.history:
+        turns = '\n'.join(f"{'Assistant' if m.get('role') == 'assistant' else 'User'}: {m.get('content', '')}"
+                          for m in parts.history)
+        sections.append(f"Conversation so far:\n{turns}")
+    sections.append(question_text)
+    return '\n\n'.join(sections)
+
+
+async def call_ollama(prompt: str, max_tokens: int = 800, temperature: float = 0.2):
     url = OLLAMA_URL.rstrip('/') + '/api/generate'
     payload = {'model': OLLAMA_MODEL, 'prompt': prompt, 'max_tokens': max_tokens, 'temperature': temperature}
-    r = requests.post(url, json=payload, headers={'Content-Type': 'application/json'}, timeout=60)
-    if not r.ok:
-        raise RuntimeError(f'Ollama error {r.status_code}: {r.text}')
+    session = await get_http_session()
+    async with session.post(url, json=payload, headers={'Content-Type': 'application/json'}, timeout=_timeout(60)) as r:
+        text = await r.text()
+        if r.status >= 400:
+            raise RuntimeError(f'Ollama error {r.status}: {text}')
     try:
-        j = r.json()
+        j = json.loads(text)
     except Exception:
-        return r.text
+        return text
     # Accept several shapes
     if isinstance(j, dict):
         for k in ('text', 'output', 'result'):
@@ -150,50 +221,36 @@ def call_ollama(prompt: str, max_tokens: int = 800, temperature: float = 0.2):
     return str(j)
 
 
-@app.post('/chat')
-def chat(req: ChatRequest):
-    if not req.message or not isinstance(req.message, str):
-        raise HTTPException(status_code=400, detail='missing message')
-
-    sid = req.sessionId or 'anonymous'
-    key = f'chatHistory:{sid}'
-
-    # 1) Load history from Upstash Redis (newest-first) and reverse to chronological
+async def load_history(key: str) -> List[dict]:
+    """Load history (chronological) from the session cache or the history store"""
     try:
-        raw = redis_lrange = redis_lrange  # type: ignore
-        raw = redis_lrange(key, 0, MAX_HISTORY - 1) if UPSTASH_REDIS_REST_URL else []
+        if SESSION_CACHE is not None:
+            return await SESSION_CACHE.load(key)
+        if HISTORY_STORE is None:
+            return []
+        return await HISTORY_STORE.aload(key, MAX_HISTORY)
     except Exception as e:
-        raw = []
         print('Warning: failed to load history', e)
+        return []
 
-    history = []
-    try:
-        for s in list(raw)[::-1]:
-            try:
-                history.append(json.loads(s))
-            except Exception:
-                history.append({'role': 'user', 'content': str(s)})
-    except Exception:
-        history = []
-
-    messages_for_model = history + [{'role': 'user', 'content': req.message}]
 
-    # 2) Embed the query
+async def embed_query(message: str) -> Optional[List[float]]:
     try:
         if USE_LOCAL:
-            q_emb = embed_text_local(req.message)
-        else:
-            q_emb = embed_text_openai(req.message)
+            return await embed_text_local(message)
+        return await embed_text_openai(message)
     except Exception as e:
         print('Embed error, continuing without semantic context:', e)
-        q_emb = None
+        return None
+
 
-    # 3) Query Upstash Vector if we have an embedding
+async def search_context(q_emb: Optional[List[float]], top_k: int):
+    """Fetch matching chunks for an embedding; returns (context_texts, matches)"""
     context_texts = []
     matches = []
     if q_emb is not None:
         try:
-            qres = query_upstash_vector(q_emb, req.top_k or 3)
+            qres = await query_upstash_vector(q_emb, top_k)
             # Upstash returns a variety of shapes; try to extract 'results' or 'matches'
             entries = qres.get('results') or qres.get('matches') or qres.get('data') or []
             # entries may be list of {id, score, metadata}
@@ -214,33 +271,184 @@ def chat(req: ChatRequest):
                 matches.append(md or e)
         except Exception as e:
             print('Vector query error, continuing without context:', e)
+    return context_texts, matches
+
+
+async def prepare_turn(key: str, message: str, top_k: int, timer: StageTimer):
+    """History load and query embedding are independent, so they run concurrently"""
+    history, q_emb = await asyncio.gather(
+        timer.run('history', load_history(key)),
+        timer.run('embed', embed_query(message))
+    )
+    context_texts, matches = await timer.run('vector', search_context(q_emb, top_k))
+    return history, context_texts, matches
+
+
+async def call_openai_chat(messages: List[dict]) -> str:
+    headers = {'Authorization': f'Bearer {OPENAI_API_KEY}', 'Content-Type': 'application/json'}
+    body = {'model': os.getenv('OPENAI_CHAT_MODEL', 'gpt-4o-mini'), 'messages': messages, 'max_tokens': 800}
+    session = await get_http_session()
+    async with session.post('https://api.openai.com/v1/chat/completions', json=body, headers=headers,
+                            timeout=_timeout(30)) as r:
+        r.raise_for_status()
+        od = await r.json(content_type=None)
+    return od['choices'][0]['message']['content']
+
+
+async def persist_turn(key: str, message: str, reply: str):
+    """Persist the turn (push, trim, expire) in one pipelined request, or queue it for write-behind"""
+    turn = [{'role': 'user', 'content': message}, {'role': 'assistant', 'content': reply}]
+    try:
+        if SESSION_CACHE is not None:
+            await SESSION_CACHE.append(key, turn)
+        elif HISTORY_STORE is not None:
+            await HISTORY_STORE.aappend(key, turn, max_len=MAX_HISTORY, ttl=SESSION_TTL)
+    except Exception as e:
+        print('Warning: failed to persist history', e)
+
+
+# History writes run off the request path; keep references so they finish
+_PENDING_WRITES: Set[asyncio.Task] = set()
+
+
+def schedule_persist(key: str, message: str, reply: str):
+    task = asyncio.create_task(persist_turn(key, message, reply))
+    _PENDING_WRITES.add(task)
+    task.add_done_callback(_PENDING_WRITES.discard)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await open_http_session()
+    if SESSION_CACHE is not None:
+        SESSION_CACHE.start()
+    try:
+        yield
+    finally:
+        if _PENDING_WRITES:
+            await asyncio.gather(*_PENDING_WRITES, return_exceptions=True)
+        if SESSION_CACHE is not None:
+            await SESSION_CACHE.stop()
+        await close_http_session()
+
+
+app = FastAPI(title="Chat Backend", lifespan=lifespan)
+
+
+@app.post('/chat')
+async def chat(req: ChatRequest, response: Response):
+    if not req.message or not isinstance(req.message, str):
+        raise HTTPException(status_code=400, detail='missing message')
+
+    sid = req.sessionId or 'anonymous'
+    key = f'chatHistory:{sid}'
+    timer = StageTimer()
+
+    # 1-3) Load history and embed the query concurrently, then retrieve context
+    history, context_texts, matches = await prepare_turn(key, req.message, req.top_k or 3, timer)
+    messages_for_model = history + [{'role': 'user', 'content': req.message}]
 
     # 4) Build prompt and call Ollama
-    prompt = build_prompt_from_context(context_texts, req.message)
+    prompt = build_prompt_from_context(context_texts, req.message, history, key)
+    started = time.perf_counter()
     try:
-        reply = call_ollama(prompt)
+        reply = await call_ollama(prompt)
     except Exception as e:
         # fallback to OpenAI chat if available
         if OPENAI_API_KEY:
             try:
-                headers = {'Authorization': f'Bearer {OPENAI_API_KEY}', 'Content-Type': 'application/json'}
-                body = {'model': os.getenv('OPENAI_CHAT_MODEL','gpt-4o-mini'), 'messages': messages_for_model, 'max_tokens': 800}
-                r = requests.post('https://api.openai.com/v1/chat/completions', json=body, headers=headers, timeout=30)
-                r.raise_for_status()
-                od = r.json()
-                reply = od['choices'][0]['message']['content']
+                reply = await call_openai_chat(messages_for_model)
             except Exception as oe:
                 raise HTTPException(status_code=502, detail=f'LLM error: Ollama failed: {e}; OpenAI fallback failed: {oe}')
         else:
             raise HTTPException(status_code=502, detail=f'LLM error: Ollama failed: {e}')
+    timer.record('generate', started)
 
-    # 5) Persist history back to Upstash Redis
-    try:
-        redis_lpush(key, {'role': 'user', 'content': req.message})
-        redis_lpush(key, {'role': 'assistant', 'content': reply})
-        redis_ltrim(key, 0, MAX_HISTORY - 1)
-        redis_expire(key, SESSION_TTL)
-    except Exception as e:
-        print('Warning: failed to persist history', e)
+    # 5) Persist history in the background
+    schedule_persist(key, req.message, reply)
+
+    response.headers['Server-Timing'] = timer.header()
+    return {'reply': reply, 'matches': matches, 'timings': timer.summary()}
+
+
+@app.get('/stats')
+async def stats():
+    return {'session_cache': SESSION_CACHE.stats() if SESSION_CACHE is not None else None}
+
+
+async def stream_ollama(prompt: str, max_tokens: int = 800, temperature: float = 0.2) -> AsyncIterator[str]:
+    """Yield response tokens from Ollama's streaming /api/generate as they arrive"""
+    url = OLLAMA_URL.rstrip('/') + '/api/generate'
+    payload = {'model': OLLAMA_MODEL, 'prompt': prompt, 'stream': True,
+               'max_tokens': max_tokens, 'temperature': temperature}
+    session = await get_http_session()
+    # Read timeout applies between chunks, not to the whole generation
+    async with session.post(url, json=payload, timeout=_timeout(None, sock_read=60)) as r:
+        if r.status >= 400:
+            raise RuntimeError(f'Ollama error {r.status}: {await r.text()}')
+        async for line in r.content:
+            if not line.strip():
+                continue
+            chunk = json.loads(line)
+            if chunk.get('error'):
+                raise RuntimeError(f"Ollama error: {chunk['error']}")
+            if chunk.get('response'):
+                yield chunk['response']
+            if chunk.get('done'):
+                break
+
+
+def format_event(event: dict, sse: bool) -> str:
+    data = json.dumps(event)
+    return f"event: {event['type']}\ndata: {data}\n\n" if sse else data + '\n'
+
+
+@app.post('/chat/stream')
+async def chat_stream(req: ChatRequest, request: Request):
+    """
+    Streaming /chat: NDJSON by default, Server-Sent Events with Accept: text/event-stream
+    Events: {"type": "matches"} first, then {"type": "token"} per chunk, then
+    {"type": "done"} (or {"type": "error"}). History is persisted only after a complete reply.
+    """
+    if not req.message or not isinstance(req.message, str):
+        raise HTTPException(status_code=400, detail='missing message')
 
-    return {'reply': reply, 'matches': matches}
+    sid = req.sessionId or 'anonymous'
+    key = f'chatHistory:{sid}'
+    sse = 'text/event-stream' in request.headers.get('accept', '')
+
+    async def events():
+        timer = StageTimer()
+        history, context_texts, matches = await prepare_turn(key, req.message, req.top_k or 3, timer)
+        messages_for_model = history + [{'role': 'user', 'content': req.message}]
+        yield format_event({'type': 'matches', 'matches': matches}, sse)
+
+        prompt = build_prompt_from_context(context_texts, req.message, history, key)
+        parts: List[str] = []
+        started = time.perf_counter()
+        try:
+            async for token in stream_ollama(prompt):
+                if not parts:
+                    timer.record('first_token', started)
+                parts.append(token)
+                yield format_event({'type': 'token', 'content': token}, sse)
+        except Exception as e:
+            if parts or not OPENAI_API_KEY:
+                # Tokens already went out; a fallback would contradict them
+                yield format_event({'type': 'error', 'detail': f'LLM error: Ollama failed: {e}'}, sse)
+                return
+            try:
+                reply = await call_openai_chat(messages_for_model)
+            except Exception as oe:
+                yield format_event({'type': 'error', 'detail': f'LLM error: Ollama failed: {e}; OpenAI fallback failed: {oe}'}, sse)
+                return
+            parts.append(reply)
+            yield format_event({'type': 'token', 'content': reply}, sse)
+        timer.record('generate', started)
+
+        reply = ''.join(parts).strip()
+        schedule_persist(key, req.message, reply)
+        yield format_event({'type': 'done', 'reply': reply, 'timings': timer.summary()}, sse)
+
+    media_type = 'text/event-stream' if sse else 'application/x-ndjson'
+    return StreamingResponse(events(), media_type=media_type, headers={'Cache-Control': 'no-cache'})
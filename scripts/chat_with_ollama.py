@@ -26,45 +26,31 @@ Usage:
   python scripts/chat_with_ollama.py --session mysession
 
 This script uses RAG to retrieve portfolio context before generating responses.
+Ollama's returned context is stored per session (ollamaContext:{session}), so the
+next turn sends only the new message instead of re-prefilling the whole prompt.
 """
 
 import os
 import sys
-import json
 import argparse
 import time
-from typing import List, Any
+from pathlib import Path
+from typing import List, Optional, Tuple
 
 import requests
 
+# Shared helpers live with the MCP tools
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'mcp'))
+from tools.history_store import UpstashHistoryStore  # noqa: E402
+from tools.prompt_budget import budget_from_env  # noqa: E402
+from tools.ollama_client import generate as ollama_generate, pack_context, unpack_context  # noqa: E402
 
-def upstash_command(rest_url: str, token: str, command: List[Any]):
-    # Upstash Redis REST API expects commands as a direct JSON array, not wrapped in {"command": [...]}
-    url = rest_url.rstrip('/')
-    headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
-    # Send command as direct JSON array
-    r = requests.post(url, json=command, headers=headers, timeout=20)
-    if r.status_code >= 400:
-        raise RuntimeError(f'Upstash command error {r.status_code}: {r.text}')
-    data = r.json()
-    # Upstash returns {"result": ...} for commands
-    return data.get('result')
-
-
-def lrange(rest_url: str, token: str, key: str, start: int, stop: int):
-    return upstash_command(rest_url, token, ['LRANGE', key, str(start), str(stop)])
-
-
-def lpush(rest_url: str, token: str, key: str, *values: str):
-    return upstash_command(rest_url, token, ['LPUSH', key, *values])
+# Bounds prompt size; older turns are replaced by a short summary
+PROMPT_BUDGET = budget_from_env()
 
 
-def ltrim(rest_url: str, token: str, key: str, start: int, stop: int):
-    return upstash_command(rest_url, token, ['LTRIM', key, str(start), str(stop)])
-
-
-def expire(rest_url: str, token: str, key: str, seconds: int):
-    return upstash_command(rest_url, token, ['EXPIRE', key, str(seconds)])
+def render_history(messages: List[dict]) -> str:
+    return "\n".join([f"{'Assistant' if m.get('role') == 'assistant' else 'User'}: {m.get('content', '')}" for m in messages])
 
 
 def embed_text_local(text: str, service_url: str = 'http://127.0.0.1:8001') -> List[float]:
@@ -94,8 +80,8 @@ def query_vector_context(rest_url: str, token: str, query_vector: List[float], t
     return data.get('result', [])
 
 
-def build_rag_prompt(question: str, context_hits: list, history: List[dict] = None) -> str:
-    """Build prompt with portfolio context and optional conversation history."""
+def build_rag_prompt(question: str, context_hits: list, history: List[dict] = None, session: str = None) -> str:
+    """Build prompt with portfolio context and optional conversation history, within the token budget."""
     # Extract context from vector hits
     context_parts = []
     for hit in context_hits[:3]:
@@ -104,14 +90,11 @@ def build_rag_prompt(question: str, context_hits: list, history: List[dict] = No
         content = meta.get('content', '')
         if content:
             context_parts.append(f"[{title}]\n{content}")
-    
-    context_text = "\n\n".join(context_parts) if context_parts else ""
-    
-    # Build system prompt with portfolio context
-    system_prompt = f"""You are an AI assistant answering questions about a professional's portfolio and experience.
+
+    system_template = """You are an AI assistant answering questions about a professional's portfolio and experience.
 
 Portfolio Context:
-{context_text}
+{context}
 
 Instructions:
 - Answer questions based on the portfolio context provided above
@@ -119,50 +102,48 @@ Instructions:
 - If the context doesn't contain relevant information, say so honestly
 - Keep responses concise and professional
 """
-    
-    # Add conversation history if available
-    if history:
-        history_text = "\n".join([f"{m.get('role', 'user').title()}: {m.get('content', '')}" for m in history[-4:]])
-        prompt = f"{system_prompt}\n\nConversation History:\n{history_text}\n\nUser: {question}\nAssistant:"
-    else:
-        prompt = f"{system_prompt}\n\nUser: {question}\nAssistant:"
-    
-    return prompt
-
-
-def build_prompt_from_history(history: List[dict]) -> str:
-    # history: list of {role, content} in chronological order
-    parts = []
-    for m in history:
-        role = 'Assistant' if m.get('role') == 'assistant' else 'User'
-        parts.append(f"{role}: {m.get('content','')}")
-    parts.append('Assistant:')
-    return '\n'.join(parts)
-
-
-def call_ollama(ollama_url: str, model: str, prompt: str, max_tokens: int = 800, temperature: float = 0.2) -> str:
-    """Call Ollama and parse the streaming newline-delimited JSON response."""
-    url = ollama_url.rstrip('/') + '/api/generate'
-    payload = {'model': model, 'prompt': prompt, 'stream': True}
-    r = requests.post(url, json=payload, headers={'Content-Type': 'application/json'}, timeout=60, stream=True)
-    if not r.ok:
-        raise RuntimeError(f'Ollama API error {r.status_code}: {r.text}')
-    
-    # Ollama /api/generate returns newline-delimited JSON: each line is {"response": "token", "done": false}
-    response_text = []
-    for line in r.iter_lines(decode_unicode=True):
-        if not line:
-            continue
-        try:
-            chunk = json.loads(line)
-            if 'response' in chunk:
-                response_text.append(chunk['response'])
-            if chunk.get('done'):
-                break
-        except json.JSONDecodeError:
-            continue
-    
-    return ''.join(response_text).strip()
+    question_text = f"User: {question}\nAssistant:"
+    parts = PROMPT_BUDGET.fit(system_template.format(context='') + question_text, context_parts, history or [], session)
+    system_prompt = system_template.format(context="\n\n".join(parts.context))
+
+    sections = [system_prompt]
+    if parts.summary:
+        sections.append(f"Earlier Conversation (summary):\n{parts.summary}")
+    if parts.history:
+        sections.append(f"Conversation History:\n{render_history(parts.history)}")
+    sections.append(question_text)
+    return "\n\n".join(sections)
+
+
+def build_prompt_from_history(history: List[dict], session: str = None) -> str:
+    # history: list of {role, content} in chronological order; older turns beyond the budget are summarized
+    parts = PROMPT_BUDGET.fit('Assistant:', history=history, session=session)
+    lines = []
+    if parts.summary:
+        lines.append(f"(Summary of earlier conversation)\n{parts.summary}\n")
+    if parts.history:
+        lines.append(render_history(parts.history))
+    lines.append('Assistant:')
+    return '\n'.join(lines)
+
+
+def build_followup_prompt(question: str, context_hits: list) -> str:
+    """Prompt for a turn that continues a stored Ollama context: only the new material."""
+    context_parts = []
+    for hit in context_hits[:3]:
+        meta = hit.get('metadata', {})
+        if meta.get('content'):
+            context_parts.append(f"[{meta.get('title', '')}]\n{meta['content']}")
+    prompt = f"User: {question}\nAssistant:"
+    if context_parts:
+        prompt = "Additional Portfolio Context:\n" + "\n\n".join(context_parts) + "\n\n" + prompt
+    return "\n\n" + prompt
+
+
+def call_ollama(ollama_url: str, model: str, prompt: str, context: Optional[List[int]] = None,
+                max_tokens: int = 800, temperature: float = 0.2) -> Tuple[str, Optional[List[int]]]:
+    """Call Ollama; returns the reply and the context to continue the session from."""
+    return ollama_generate(ollama_url, model, prompt, context=context, timeout=60)
 
 
 def main():
@@ -198,16 +179,14 @@ def main():
 
     key = f'chatHistory:{args.session}'
 
-    # Load recent history (Upstash stores newest-first). We request 0..max_history-1
-    raw = lrange(rest_url, token, key, 0, max_history - 1) or []
-    # raw is newest-first; reverse to chronological
-    history = []
-    for s in list(raw)[::-1]:
-        try:
-            history.append(json.loads(s))
-        except Exception:
-            # if stored as plain string, treat as user content
-            history.append({'role': 'user', 'content': str(s)})
+    # Ollama's KV context from the previous turn, stored next to the history
+    context_key = f'ollamaContext:{args.session}'
+
+    store = UpstashHistoryStore(rest_url, token)
+
+    # Load recent history (chronological; Upstash stores newest-first) and the stored context together
+    history, (raw_context,) = store.load_with(key, max_history, [['GET', context_key]])
+    ollama_context = unpack_context(raw_context, ollama_model)
 
     # RAG: Retrieve relevant portfolio context
     context_hits = []
@@ -223,15 +202,18 @@ def main():
         except Exception as e:
             print(f"⚠️  Warning: Vector search failed: {e}")
     
-    # Build prompt with RAG context
-    if context_hits:
-        prompt = build_rag_prompt(message, context_hits, history)
+    # Build prompt: only the new turn when continuing a stored context, otherwise the full RAG/history prompt
+    messages_for_model = history + [{'role': 'user', 'content': message}]
+    if ollama_context:
+        prompt = build_followup_prompt(message, context_hits)
+    elif context_hits:
+        prompt = build_rag_prompt(message, context_hits, history, session=key)
     else:
-        messages_for_model = history + [{'role': 'user', 'content': message}]
-        prompt = build_prompt_from_history(messages_for_model)
+        prompt = build_prompt_from_history(messages_for_model, session=key)
 
+    new_context = None
     try:
-        reply = call_ollama(ollama_url, ollama_model, prompt)
+        reply, new_context = call_ollama(ollama_url, ollama_model, prompt, context=ollama_context)
     except Exception as e:
         # If Ollama fails and OpenAI key is present, optionally fallback (not enabled here by default)
         openai_key = os.getenv('OPENAI_API_KEY')
@@ -247,12 +229,15 @@ def main():
         else:
             raise
 
-    # Persist conversation to Upstash: LPUSH user, LPUSH assistant, trim, expire
+    # Persist conversation and Ollama context to Upstash: LPUSH user+assistant, trim, expire, SET in one pipeline
+    if new_context:
+        context_command = ['SET', context_key, pack_context(ollama_model, new_context), 'EX', str(ttl)]
+    else:
+        # The reply did not come from a continuable context; start fresh next turn
+        context_command = ['DEL', context_key]
     try:
-        lpush(rest_url, token, key, json.dumps({'role': 'user', 'content': message}))
-        lpush(rest_url, token, key, json.dumps({'role': 'assistant', 'content': reply}))
-        ltrim(rest_url, token, key, 0, max_history - 1)
-        expire(rest_url, token, key, ttl)
+        store.append(key, [{'role': 'user', 'content': message}, {'role': 'assistant', 'content': reply}],
+                     max_len=max_history, ttl=ttl, extra=[context_command])
     except Exception as e:
         print('Warning: failed to persist chat history to Upstash:', e)
 
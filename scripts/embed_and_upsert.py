@@ -19,42 +19,33 @@ Usage:
 This script is intentionally conservative: it chunks long texts, retries on transient
 errors, and upserts in small batches. It uses the upstash-vector Python client for
 upserts/queries.
+
+Chunks are embedded in token-budgeted batches (one embeddings request per batch,
+at most --max-batch-inputs inputs and --max-batch-tokens tokens), with up to
+--concurrency requests in flight. Token counts come from tiktoken when installed,
+otherwise from a conservative character-based estimate.
+
+This is a configuration of the shared pipeline in mcp/tools/indexing_pipeline.py:
+each STAR item as one text split into sentence-aligned, token-sized chunks
+(--chunk-tokens, --chunk-overlap), OpenAI embeddings and an
+upstash-vector client sink. It shares the incremental manifest (and the chunk
+metadata layout) with index_local_embeddings.py.
 """
 
 import os
+import sys
 import json
-import time
 import argparse
-from typing import List
-
-import openai
-from upstash_vector import Index, Vector  # type: ignore
-
-
-def chunk_text(text: str, max_chars: int = 1000) -> List[str]:
-    """Naive chunker by characters preserving sentence boundaries where possible."""
-    text = text.strip()
-    if len(text) <= max_chars:
-        return [text]
+from pathlib import Path
 
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = min(start + max_chars, len(text))
-        # try to break at last period within range
-        if end < len(text):
-            slice_ = text[start:end]
-            last_period = slice_.rfind('. ')
-            if last_period != -1 and last_period > max_chars // 3:
-                end = start + last_period + 1
-        chunks.append(text[start:end].strip())
-        start = end
-    return [c for c in chunks if c]
+from upstash_vector import Index  # type: ignore
 
-
-def embed_text(text: str, model: str):
-    resp = openai.Embedding.create(model=model, input=text)
-    return resp["data"][0]["embedding"]
+# Shared helpers live with the MCP tools
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'mcp'))
+from tools.indexing_pipeline import (  # noqa: E402
+    OPENAI_MAX_INPUTS, OpenAIEmbedder, UpstashIndexSink,
+    chunk_documents, item_chunker, profile_documents, run_pipeline
+)
 
 
 def main():
@@ -62,6 +53,16 @@ def main():
     parser.add_argument("--input", default="data/profile.json", help="Path to profile JSON")
     parser.add_argument("--index", default=os.getenv("UPSTASH_VECTOR_INDEX"), help="Upstash index name")
     parser.add_argument("--batch", type=int, default=16, help="Vectors per upsert batch")
+    parser.add_argument("--max-batch-inputs", type=int, default=OPENAI_MAX_INPUTS,
+                        help="Chunks per embeddings request")
+    parser.add_argument("--max-batch-tokens", type=int, default=250000,
+                        help="Token budget per embeddings request (OpenAI allows 300k)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Embeddings requests in flight")
+    parser.add_argument("--manifest", help="Manifest path (default data/vector_store/upstash-<index>.manifest.json)")
+    parser.add_argument("--full", action="store_true", help="Ignore the manifest and re-embed every chunk")
+    parser.add_argument("--dry-run", action="store_true", help="Report added/changed/removed chunks and exit")
+    parser.add_argument("--chunk-tokens", type=int, default=256, help="Max tokens per chunk")
+    parser.add_argument("--chunk-overlap", type=int, default=32, help="Tokens of trailing sentences repeated in the next chunk")
     args = parser.parse_args()
 
     openai_key = os.getenv("OPENAI_API_KEY")
@@ -76,64 +77,29 @@ def main():
     if not args.index:
         raise SystemExit("Provide index name via --index or UPSTASH_VECTOR_INDEX env var")
 
-    openai.api_key = openai_key
-
     index = Index(url=upstash_url, token=upstash_token)
 
     with open(args.input, "r", encoding="utf-8") as f:
         profile = json.load(f)
 
-    items = profile.get("star_items", [])
-    all_vectors = []
-
-    for item in items:
-        item_id = item.get("id") or item.get("title", "item")
-        # create a single textual blob for embedding
-        text_parts = [item.get(k, "") for k in ["title", "situation", "task", "action", "result"]]
-        full_text = "\n".join([p for p in text_parts if p])
-        chunks = chunk_text(full_text, max_chars=1000)
-
-        for i, chunk in enumerate(chunks):
-            vec_id = f"{item_id}-{i}"
-            print(f"Embedding {vec_id} (len={len(chunk)})")
-            # embed with retries
-            for attempt in range(3):
-                try:
-                    embedding = embed_text(chunk, embedding_model)
-                    break
-                except Exception as e:
-                    print(f"Embedding error (attempt {attempt+1}): {e}")
-                    time.sleep(1 + attempt * 2)
-            else:
-                print(f"Failed to embed chunk {vec_id}, skipping")
-                continue
-
-            metadata = {
-                "source_id": item_id,
-                "title": item.get("title"),
-                "chunk_index": i,
-            }
-
-            all_vectors.append(Vector(id=vec_id, vector=embedding, metadata=metadata))
-
-            # flush batches
-            if len(all_vectors) >= args.batch:
-                print(f"Upserting batch of {len(all_vectors)} vectors...")
-                index.upsert(vectors=all_vectors, index=args.index)
-                all_vectors = []
-                time.sleep(0.1)
-
-    if all_vectors:
-        print(f"Upserting final batch of {len(all_vectors)} vectors...")
-        index.upsert(vectors=all_vectors, index=args.index)
-
-    # Simple verification: query back with first vector (if any)
+    embedder = OpenAIEmbedder(embedding_model, max_inputs=args.max_batch_inputs, max_tokens=args.max_batch_tokens)
+    chunker = item_chunker(embedder.count_tokens, args.chunk_tokens, args.chunk_overlap)
+
+    def make_chunks():
+        return chunk_documents(profile_documents(profile), chunker)
+    sink = UpstashIndexSink(index, upstash_url, args.index,
+                            manifest_path=Path(args.manifest) if args.manifest else None,
+                            batch_size=args.batch)
+    stats = run_pipeline(make_chunks, embedder, [sink], full=args.full, dry_run=args.dry_run,
+                         concurrency=args.concurrency)
+
+    # Simple verification: query back the first chunk (if any were written)
     try:
-        if items:
-            sample_id = f"{items[0].get('id')}-0"
+        first = next(iter(make_chunks()), None)
+        if first is not None and stats["embedded"]:
             print("Querying back sample vector to verify...")
             # We don't have the original vector here; query by id -> upstash client supports fetch/query
-            res = index.query(id=sample_id, index=args.index, include_vectors=False, include_metadata=True)
+            res = index.query(id=first.id, index=args.index, include_vectors=False, include_metadata=True)
             print("Query result:", res)
     except Exception as e:
         print("Verification query failed:", e)
@@ -6,6 +6,24 @@ Create local embeddings with sentence-transformers and upsert to Upstash Vector
 
 Usage:
   python scripts/index_local_embeddings.py --input data/profile.json --index portfolio
+  # also write the in-process store used by semantic_search when VECTOR_BACKEND=local
+  python scripts/index_local_embeddings.py --input data/profile.json --index portfolio --local-store data/vector_store/portfolio
+  # local store only, no Upstash credentials needed
+  python scripts/index_local_embeddings.py --input data/profile.json --local-store data/vector_store/portfolio --skip-upsert
+  # show what would be embedded, upserted and deleted without doing it
+  python scripts/index_local_embeddings.py --input data/profile.json --index portfolio --dry-run
+
+Runs are incremental: a manifest per target maps chunk id -> sha1(model, text, metadata),
+so only new or changed chunks are embedded and upserted, and vectors for chunks
+that disappeared are deleted. --full ignores the manifests.
+
+Embedding runs ahead of uploading: batches are queued (--queue-depth) for a pool
+of upload workers (--upload-workers), and both stages report chunks/sec.
+
+This is a configuration of the shared pipeline in mcp/tools/indexing_pipeline.py:
+chunks per STAR section (split on sentence boundaries to fit the model's token
+window, measured with its tokenizer), sentence-transformers (or OpenAI)
+embeddings, and Upstash REST and/or local store sinks.
 
 Environment variables (set in .env.local or shell):
   UPSTASH_VECTOR_REST_URL - e.g. https://...-vector.upstash.io
@@ -20,89 +38,46 @@ This script is conservative: it checks the model dim and warns if it doesn't mat
 import os
 import sys
 import json
-import time
-import hashlib
 import argparse
-from typing import List
+from pathlib import Path
 
-try:
-    from sentence_transformers import SentenceTransformer
-except Exception:
-    # sentence-transformers is optional if using OpenAI embeddings
-    SentenceTransformer = None
-
-import requests
-import os
-
-
-def sha_id(*parts) -> str:
-    h = hashlib.sha1()
-    for p in parts:
-        h.update(str(p).encode('utf-8'))
-    return h.hexdigest()
-
-
-def chunk_texts(profile: dict) -> List[dict]:
-    # Build STAR chunks like the app expects
-    items = profile.get('star_items') or profile.get('star_items', [])
-    chunks = []
-    for item in items:
-        base = {'id': item.get('id') or sha_id(item.get('title','')[:24]), 'title': item.get('title','')}
-        for sec in ['situation','task','action','result']:
-            content = item.get(sec) or item.get(sec.capitalize()) or item.get(sec.lower())
-            if not content:
-                continue
-            chunks.append({
-                'id': f"{base['id']}-{sec}",
-                'title': base['title'],
-                'section': sec.capitalize(),
-                'content': content,
-            })
-    return chunks
-
-
-def embed_texts(model, texts):
-    """Embed texts using SentenceTransformer model.
-    
-    Args:
-        model: SentenceTransformer model instance
-        texts: List of strings to embed
-        
-    Returns:
-        List of embeddings as lists of floats
-    """
-    embeddings = model.encode(texts, show_progress_bar=False)
-    # convert to python floats
-    return [list(map(float, e)) for e in embeddings]
-
-
-def upsert_vectors(rest_url: str, token: str, index: str, vectors: List[dict]):
-    # Upstash Vector REST API expects the vectors as a direct JSON array, not wrapped
-    url = f"{rest_url.rstrip('/')}/upsert"
-    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
-    # Send vectors directly as the JSON payload (array of vector objects)
-    resp = requests.post(url, json=vectors, headers=headers, timeout=30)
-    if resp.status_code >= 400:
-        raise RuntimeError(f"Upsert failed {resp.status_code}: {resp.text}")
-    return resp.json()
+# Shared helpers live with the MCP tools
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'mcp'))
+from tools.indexing_pipeline import (  # noqa: E402
+    LocalStoreSink, OpenAIEmbedder, SentenceTransformerEmbedder, UpstashRestSink,
+    chunk_documents, profile_documents, run_pipeline, section_chunker
+)
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--input", required=True, help="Path to profile.json")
-    parser.add_argument("--index", required=True, help="Upstash vector index name (portfolio)")
-    parser.add_argument("--batch", type=int, default=64, help="Upsert batch size")
+    parser.add_argument("--index", default=os.environ.get('UPSTASH_VECTOR_INDEX'), help="Upstash vector index name (portfolio)")
+    parser.add_argument("--batch", type=int, default=64, help="Embedding and upsert batch size")
+    parser.add_argument("--upload-workers", type=int, default=4, help="Concurrent Upstash upsert requests")
+    parser.add_argument("--queue-depth", type=int, default=8,
+                        help="Embedded batches allowed to wait for upload before embedding pauses")
+    parser.add_argument("--local-store", help="Also write a local vector store at this path prefix (e.g. data/vector_store/portfolio)")
+    parser.add_argument("--skip-upsert", action="store_true", help="Do not upload to Upstash (requires --local-store)")
+    parser.add_argument("--manifest", help="Upstash manifest path (default data/vector_store/upstash-<index>.manifest.json)")
+    parser.add_argument("--full", action="store_true", help="Ignore manifests and re-embed every chunk")
+    parser.add_argument("--dry-run", action="store_true", help="Report added/changed/removed chunks and exit")
+    parser.add_argument("--chunk-tokens", type=int, default=0,
+                        help="Max tokens per chunk, title/section header included (default: the model's input limit)")
+    parser.add_argument("--chunk-overlap", type=int, default=32, help="Tokens of trailing sentences repeated in the next chunk")
     args = parser.parse_args()
 
     rest_url = os.environ.get('UPSTASH_VECTOR_REST_URL')
     token = os.environ.get('UPSTASH_VECTOR_REST_TOKEN')
-    index = args.index or os.environ.get('UPSTASH_VECTOR_INDEX')
+    index = args.index
     # Allow using OpenAI embeddings to match an existing Upstash index (e.g. 1536 dims)
     USE_OPENAI = str(os.environ.get('USE_OPENAI_EMBEDDINGS', '')).lower() == 'true'
-    model_name = os.environ.get('EMBEDDING_MODEL') or os.environ.get('LOCAL_EMBEDDING_MODEL') or ('all-MiniLM-L6-v2' if not USE_OPENAI else 'openai:text-embedding-3-small')
     expected_dim = int(os.environ.get('EMBEDDING_DIM') or (1536 if USE_OPENAI else 384))
 
-    if not rest_url or not token or not index:
+    if args.skip_upsert and not args.local_store:
+        print("--skip-upsert only makes sense together with --local-store")
+        sys.exit(2)
+    if not args.skip_upsert and not args.dry_run and (not rest_url or not token or not index):
         print("Please set UPSTASH_VECTOR_REST_URL, UPSTASH_VECTOR_REST_TOKEN and pass --index or set UPSTASH_VECTOR_INDEX")
         sys.exit(2)
 
@@ -110,105 +85,39 @@ def main():
     with open(args.input, 'r', encoding='utf-8') as f:
         profile = json.load(f)
 
-    chunks = chunk_texts(profile)
-    if not chunks:
-        print("No STAR chunks found in profile. Ensure 'star_items' exists in the profile JSON.")
-        sys.exit(1)
+    if USE_OPENAI:
+        embedder = OpenAIEmbedder(os.environ.get('EMBEDDING_MODEL', 'text-embedding-3-small'))
+    else:
+        model_name = os.environ.get('EMBEDDING_MODEL') or os.environ.get('LOCAL_EMBEDDING_MODEL') or 'all-MiniLM-L6-v2'
+        embedder = SentenceTransformerEmbedder(model_name, batch_size=args.batch)
 
-    print(f"Found {len(chunks)} chunks. Loading embedding model: {model_name} (openai_mode={USE_OPENAI})")
+    # Sections longer than the model's window are split on sentence boundaries instead of truncated.
+    # Fixed up front: both pipeline passes must produce identical chunks.
+    chunker = section_chunker(embedder.count_tokens, args.chunk_tokens or embedder.max_input_tokens, args.chunk_overlap)
 
-    texts = [f"{c['title']} — {c['section']}: {c['content']}" for c in chunks]
+    def make_chunks():
+        return chunk_documents(profile_documents(profile), chunker)
 
-    if USE_OPENAI:
-        # Use OpenAI embeddings via the HTTP API
-        import openai
-        openai_api_key = os.environ.get('OPENAI_API_KEY')
-        if not openai_api_key:
-            print("OPENAI_API_KEY required when USE_OPENAI_EMBEDDINGS=true")
-            sys.exit(2)
-        openai.api_key = openai_api_key
-
-        def embed_texts_openai(texts_batch: List[str]) -> List[List[float]]:
-            # Support both old and new openai-python interfaces
-            model_name = os.environ.get('EMBEDDING_MODEL', 'text-embedding-3-small')
-            try:
-                # older interface
-                resp = openai.Embedding.create(model=model_name, input=texts_batch)
-                embs = [d['embedding'] for d in resp['data']]
-            except Exception:
-                # new interface (openai>=1.0.0)
-                try:
-                    from openai import OpenAI
-                    client = OpenAI()
-                    resp = client.embeddings.create(model=model_name, input=texts_batch)
-                    embs = [d['embedding'] for d in resp.data]
-                except Exception as e:
-                    raise RuntimeError(f"OpenAI embedding call failed: {e}")
-            return [list(map(float, e)) for e in embs]
-
-        # Probe a single batch to confirm dim
-        sample_embs = embed_texts_openai(texts[:1])
-        actual_dim = len(sample_embs[0])
-        print(f"OpenAI embedding dimension: {actual_dim}")
-        if actual_dim != expected_dim:
-            print(f"Warning: OpenAI embedding dim {actual_dim} != EMBEDDING_DIM {expected_dim}. Update Upstash index or EMBEDDING_DIM.")
-
-        def embed_texts(model, texts_batch: List[str]) -> List[List[float]]:
-            return embed_texts_openai(texts_batch)
+    if next(iter(make_chunks()), None) is None:
+        print("No STAR chunks found in profile. Ensure 'star_items' exists in the profile JSON.")
+        sys.exit(1)
 
-    else:
-        if SentenceTransformer is None:
-            print("Missing dependency 'sentence-transformers'. Install with: pip install sentence-transformers or enable USE_OPENAI_EMBEDDINGS=true to use OpenAI embeddings")
-            sys.exit(2)
-
-        model = SentenceTransformer(model_name)
-        actual_dim = model.get_sentence_embedding_dimension()
-        print(f"Model dimension: {actual_dim}")
-        if actual_dim != expected_dim:
-            print(f"Warning: model embedding dim {actual_dim} != EMBEDDING_DIM {expected_dim}. Update Upstash index or EMBEDDING_DIM.")
-
-        def embed_texts(model, texts_batch: List[str]) -> List[List[float]]:
-            embeddings = model.encode(texts_batch, show_progress_bar=False)
-            return [list(map(float, e)) for e in embeddings]
-
-    batch = args.batch
-    total = len(texts)
-    i = 0
-    while i < total:
-        j = min(i + batch, total)
-        batch_texts = texts[i:j]
-        batch_chunks = chunks[i:j]
-        print(f"Embedding batch {i}-{j} (size {len(batch_texts)})...")
-        embs = embed_texts(model, batch_texts)
-
-        vectors = []
-        for ch, emb in zip(batch_chunks, embs):
-            vectors.append({
-                "id": ch['id'],
-                "vector": emb,
-                "metadata": {"title": ch['title'], "section": ch['section'], "content": ch['content']},
-            })
-
-        # Retry logic for upsert
-        attempts = 0
-        while True:
-            try:
-                res = upsert_vectors(rest_url, token, index, vectors)
-                print(f"Upserted batch {i}-{j}: {res}")
-                break
-            except Exception as e:
-                attempts += 1
-                print(f"Upsert error: {e}")
-                if attempts > 3:
-                    print("Giving up after 3 attempts")
-                    raise
-                backoff = 2 ** attempts
-                print(f"Retrying in {backoff}s...")
-                time.sleep(backoff)
-
-        i = j
-
-    print("All batches upserted successfully.")
+    sinks = []
+    if not args.skip_upsert:
+        sinks.append(UpstashRestSink(
+            rest_url or '', token or '', index,
+            manifest_path=Path(args.manifest) if args.manifest else None,
+            batch_size=args.batch, workers=args.upload_workers, queue_depth=args.queue_depth
+        ))
+    if args.local_store:
+        sinks.append(LocalStoreSink(args.local_store))
+
+    try:
+        run_pipeline(make_chunks, embedder, sinks, full=args.full, dry_run=args.dry_run,
+                     expected_dim=expected_dim)
+    except RuntimeError as e:
+        print(e)
+        sys.exit(1)
 
 
 if __name__ == '__main__':
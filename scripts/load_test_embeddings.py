@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+scripts/load_test_embeddings.py
+
+Load test for the local embedding server's /embed endpoint. Reports p50/p99
+request latency and texts/sec for one or more targets, so micro-batching can
+be compared against per-request encoding on the same box.
+
+Usage:
+  # Terminal 1 and 2: the same server with batching on and off
+  python scripts/serve_local_embeddings.py
+  $env:EMBED_BATCHING="false"; $env:PORT="8001"; python scripts/serve_local_embeddings.py
+
+  # Terminal 3
+  python scripts/load_test_embeddings.py --target batched=http://127.0.0.1:8000 --target unbatched=http://127.0.0.1:8001
+  python scripts/load_test_embeddings.py --concurrency 32 --requests 500 --texts-per-request 1
+"""
+
+import time
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+import requests
+
+
+SAMPLE_TEXTS = [
+    "What are your core technical skills?",
+    "Tell me about your most impressive project.",
+    "Describe your experience with accessibility and WCAG compliance.",
+    "How do you approach responsive design?",
+    "What experience do you have with vector databases and RAG?",
+    "Built a Laravel movie reviews system with authentication and CRUD.",
+    "Implemented semantic search with sentence-transformers embeddings.",
+    "How do you ensure code quality in your projects?",
+]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def run_target(url: str, total_requests: int, concurrency: int, texts_per_request: int) -> Tuple[List[float], int, float]:
+    endpoint = url.rstrip('/') + '/embed'
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    def one_request(n: int) -> Tuple[float, bool]:
+        rnd = random.Random(n)
+        # Vary the texts so no layer can serve repeats from a cache
+        texts = [f"{rnd.choice(SAMPLE_TEXTS)} ({n}-{k})" for k in range(texts_per_request)]
+        start = time.perf_counter()
+        try:
+            r = session.post(endpoint, json={'input': texts}, timeout=60)
+            ok = r.ok
+        except requests.RequestException:
+            ok = False
+        return (time.perf_counter() - start) * 1000.0, ok
+
+    # Warm-up so model load / first-call overhead is not measured
+    one_request(-1)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one_request, range(total_requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [ms for ms, ok in results if ok]
+    errors = sum(1 for _, ok in results if not ok)
+    return latencies, errors, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the local /embed endpoint')
+    parser.add_argument('--target', action='append',
+                        help='label=url of an embedding server (repeatable; default local=http://127.0.0.1:8000)')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per target')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent client threads')
+    parser.add_argument('--texts-per-request', type=int, default=1, help='Texts sent in each request')
+    args = parser.parse_args()
+
+    targets = []
+    for spec in args.target or ['local=http://127.0.0.1:8000']:
+        label, _, url = spec.partition('=')
+        targets.append((label, url) if url else (spec, spec))
+
+    print(f"📊 {args.requests} requests x {args.texts_per_request} text(s), concurrency {args.concurrency}\n")
+    print(f"{'target':<14}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>10}{'texts/s':>10}{'errors':>8}")
+    for label, url in targets:
+        latencies, errors, elapsed = run_target(url, args.requests, args.concurrency, args.texts_per_request)
+        if not latencies:
+            print(f"{label:<14}{'-':>10}{'-':>10}{'-':>10}{'-':>10}{errors:>8}")
+            continue
+        ok = len(latencies)
+        print(f"{label:<14}{percentile(latencies, 50):>10.1f}{percentile(latencies, 99):>10.1f}"
+              f"{ok / elapsed:>10.1f}{ok * args.texts_per_request / elapsed:>10.1f}{errors:>8}")
+        if errors:
+            print(f"  ⚠️  {errors} failed requests excluded from latency figures")
+
+
+if __name__ == '__main__':
+    main()
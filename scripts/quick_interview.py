@@ -2,36 +2,28 @@
 """
 Quick portfolio interview - No embedding service required!
 Asks questions about your portfolio and saves Q&A pairs.
+
+The portfolio context is sent to Ollama once; every question continues from
+that primed context, so only the question itself needs prefill.
 """
 import os
 import sys
 import json
-import requests
+import time
+import argparse
 from datetime import datetime
+from pathlib import Path
+
+# Shared helpers live with the MCP tools
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'mcp'))
+from tools.ollama_client import generate as ollama_generate, usable_context  # noqa: E402
+from tools.portfolio_store import content_hash  # noqa: E402
+from tools.run_log import TrainingLog, prompt_hash  # noqa: E402
 
-def call_ollama(url, model, prompt):
-    """Call Ollama streaming API."""
-    r = requests.post(
-        f'{url}/api/generate',
-        json={'model': model, 'prompt': prompt, 'stream': True},
-        timeout=120,
-        stream=True
-    )
-    if not r.ok:
-        raise RuntimeError(f'Ollama error {r.status_code}: {r.text}')
-    
-    response = []
-    for line in r.iter_lines(decode_unicode=True):
-        if line:
-            try:
-                chunk = json.loads(line)
-                if 'response' in chunk:
-                    response.append(chunk['response'])
-                if chunk.get('done'):
-                    break
-            except:
-                pass
-    return ''.join(response).strip()
+
+def call_ollama(url, model, prompt, context=None, options=None):
+    """Call Ollama streaming API; returns (response, context)."""
+    return ollama_generate(url, model, prompt, context=context, options=options, timeout=120)
 
 # Interview questions
 QUESTIONS = [
@@ -48,9 +40,20 @@ QUESTIONS = [
 ]
 
 def main():
+    parser = argparse.ArgumentParser(description='Quick portfolio interview against a local Ollama model')
+    parser.add_argument('--output', '-o', default='data/interview_qa.jsonl', help='Output file for Q&A pairs (JSONL)')
+    parser.add_argument('--session', '-s', default=None,
+                        help='Session ID (default: quick-<timestamp>, or the latest session with --resume)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip questions already answered for this session/model (see <output>.manifest.jsonl)')
+    args = parser.parse_args()
+
     # Load portfolio
-    with open('data/profile.json', 'r', encoding='utf-8') as f:
-        profile = json.load(f)
+    with open('data/profile.json', 'rb') as f:
+        raw_profile = f.read()
+    profile = json.loads(raw_profile.decode('utf-8'))
+    # Logged with every answer, so the MCP answer cache only serves it for this profile
+    profile_hash = content_hash(raw_profile)
     
     # Build context from portfolio
     context_parts = []
@@ -78,58 +81,92 @@ def main():
     # Setup
     ollama_url = os.getenv('OLLAMA_URL', 'http://127.0.0.1:11434')
     ollama_model = os.getenv('OLLAMA_MODEL', 'llama3')
-    output_file = 'data/interview_qa.jsonl'
-    
-    os.makedirs('data', exist_ok=True)
+    output_file = args.output
+
+    # Each answer is appended (and fsynced) as soon as it completes
+    log = TrainingLog(output_file)
+    session = args.session
+    if not session:
+        session = (log.manifest.latest_session(ollama_model) if args.resume else None) \
+            or f'quick-{datetime.now().strftime("%Y%m%d-%H%M")}'
     
     print(f"🎤 Portfolio Interview Training")
     print(f"📝 Output: {output_file}")
     print(f"🤖 Model: {ollama_model}")
-    print(f"📚 Running {len(QUESTIONS)} questions...\n")
-    
-    qa_pairs = []
-    
-    for i, question in enumerate(QUESTIONS, 1):
-        print(f"\n{'='*70}")
-        print(f"Question {i}/{len(QUESTIONS)}: {question}")
-        print('='*70)
-        
-        # Build prompt
-        prompt = f"""You are an AI assistant answering interview questions about a professional's portfolio and experience.
+
+    preamble = f"""You are an AI assistant answering interview questions about a professional's portfolio and experience.
 
 Here is the portfolio information:
 
 {portfolio_context}
 
-Based on the portfolio information above, please answer this interview question:
+"""
+    question_template = """Based on the portfolio information above, please answer this interview question:
 
 Question: {question}
 
 Answer (be specific and reference actual projects and accomplishments from the portfolio):"""
+
+    def question_hash(question):
+        # The full prompt, so a changed portfolio or template is answered again
+        return prompt_hash(preamble + question_template.format(question=question))
+
+    questions = QUESTIONS
+    if args.resume:
+        questions = [q for q in QUESTIONS if not log.manifest.is_done(session, q, ollama_model, question_hash(q))]
+        print(f"⏭️  Resuming {session}: {len(QUESTIONS) - len(questions)} questions already done")
+    print(f"📚 Running {len(questions)} questions...\n")
+    if not questions:
+        return
+
+    # Prime the model with the shared portfolio context once and keep its KV context
+    base_context = None
+    try:
+        started = time.perf_counter()
+        _, primed = call_ollama(ollama_url, ollama_model,
+                                preamble + 'Reply "Ready." and wait for the interview questions.',
+                                options={'num_predict': 8})
+        base_context = usable_context(primed)
+        if base_context:
+            print(f"⚡ Portfolio context primed ({len(base_context)} tokens, {time.perf_counter() - started:.1f}s)")
+    except Exception as e:
+        print(f"⚠️  Could not prime context, sending the full prompt per question: {e}")
+
+    for i, question in enumerate(questions, 1):
+        print(f"\n{'='*70}")
+        print(f"Question {i}/{len(questions)}: {question}")
+        print('='*70)
+        
+        # Build prompt: just the question on top of the primed context, or the full prompt
+        if base_context:
+            prompt = "\n\n" + question_template.format(question=question)
+        else:
+            prompt = preamble + question_template.format(question=question)
         
         try:
             print("\n🤖 Response:")
-            response = call_ollama(ollama_url, ollama_model, prompt)
+            started = time.perf_counter()
+            # Every question starts from the same base, so answers stay independent
+            response, _ = call_ollama(ollama_url, ollama_model, prompt, context=base_context)
             print(response)
+            print(f"⏱️  {time.perf_counter() - started:.1f}s")
             
             # Save Q&A
-            qa_pairs.append({
+            log.record({
                 'timestamp': datetime.now().isoformat(),
+                'session': session,
                 'question': question,
-                'response': response
-            })
+                'response': response,
+                'profile_hash': profile_hash
+            }, ollama_model, question_hash(question))
             
         except Exception as e:
             print(f"❌ Error: {e}")
             continue
     
-    # Save all Q&A pairs
-    if qa_pairs:
-        with open(output_file, 'a', encoding='utf-8') as f:
-            for qa in qa_pairs:
-                f.write(json.dumps(qa) + '\n')
-        
-        print(f"\n\n✅ Saved {len(qa_pairs)} Q&A pairs to {output_file}")
+    # Q&A pairs were written as they completed
+    if log.written:
+        print(f"\n\n✅ Saved {log.written} Q&A pairs to {output_file}")
     else:
         print("\n\nNo Q&A pairs to save.")
 
@@ -8,16 +8,42 @@ Run:
 This starts a FastAPI app on 127.0.0.1:8000 by default. It exposes POST /embed
 which accepts JSON { "input": string | [string] } and returns { "embeddings": [[...]] }
 
+Clients can ask for a compact encoding with "format" (and optionally "dtype"):
+  {"input": [...], "format": "binary", "dtype": "float16"}
+    -> application/octet-stream: 16-byte header + raw little-endian vectors
+  {"input": [...], "format": "base64"}
+    -> {"dtype", "shape", "data"} with the same payload base64-encoded
+Sending "Accept: application/octet-stream" without a format also selects binary.
+See mcp/tools/embedding_codec.py for the layout and decoders.
+
+Concurrent requests are coalesced: texts arriving within EMBED_MAX_WAIT_MS of
+each other are encoded together in one model call (up to EMBED_MAX_BATCH texts)
+and the rows are handed back to each waiting request.
+
 Environment variables:
   LOCAL_EMBEDDING_MODEL - optional, default: all-MiniLM-L6-v2
   PORT - optional, default 8000
+  EMBED_BATCHING - optional, "false" encodes every request separately (default true)
+  EMBED_MAX_BATCH - optional, max texts per model call (default 32)
+  EMBED_MAX_WAIT_MS - optional, how long to wait for more texts (default 5)
 """
 
 import os
+import sys
+import base64
+import asyncio
+from pathlib import Path
+from contextlib import asynccontextmanager
+import numpy as np
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Union
+from typing import List, Optional, Tuple, Union
+
+# Shared helpers live with the MCP tools
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'mcp'))
+from tools.embedding_codec import BINARY_MEDIA_TYPE, DTYPE_CODES, pack_header  # noqa: E402
 
 try:
     from sentence_transformers import SentenceTransformer
@@ -28,25 +54,177 @@ except Exception as e:
 
 class EmbedRequest(BaseModel):
     input: Union[str, List[str]]
+    format: Optional[str] = None  # "json" (default), "binary" or "base64"
+    dtype: Optional[str] = 'float32'  # "float32" or "float16" for binary/base64
+
+
+class MicroBatcher:
+    """Coalesce concurrent encode requests into shared model calls."""
+
+    def __init__(self, encode, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.texts = 0
 
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
 
-app = FastAPI(title="Local Embedding Service")
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._queue is not None:
+            # Requests still queued would otherwise wait forever
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                if not future.done():
+                    future.set_exception(RuntimeError("Embedding server is shutting down"))
+            self._queue = None
+
+    async def submit(self, texts: List[str]):
+        """Queue texts and wait for their embedding rows."""
+        if self._queue is None:
+            raise RuntimeError("Embedding batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((texts, future))
+        return await future
+
+    async def _collect(self, pending: List[Tuple[List[str], asyncio.Future]]):
+        """Fill pending with one batch; items taken are in pending even if this raises."""
+        loop = asyncio.get_running_loop()
+        pending.append(await self._queue.get())
+        size = len(pending[0][0])
+        deadline = loop.time() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            pending.append(item)
+            size += len(item[0])
+
+    @staticmethod
+    def _fail(pending, error: BaseException):
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(error)
+
+    async def _run(self):
+        while True:
+            pending: List[Tuple[List[str], asyncio.Future]] = []
+            try:
+                await self._collect(pending)
+                texts = [t for item_texts, _ in pending for t in item_texts]
+                # Model runs in a worker thread so the loop keeps accepting requests
+                embs = await asyncio.to_thread(self.encode, texts)
+                if len(embs) != len(texts):
+                    raise RuntimeError(f"Model returned {len(embs)} embeddings for {len(texts)} texts")
+                self.batches += 1
+                self.texts += len(texts)
+                start = 0
+                for item_texts, future in pending:
+                    end = start + len(item_texts)
+                    if not future.done():
+                        future.set_result(embs[start:end])
+                    start = end
+            except asyncio.CancelledError:
+                self._fail(pending, RuntimeError("Embedding server is shutting down"))
+                raise
+            except Exception as e:
+                # Fail this batch only; the worker keeps serving later requests
+                self._fail(pending, e)
 
 MODEL_NAME = os.environ.get('LOCAL_EMBEDDING_MODEL', os.environ.get('EMBEDDING_MODEL', 'all-MiniLM-L6-v2'))
 PORT = int(os.environ.get('PORT', '8000'))
+BATCHING = os.environ.get('EMBED_BATCHING', 'true').lower() == 'true'
 
 print(f"Loading embedding model: {MODEL_NAME}")
 model = SentenceTransformer(MODEL_NAME)
 print("Model loaded. Ready to serve embeddings.")
 
 
+def encode_texts(texts: List[str]):
+    return model.encode(texts, show_progress_bar=False)
+
+
+batcher = MicroBatcher(
+    encode_texts,
+    max_batch_size=int(os.environ.get('EMBED_MAX_BATCH', '32')),
+    max_wait_ms=float(os.environ.get('EMBED_MAX_WAIT_MS', '5')),
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if BATCHING:
+        await batcher.start()
+        print(f"Micro-batching on (max batch {batcher.max_batch_size}, max wait {batcher.max_wait * 1000:.0f} ms)")
+    yield
+    await batcher.stop()
+
+
+app = FastAPI(title="Local Embedding Service", lifespan=lifespan)
+
+
+@app.get('/stats')
+def stats():
+    return {
+        "model": MODEL_NAME,
+        "batching": BATCHING,
+        "batches": batcher.batches,
+        "texts": batcher.texts,
+        "avg_batch_size": round(batcher.texts / batcher.batches, 2) if batcher.batches else 0.0,
+    }
+
+
+def packed_matrix(embs, dtype: str) -> np.ndarray:
+    """Little-endian contiguous view of the model output (no copy for float32 output)."""
+    return np.ascontiguousarray(embs, dtype='<f4' if dtype == 'float32' else '<f2')
+
+
+async def binary_chunks(header: bytes, matrix: np.ndarray):
+    """Header, then the matrix buffer itself: the vectors are never copied into a new bytes object."""
+    yield header
+    yield memoryview(matrix).cast('B')
+
+
 @app.post('/embed')
-def embed(req: EmbedRequest):
+async def embed(req: EmbedRequest, request: Request):
     texts = req.input if isinstance(req.input, list) else [req.input]
     if not texts:
         raise HTTPException(status_code=400, detail="No input texts provided")
+    fmt = req.format or ('binary' if BINARY_MEDIA_TYPE in request.headers.get('accept', '') else 'json')
+    if fmt not in ('json', 'binary', 'base64'):
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {fmt}")
+    dtype = req.dtype or 'float32'
+    if dtype not in DTYPE_CODES:
+        raise HTTPException(status_code=400, detail=f"Unsupported dtype: {dtype}")
     try:
-        embs = model.encode(texts, show_progress_bar=False)
+        if BATCHING:
+            embs = await batcher.submit(texts)
+        else:
+            embs = await asyncio.to_thread(encode_texts, texts)
+        if fmt == 'binary':
+            matrix = packed_matrix(embs, dtype)
+            header = pack_header(dtype, *matrix.shape)
+            return StreamingResponse(binary_chunks(header, matrix), media_type=BINARY_MEDIA_TYPE,
+                                     headers={'Content-Length': str(len(header) + matrix.nbytes)})
+        if fmt == 'base64':
+            matrix = packed_matrix(embs, dtype)
+            return {"dtype": dtype, "shape": list(matrix.shape),
+                    "data": base64.b64encode(memoryview(matrix)).decode('ascii')}
         embeddings = [list(map(float, e)) for e in embs]
         # If single input, return single embedding via 'embedding' field for convenience
         if isinstance(req.input, str):
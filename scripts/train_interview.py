@@ -8,52 +8,51 @@ and saves Q&A pairs to help train/improve your AI's responses about your portfol
 Usage:
   python scripts/train_interview.py --session interview-001
   python scripts/train_interview.py --auto  # Run predefined questions automatically
+  python scripts/train_interview.py --auto --resume  # Continue the last interrupted auto run
+  python scripts/train_interview.py --auto --use-rag --concurrency 4  # Match OLLAMA_NUM_PARALLEL on the server
+  python scripts/train_interview.py --chain-context  # Let each answer build on the previous ones
 """
 
 import os
 import sys
-import json
 import argparse
-import time
-from typing import List, Dict, Any
+from typing import Any, List, Dict, Optional, Tuple
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import datetime
+from pathlib import Path
 
 import requests
 
+# Shared helpers live with the MCP tools
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'mcp'))
+from tools.embedding_cache import get_embedding_cache  # noqa: E402
+from tools.history_store import UpstashHistoryStore  # noqa: E402
+from tools.ollama_client import generate as ollama_generate, usable_context  # noqa: E402
+from tools.portfolio_store import PROFILE_PATH, profile_content_hash  # noqa: E402
+from tools.run_log import TrainingLog, prompt_hash  # noqa: E402
 
-def upstash_command(rest_url: str, token: str, command: List[Any]):
-    """Execute Upstash Redis command via REST."""
-    url = rest_url.rstrip('/')
-    headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
-    r = requests.post(url, json=command, headers=headers, timeout=20)
-    if r.status_code >= 400:
-        raise RuntimeError(f'Upstash command error {r.status_code}: {r.text}')
-    data = r.json()
-    return data.get('result')
+LOCAL_EMBEDDING_MODEL = os.getenv('LOCAL_EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+# Embedding/vector lookups prefetched ahead of generation
+RETRIEVAL_WORKERS = 4
 
+# Sent once to prime the base context that questions are asked on top of
+SESSION_INSTRUCTIONS = """You are an AI assistant helping to answer questions about a professional portfolio.
+
+Each question may come with context from the portfolio. Please provide a clear, specific answer based on that context. If the context doesn't fully answer the question, provide what you can and indicate what information is missing."""
 
-def call_ollama(ollama_url: str, model: str, prompt: str) -> str:
-    """Call Ollama and parse the streaming newline-delimited JSON response."""
-    url = ollama_url.rstrip('/') + '/api/generate'
-    payload = {'model': model, 'prompt': prompt, 'stream': True}
-    r = requests.post(url, json=payload, headers={'Content-Type': 'application/json'}, timeout=120, stream=True)
-    if not r.ok:
-        raise RuntimeError(f'Ollama API error {r.status_code}: {r.text}')
-    
-    response_text = []
-    for line in r.iter_lines(decode_unicode=True):
-        if not line:
-            continue
-        try:
-            chunk = json.loads(line)
-            if 'response' in chunk:
-                response_text.append(chunk['response'])
-            if chunk.get('done'):
-                break
-        except json.JSONDecodeError:
-            continue
-    
-    return ''.join(response_text).strip()
+
+def call_ollama(ollama_url: str, model: str, prompt: str, context: Optional[List[int]] = None,
+                options: Optional[Dict[str, Any]] = None) -> Tuple[str, Optional[List[int]]]:
+    """Call Ollama (streaming); returns the response and the context to continue the session from."""
+    return ollama_generate(ollama_url, model, prompt, context=context, options=options, timeout=120)
+
+
+def prime_context(ollama_url: str, model: str) -> Optional[List[int]]:
+    """KV context of the session instructions alone; every question can start from it."""
+    _, primed = call_ollama(ollama_url, model,
+                            SESSION_INSTRUCTIONS + '\n\nReply "Ready." and wait for the questions.',
+                            options={'num_predict': 8})
+    return usable_context(primed)
 
 
 def query_vector_context(rest_url: str, token: str, query_vector: List[float], top_k: int = 3) -> List[Dict]:
@@ -73,11 +72,17 @@ def query_vector_context(rest_url: str, token: str, query_vector: List[float], t
 
 
 def embed_query_local(text: str, embed_service_url: str = 'http://127.0.0.1:8001') -> List[float]:
-    """Get embedding from local embedding service."""
+    """Get embedding from local embedding service (cached across runs)."""
+    cache = get_embedding_cache(LOCAL_EMBEDDING_MODEL)
+    cached = cache.get(text)
+    if cached is not None:
+        return cached
     try:
         r = requests.post(f'{embed_service_url}/embed', json={'text': text}, timeout=15)
         if r.ok:
-            return r.json().get('embedding', [])
+            emb = r.json().get('embedding', [])
+            cache.put(text, emb)
+            return emb
     except Exception:
         pass
     return []
@@ -107,6 +112,34 @@ Please provide a clear, specific answer based on the context above. If the conte
     return prompt
 
 
+def build_followup_prompt(question: str, context_hits: List[Dict]) -> str:
+    """Prompt for a question that continues the session's Ollama context (instructions already sent)."""
+    context_parts = [f"[{h.get('metadata', {}).get('title', '')}]\n{h['metadata']['content']}"
+                     for h in context_hits[:3] if h.get('metadata', {}).get('content')]
+    prompt = f"Question: {question}\n\nAnswer:"
+    if context_parts:
+        prompt = "Context from portfolio:\n" + "\n\n".join(context_parts) + "\n\n" + prompt
+    return "\n\n" + prompt
+
+
+def retrieve_context(question: str, vector_url: str, vector_token: str, embed_service: str) -> Optional[List[Dict]]:
+    """Embedding + vector query for one question; None when no embedding could be made."""
+    try:
+        query_embedding = embed_query_local(question, embed_service)
+        if not query_embedding:
+            return None
+        return query_vector_context(vector_url, vector_token, query_embedding, top_k=3)
+    except Exception as e:
+        print(f"⚠️  Retrieval failed for {question!r}: {e}")
+        return None
+
+
+def _done(value) -> Future:
+    future = Future()
+    future.set_result(value)
+    return future
+
+
 # Predefined interview questions about your portfolio
 INTERVIEW_QUESTIONS = [
     "What are your core technical skills?",
@@ -134,12 +167,23 @@ INTERVIEW_QUESTIONS = [
 
 def main():
     parser = argparse.ArgumentParser(description='Interactive interview trainer for portfolio AI')
-    parser.add_argument('--session', '-s', default=f'interview-{datetime.now().strftime("%Y%m%d-%H%M")}',
-                        help='Session ID for saving conversation')
+    parser.add_argument('--session', '-s', default=None,
+                        help='Session ID for saving conversation (default: interview-<timestamp>, '
+                             'or the latest session in the manifest with --resume)')
     parser.add_argument('--auto', action='store_true', help='Run predefined questions automatically')
     parser.add_argument('--output', '-o', default='data/interview_qa.jsonl',
                         help='Output file for Q&A pairs (JSONL format)')
     parser.add_argument('--use-rag', action='store_true', help='Use RAG (vector context) for responses')
+    parser.add_argument('--concurrency', '-c', type=int, default=int(os.getenv('OLLAMA_NUM_PARALLEL', '1')),
+                        help='Questions answered in parallel in --auto mode (default: OLLAMA_NUM_PARALLEL or 1)')
+    reuse = parser.add_mutually_exclusive_group()
+    reuse.add_argument('--chain-context', action='store_true',
+                       help="Continue Ollama's context from each answer into the next question "
+                            "(earlier answers then shape later ones; needs --concurrency 1)")
+    reuse.add_argument('--fresh-context', action='store_true',
+                       help="Don't prime a shared context either (re-send the full prompt each time)")
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip questions already completed for this session/model (see <output>.manifest.jsonl)')
     args = parser.parse_args()
 
     # Environment setup
@@ -150,26 +194,42 @@ def main():
     ollama_url = os.getenv('OLLAMA_URL', 'http://127.0.0.1:11434')
     ollama_model = os.getenv('OLLAMA_MODEL', 'llama3')
     embed_service = os.getenv('LOCAL_EMBEDDING_SERVICE_URL', 'http://127.0.0.1:8001')
+    # Logged with every answer, so the MCP answer cache only serves it for this profile
+    profile_hash = profile_content_hash(PROFILE_PATH) or ''
+    # Each Q&A pair is saved with one pipelined request
+    history_store = UpstashHistoryStore(redis_url, redis_token) if redis_url and redis_token else None
 
     if not ollama_url:
         print('Error: OLLAMA_URL not set')
         sys.exit(1)
 
+    # Output file + manifest; every answer is appended (and fsynced) as soon as it is done
+    log = TrainingLog(args.output)
+    if not args.session:
+        resumed = log.manifest.latest_session(ollama_model) if args.resume else None
+        args.session = resumed or f'interview-{datetime.now().strftime("%Y%m%d-%H%M")}'
+
     print(f"🎤 Interview Training Session: {args.session}")
     print(f"📝 Output: {args.output}")
     print(f"🤖 Model: {ollama_model}")
     print(f"🔍 RAG: {'Enabled' if args.use_rag else 'Disabled'}")
     print()
 
-    # Prepare output file
-    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    use_rag = bool(args.use_rag and vector_url and vector_token)
+
+    def question_hash(question: str) -> str:
+        # The prompt minus retrieved context, so template changes invalidate earlier runs
+        return prompt_hash(build_rag_prompt(question, []) if use_rag else question)
 
-    qa_pairs = []
     session_key = f'session:{args.session}'
 
     if args.auto:
         # Automatic mode: run through predefined questions
         questions = INTERVIEW_QUESTIONS
+        if args.resume:
+            questions = [q for q in questions
+                         if not log.manifest.is_done(args.session, q, ollama_model, question_hash(q))]
+            print(f"⏭️  Resuming: {len(INTERVIEW_QUESTIONS) - len(questions)} questions already done")
         print(f"Running {len(questions)} predefined questions...\n")
     else:
         # Interactive mode
@@ -177,60 +237,118 @@ def main():
         print("Interactive interview mode. Type 'quit' or 'exit' to finish.\n")
 
     question_num = 0
+    # Every question starts from the primed instructions, so answers are independent of
+    # each other and of question order; --chain-context continues from the previous answer
+    base_context = None
+    if not args.fresh_context and (questions or not args.auto):
+        try:
+            base_context = prime_context(ollama_url, ollama_model)
+            if base_context:
+                print(f"⚡ Session instructions primed ({len(base_context)} tokens)\n")
+        except Exception as e:
+            print(f"⚠️  Could not prime context, sending the full prompt per question: {e}\n")
+    session_context = base_context
     
     try:
         if args.auto:
-            for question in questions:
-                question_num += 1
+            concurrency = max(1, args.concurrency)
+            if concurrency > 1:
+                if args.chain_context:
+                    # Parallel answers cannot chain one context through the session
+                    print("⚠️  --chain-context needs --concurrency 1; every answer starts from the primed context")
+                print(f"⚡ Answering up to {concurrency} questions at once\n")
+
+            def answer(index: int, context: Optional[List[int]]) -> Dict[str, Any]:
+                question = questions[index]
+                context_hits = retrievals[index].result()
+                if context_hits is None:
+                    prompt = build_followup_prompt(question, []) if context else question
+                else:
+                    prompt = (build_followup_prompt(question, context_hits) if context
+                              else build_rag_prompt(question, context_hits))
+                result = {'question': question, 'context_hits': context_hits, 'new_context': None}
+                try:
+                    result['response'], result['new_context'] = call_ollama(ollama_url, ollama_model, prompt,
+                                                                            context=context)
+                except Exception as e:
+                    result['error'] = e
+                return result
+
+            def emit(index: int, result: Dict[str, Any]):
+                """Print and save one answer; called in question order"""
+                question = result['question']
                 print(f"\n{'='*70}")
-                print(f"Question {question_num}/{len(questions)}: {question}")
+                print(f"Question {index + 1}/{len(questions)}: {question}")
                 print('='*70)
-                
-                # Build prompt (with or without RAG)
-                if args.use_rag and vector_url and vector_token:
-                    # Get embedding for question
-                    query_embedding = embed_query_local(question, embed_service)
-                    if query_embedding:
-                        context_hits = query_vector_context(vector_url, vector_token, query_embedding, top_k=3)
-                        prompt = build_rag_prompt(question, context_hits)
-                        print(f"📚 Retrieved {len(context_hits)} context chunks")
-                    else:
-                        prompt = question
+                if use_rag:
+                    if result['context_hits'] is None:
                         print("⚠️  Could not get embedding, using direct question")
-                else:
-                    prompt = question
-                
-                # Call Ollama
+                    else:
+                        print(f"📚 Retrieved {len(result['context_hits'])} context chunks")
                 print("\n🤖 Response:")
-                try:
-                    response = call_ollama(ollama_url, ollama_model, prompt)
-                    print(response)
-                    
-                    # Save Q&A pair
-                    qa_pairs.append({
-                        'timestamp': datetime.now().isoformat(),
-                        'session': args.session,
-                        'question': question,
-                        'response': response,
-                        'used_rag': args.use_rag
-                    })
-                    
-                    # Save to Redis history
-                    if redis_url and redis_token:
-                        try:
-                            upstash_command(redis_url, redis_token, 
-                                          ['LPUSH', session_key, json.dumps({'role': 'user', 'content': question})])
-                            upstash_command(redis_url, redis_token,
-                                          ['LPUSH', session_key, json.dumps({'role': 'assistant', 'content': response})])
-                            upstash_command(redis_url, redis_token, ['EXPIRE', session_key, '86400'])
-                        except Exception as e:
-                            print(f"⚠️  Warning: Could not save to Redis: {e}")
-                    
-                except Exception as e:
-                    print(f"❌ Error: {e}")
-                    continue
-                
-                time.sleep(0.5)  # Brief pause between questions
+                if 'error' in result:
+                    print(f"❌ Error: {result['error']}")
+                    return
+                response = result['response']
+                print(response)
+
+                # Save Q&A pair
+                log.record({
+                    'timestamp': datetime.now().isoformat(),
+                    'session': args.session,
+                    'question': question,
+                    'response': response,
+                    'used_rag': args.use_rag,
+                    'profile_hash': profile_hash
+                }, ollama_model, question_hash(question))
+
+                # Save to Redis history
+                if history_store:
+                    try:
+                        history_store.append(session_key, [{'role': 'user', 'content': question},
+                                                           {'role': 'assistant', 'content': response}], ttl=86400)
+                    except Exception as e:
+                        print(f"⚠️  Warning: Could not save to Redis: {e}")
+
+            retrieval_pool = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS)
+            generation_pool = ThreadPoolExecutor(max_workers=concurrency)
+            finished = False
+            try:
+                # Embedding + retrieval for every question starts now and runs ahead of generation
+                retrievals = [
+                    retrieval_pool.submit(retrieve_context, q, vector_url, vector_token, embed_service) if use_rag
+                    else _done(None)
+                    for q in questions
+                ]
+                if concurrency == 1:
+                    for index in range(len(questions)):
+                        result = answer(index, session_context)
+                        if args.chain_context:
+                            # Continue from this answer; a context grown too long falls back to the base
+                            session_context = usable_context(result['new_context']) or base_context
+                        emit(index, result)
+                else:
+                    # Only a window of questions is submitted at a time, so an interrupted run
+                    # leaves little queued work; answers are emitted in question order
+                    window = 2 * concurrency
+                    in_flight: Dict[Future, int] = {}
+                    ready: Dict[int, Dict[str, Any]] = {}
+                    next_submit = next_emit = 0
+                    while next_emit < len(questions):
+                        while next_submit < len(questions) and next_submit - next_emit < window:
+                            in_flight[generation_pool.submit(answer, next_submit, base_context)] = next_submit
+                            next_submit += 1
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            ready[in_flight.pop(future)] = future.result()
+                        while next_emit in ready:
+                            emit(next_emit, ready.pop(next_emit))
+                            next_emit += 1
+                finished = True
+            finally:
+                # On Ctrl-C or an error, drop queued questions instead of waiting for them to generate
+                retrieval_pool.shutdown(wait=finished, cancel_futures=not finished)
+                generation_pool.shutdown(wait=finished, cancel_futures=not finished)
         else:
             # Interactive mode
             while True:
@@ -246,36 +364,38 @@ def main():
                         query_embedding = embed_query_local(question, embed_service)
                         if query_embedding:
                             context_hits = query_vector_context(vector_url, vector_token, query_embedding, top_k=3)
-                            prompt = build_rag_prompt(question, context_hits)
+                            prompt = (build_followup_prompt(question, context_hits) if session_context
+                                      else build_rag_prompt(question, context_hits))
                             print(f"📚 Retrieved {len(context_hits)} context chunks")
                         else:
-                            prompt = question
+                            prompt = build_followup_prompt(question, []) if session_context else question
                             print("⚠️  Could not get embedding, using direct question")
                     else:
-                        prompt = question
+                        prompt = build_followup_prompt(question, []) if session_context else question
                     
                     # Call Ollama
                     print("\n🤖 Response:")
-                    response = call_ollama(ollama_url, ollama_model, prompt)
+                    response, new_context = call_ollama(ollama_url, ollama_model, prompt, context=session_context)
+                    if args.chain_context:
+                        # Continue from this answer; a context grown too long falls back to the base
+                        session_context = usable_context(new_context) or base_context
                     print(response)
                     
                     # Save Q&A pair
-                    qa_pairs.append({
+                    log.record({
                         'timestamp': datetime.now().isoformat(),
                         'session': args.session,
                         'question': question,
                         'response': response,
-                        'used_rag': args.use_rag
-                    })
+                        'used_rag': args.use_rag,
+                        'profile_hash': profile_hash
+                    }, ollama_model, question_hash(question))
                     
                     # Save to Redis history
-                    if redis_url and redis_token:
+                    if history_store:
                         try:
-                            upstash_command(redis_url, redis_token,
-                                          ['LPUSH', session_key, json.dumps({'role': 'user', 'content': question})])
-                            upstash_command(redis_url, redis_token,
-                                          ['LPUSH', session_key, json.dumps({'role': 'assistant', 'content': response})])
-                            upstash_command(redis_url, redis_token, ['EXPIRE', session_key, '86400'])
+                            history_store.append(session_key, [{'role': 'user', 'content': question},
+                                                               {'role': 'assistant', 'content': response}], ttl=86400)
                         except Exception as e:
                             print(f"⚠️  Warning: Could not save to Redis: {e}")
                     
@@ -287,13 +407,9 @@ def main():
                     continue
     
     finally:
-        # Save all Q&A pairs to file
-        if qa_pairs:
-            with open(args.output, 'a', encoding='utf-8') as f:
-                for qa in qa_pairs:
-                    f.write(json.dumps(qa) + '\n')
-            
-            print(f"\n\n✅ Saved {len(qa_pairs)} Q&A pairs to {args.output}")
+        # Q&A pairs were written as they completed
+        if log.written:
+            print(f"\n\n✅ Saved {log.written} Q&A pairs to {args.output}")
             print(f"📊 Session: {args.session}")
             print(f"💾 Redis history key: {session_key}")
         else:
@@ -0,0 +1,11 @@
+"""
+Shared test setup: the MCP tools and scripts import each other as top-level
+packages (tools.*), the same way the servers and scripts put mcp/ on sys.path
+"""
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+for path in (ROOT / "mcp", ROOT / "scripts"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
@@ -0,0 +1,208 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from tools import answer_cache  # noqa: E402
+from tools.answer_cache import SemanticAnswerCache  # noqa: E402
+from tools.qa_store import QAStore, normalize_question  # noqa: E402
+
+VOCAB = ["skills", "project", "challenging", "databases", "testing", "your", "core", "technical"]
+
+
+class FakeEmbedder:
+    """Bag-of-words vectors over VOCAB; can be switched off or slowed down"""
+
+    def __init__(self):
+        self.calls = 0
+        self.down = False
+        self.delay = 0.0
+
+    async def __call__(self, text, use_local=True):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.down:
+            return None
+        words = normalize_question(text).replace("?", "").split()
+        return [float(words.count(w)) for w in VOCAB]
+
+
+@pytest.fixture
+def embedder(monkeypatch):
+    fake = FakeEmbedder()
+    monkeypatch.setattr(answer_cache, "embed_query", fake)
+    monkeypatch.setattr(answer_cache, "SYNC_INTERVAL", 0.0)
+    return fake
+
+
+def log_answer(path, question, answer, when=None, mode="a", profile_hash=None):
+    when = when or datetime.now()
+    record = {"timestamp": when.isoformat(), "session": "s", "question": question, "response": answer}
+    if profile_hash is not None:
+        record["profile_hash"] = profile_hash
+    with open(path, mode, encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def make_cache(tmp_path, **kwargs):
+    return SemanticAnswerCache(QAStore(tmp_path / "qa.jsonl"), threshold=0.9, **kwargs)
+
+
+def test_paraphrase_hits_after_sync(tmp_path, embedder):
+    log_answer(tmp_path / "qa.jsonl", "What are your core technical skills?", "Python and React")
+    cache = make_cache(tmp_path)
+
+    async def scenario():
+        await cache.sync()
+        hit = await cache.lookup("your   core TECHNICAL skills?")
+        miss = await cache.lookup("Tell me about testing")
+        return hit, miss
+
+    hit, miss = asyncio.run(scenario())
+    assert hit["answer"] == "Python and React" and hit["similarity"] >= 0.9
+    assert miss is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lookup_never_embeds_the_log_itself(tmp_path, embedder):
+    log_answer(tmp_path / "qa.jsonl", "What are your core technical skills?", "Python")
+    cache = make_cache(tmp_path)
+
+    async def scenario():
+        first = await cache.lookup("What are your core technical skills?")
+        await cache._sync_task  # the background sync started by the lookup
+        second = await cache.lookup("What are your core technical skills?")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first is None and second["answer"] == "Python"
+
+
+def test_newest_answer_wins_and_reuses_the_vector(tmp_path, embedder):
+    path = tmp_path / "qa.jsonl"
+    log_answer(path, "Your challenging project?", "old")
+    cache = make_cache(tmp_path)
+
+    async def scenario():
+        await cache.sync()
+        calls = embedder.calls
+        log_answer(path, "your challenging  project?", "new")
+        await cache.sync()
+        return calls, await cache.lookup("Your challenging project?")
+
+    calls, hit = asyncio.run(scenario())
+    assert hit["answer"] == "new"
+    assert embedder.calls == calls + 1  # only the lookup embedded anything
+
+
+def test_stale_answers_and_profile_changes_invalidate(tmp_path, embedder):
+    path = tmp_path / "qa.jsonl"
+    log_answer(path, "Your core skills?", "ancient", when=datetime.now() - timedelta(days=40))
+    log_answer(path, "Your databases?", "Postgres")
+    cache = make_cache(tmp_path, max_age_seconds=30 * 86400)
+
+    async def scenario():
+        await cache.sync()
+        stale = await cache.lookup("Your core skills?")
+        cache.observe_profile("hash-1", 1)
+        kept = await cache.lookup("Your databases?")
+        # Unhashed answers are dropped once the profile file changes after them
+        cache.observe_profile("hash-2", 2, modified_at=time.time())
+        dropped = await cache.lookup("Your databases?")
+        return stale, kept, dropped
+
+    stale, kept, dropped = asyncio.run(scenario())
+    assert stale is None and kept["answer"] == "Postgres" and dropped is None
+    assert cache.invalidations == 1
+
+
+def test_failed_embeds_back_off_instead_of_retrying_every_call(tmp_path, embedder):
+    path = tmp_path / "qa.jsonl"
+    for q in ("Your skills?", "Your project?", "Your testing?"):
+        log_answer(path, q, "a")
+    cache = make_cache(tmp_path)
+    embedder.down = True
+
+    async def scenario():
+        await cache.sync()
+        calls = embedder.calls
+        for _ in range(5):
+            await cache.sync()
+            await cache.lookup("Your skills?")
+        return calls
+
+    calls = asyncio.run(scenario())
+    assert calls <= 3  # the first batch only; everything after waits for the backoff
+    assert embedder.calls == calls
+    assert len(cache._unembedded) == 3
+
+    embedder.down = False
+    cache._embed_retry_at = 0.0
+
+    async def recover():
+        await cache.sync()
+        return await cache.lookup("Your testing?")
+
+    assert asyncio.run(recover())["answer"] == "a"
+
+
+def test_slow_embedding_is_bounded_by_the_lookup_timeout(tmp_path, embedder):
+    log_answer(tmp_path / "qa.jsonl", "Your skills?", "a")
+    cache = make_cache(tmp_path, lookup_timeout=0.05)
+
+    async def scenario():
+        await cache.sync()
+        embedder.delay = 1.0
+        started = time.monotonic()
+        result = await cache.lookup("Your skills?")
+        return result, time.monotonic() - started
+
+    result, elapsed = asyncio.run(scenario())
+    assert result is None and elapsed < 0.5
+    assert cache.embed_failures == 1
+
+
+def test_truncated_log_is_read_again_from_the_start(tmp_path, embedder):
+    path = tmp_path / "qa.jsonl"
+    for i in range(3):
+        log_answer(path, f"Your project {i}?", f"answer {i}")
+    cache = make_cache(tmp_path)
+
+    async def scenario():
+        await cache.sync()
+        log_answer(path, "Your databases?", "Postgres", mode="w")
+        await cache.sync()
+        return await cache.lookup("Your databases?"), await cache.lookup("Your project 1?")
+
+    fresh, gone = asyncio.run(scenario())
+    assert fresh["answer"] == "Postgres"
+    assert gone is None
+    assert cache.stats()["entries"] == 1
+
+
+def test_answers_only_serve_the_profile_they_were_generated_from(tmp_path, embedder):
+    path = tmp_path / "qa.jsonl"
+    log_answer(path, "Your core skills?", "from A", profile_hash="A")
+    log_answer(path, "Your databases?", "from B", profile_hash="B")
+
+    async def lookups(cache):
+        await cache.sync()
+        return [hit and hit["answer"] for hit in
+                (await cache.lookup("Your core skills?"), await cache.lookup("Your databases?"))]
+
+    # A fresh cache stands in for a restarted server: nothing is remembered in memory
+    cache = make_cache(tmp_path)
+    cache.observe_profile("A", 1)
+    assert asyncio.run(lookups(cache)) == ["from A", None]
+
+    cache.observe_profile("B", 2)
+    assert asyncio.run(lookups(cache)) == [None, "from B"]  # B's answer was skipped before
+
+    restarted = make_cache(tmp_path)
+    restarted.observe_profile("B", 1)
+    assert asyncio.run(lookups(restarted)) == [None, "from B"]
@@ -0,0 +1,64 @@
+import asyncio
+import math
+
+from tools.portfolio_tools import search_experience
+from tools.search_index import BM25_K1, PortfolioIndex
+
+
+def item(title, action="", result=""):
+    return {"title": title, "situation": "", "task": "", "action": action, "result": result}
+
+
+def test_title_match_outranks_body_match():
+    index = PortfolioIndex({"star_items": [
+        item("Dashboard", action="Used redis for caching"),
+        item("Redis migration", action="Moved sessions"),
+    ]})
+    total, ranked = index.bm25_search("redis")
+    assert total == 2
+    assert [doc_id for doc_id, _ in ranked] == [1, 0]
+
+
+def test_rare_terms_weigh_more_than_common_ones():
+    index = PortfolioIndex({"star_items": [
+        item("A", action="python python"),
+        item("B", action="python wcag"),
+        item("C", action="python"),
+    ]})
+    _, ranked = index.bm25_search("python wcag")
+    assert ranked[0][0] == 1
+
+
+def test_single_posting_matches_the_bm25f_formula():
+    index = PortfolioIndex({"star_items": [item("redis"), item("other")]})
+    _, [(doc_id, score)] = index.bm25_search("redis")
+    idf = math.log(1.0 + (2 - 1 + 0.5) / (1 + 0.5))
+    # One title term in a title of average length: pseudo tf is just the title weight
+    pseudo_tf = 3.0
+    assert doc_id == 0
+    assert math.isclose(score, idf * pseudo_tf / (BM25_K1 + pseudo_tf))
+
+
+def test_top_k_keeps_the_best_and_reports_every_match():
+    index = PortfolioIndex({"star_items": [item(f"api {i}", action="api " * i) for i in range(1, 8)]})
+    total, full = index.bm25_search("api", top_k=None)
+    _, top = index.bm25_search("api", top_k=3)
+    assert total == 7
+    assert top == full[:3]
+    assert index.bm25_search("api", top_k=0) == (7, [])
+
+
+def test_ties_keep_profile_order():
+    index = PortfolioIndex({"star_items": [item("react"), item("react"), item("react")]})
+    _, ranked = index.bm25_search("react", top_k=2)
+    assert [doc_id for doc_id, _ in ranked] == [0, 1]
+
+
+def test_search_experience_payload():
+    profile = {"star_items": [item("Redis cache", action="Cached answers")]}
+    result = asyncio.run(search_experience("redis", PortfolioIndex(profile)))
+    assert result["matches_found"] == 1
+    [match] = result["results"]
+    assert match["title"] == "Redis cache"
+    assert match["match_score"] > 0
+    assert asyncio.run(search_experience("nothing", PortfolioIndex(profile)))["results"] == []
@@ -0,0 +1,70 @@
+from tools.indexing_pipeline import (
+    Document, chunk_documents, item_chunker, section_chunker, split_sentences, token_chunks
+)
+
+
+def words(text: str) -> int:
+    return len(text.split())
+
+
+def test_splits_on_sentence_ends_and_line_breaks():
+    text = 'First one. Second one? Third! "Quoted." (Bracketed.) Last\nline break'
+    assert list(split_sentences(text)) == [
+        "First one.", "Second one?", "Third!", '"Quoted."', "(Bracketed.)", "Last", "line break"
+    ]
+
+
+def test_abbreviations_and_initials_do_not_end_sentences():
+    text = "Used tools, e.g. Redis and i.e. caching. Mr. Smith met J. R. Doe. Then U.S. Inc. left."
+    assert list(split_sentences(text)) == [
+        "Used tools, e.g. Redis and i.e. caching.",
+        "Mr. Smith met J. R. Doe.",
+        "Then U.S. Inc. left.",
+    ]
+
+
+def test_a_period_before_lowercase_does_not_end_a_sentence():
+    assert list(split_sentences("Shipped v2. then v3. Done.")) == ["Shipped v2. then v3.", "Done."]
+    assert list(split_sentences("Built on Node.js. Fast.")) == ["Built on Node.js.", "Fast."]
+
+
+def test_chunks_pack_whole_sentences_within_budget():
+    text = "One two three. Four five six. Seven eight nine. Ten eleven twelve."
+    assert token_chunks(text, words, 6) == ["One two three. Four five six.", "Seven eight nine. Ten eleven twelve."]
+
+
+def test_overlap_repeats_trailing_sentences():
+    text = "Aa bb. Cc dd. Ee ff. Gg hh."
+    assert token_chunks(text, words, 4, overlap_tokens=2) == ["Aa bb. Cc dd.", "Cc dd. Ee ff.", "Ee ff. Gg hh."]
+
+
+def test_long_sentences_are_split_into_word_windows():
+    text = " ".join(f"w{i}" for i in range(10)) + "."
+    chunks = token_chunks(text, words, 4)
+    assert all(words(c) <= 4 for c in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_empty_text_has_no_chunks():
+    assert token_chunks("", words, 10) == []
+    assert token_chunks("   \n ", words, 10) == []
+
+
+def test_section_chunker_ids_and_metadata():
+    sentences = [" ".join(f"{letter}{i}" for i in range(10)) + "." for letter in "ABC"]
+    doc = Document(id="p1", title="Portfolio", sections=[("action", " ".join(sentences)), ("result", "Done.")])
+    # 20 tokens minus the 3-token header leaves room for one 10-word sentence per chunk
+    chunks = list(chunk_documents([doc], section_chunker(words, max_tokens=20)))
+    assert [c.id for c in chunks] == ["p1-action", "p1-action-1", "p1-action-2", "p1-result"]
+    assert chunks[0].text == "Portfolio — Action: " + sentences[0]
+    assert chunks[1].metadata == {
+        "source_id": "p1", "title": "Portfolio", "section": "Action", "chunk_index": 1, "content": sentences[1]
+    }
+    # Without a token counter every section is one chunk
+    assert len(list(section_chunker()(doc))) == 2
+
+
+def test_item_chunker_covers_title_and_sections():
+    doc = Document(id="p1", title="Title", sections=[("task", "x y."), ("result", "z.")])
+    [chunk] = item_chunker(words, max_tokens=50)(doc)
+    assert chunk.id == "p1-item" and chunk.text == "Title x y. z."
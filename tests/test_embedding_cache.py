@@ -0,0 +1,94 @@
+import asyncio
+import threading
+
+from tools.embedding_cache import EmbeddingCache, cache_key
+
+
+def test_memory_hit_returns_a_copy(tmp_path):
+    cache = EmbeddingCache("model", cache_dir=None)
+    cache.put("hello", [1.0, 2.0])
+    vector = cache.get("hello")
+    vector[0] = 99.0
+    assert cache.get("hello") == [1.0, 2.0]
+    assert cache.hits == 2
+
+
+def test_keys_ignore_whitespace_differences():
+    assert cache_key("m", "a  b\n") == cache_key("m", "a b")
+    assert cache_key("m", "a b") != cache_key("other", "a b")
+
+
+def test_lru_evicts_oldest_memory_entry():
+    cache = EmbeddingCache("model", cache_dir=None, max_memory_entries=2)
+    for text in ("a", "b", "c"):
+        cache.put(text, [1.0])
+    assert cache.get("a") is None
+    assert cache.get("c") == [1.0]
+
+
+def test_disk_tier_is_shared_between_instances(tmp_path):
+    writer = EmbeddingCache("model/v1", cache_dir=tmp_path)
+    writer.put("question", [0.5, -0.25, 1.0])
+    reader = EmbeddingCache("model/v1", cache_dir=tmp_path)
+    assert reader.get("question") == [0.5, -0.25, 1.0]
+    assert reader.disk_hits == 1
+    assert reader.get("unknown") is None
+
+
+def test_wrong_dimension_is_not_stored(tmp_path):
+    cache = EmbeddingCache("model", cache_dir=tmp_path)
+    cache.put("a", [1.0, 2.0])
+    cache.put("b", [1.0, 2.0, 3.0])
+    assert EmbeddingCache("model", cache_dir=tmp_path).get("b") is None
+
+
+def test_torn_trailing_row_is_dropped_on_next_append(tmp_path):
+    cache = EmbeddingCache("model", cache_dir=tmp_path)
+    cache.put("a", [1.0, 2.0])
+    with open(tmp_path / "model.f32", "ab") as f:
+        f.write(b"\x00\x01\x02")  # a writer that crashed mid-row
+    cache.put("b", [3.0, 4.0])
+    fresh = EmbeddingCache("model", cache_dir=tmp_path)
+    assert fresh.get("a") == [1.0, 2.0]
+    assert fresh.get("b") == [3.0, 4.0]
+
+
+def test_concurrent_writers_never_share_a_row(tmp_path):
+    # Separate instances stand in for separate processes appending to one file
+    writers = [EmbeddingCache("model", cache_dir=tmp_path) for _ in range(4)]
+
+    def write(w: int):
+        for i in range(50):
+            writers[w].put(f"{w}-{i}", [float(w), float(i)])
+
+    threads = [threading.Thread(target=write, args=(w,)) for w in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    reader = EmbeddingCache("model", cache_dir=tmp_path)
+    for w in range(4):
+        for i in range(50):
+            assert reader.get(f"{w}-{i}") == [float(w), float(i)]
+    assert reader.stats()["disk_entries"] == 200
+
+
+def test_async_api_serves_memory_inline_and_disk_in_a_thread(tmp_path, monkeypatch):
+    writer = EmbeddingCache("model", cache_dir=tmp_path)
+    asyncio.run(writer.aput("q", [1.0, 2.0]))
+    reader = EmbeddingCache("model", cache_dir=tmp_path)
+
+    offloaded = []
+    real_to_thread = asyncio.to_thread
+
+    async def to_thread(fn, *args):
+        offloaded.append(fn.__name__)
+        return await real_to_thread(fn, *args)
+
+    monkeypatch.setattr(asyncio, "to_thread", to_thread)
+    assert asyncio.run(reader.aget("q")) == [1.0, 2.0]  # disk tier
+    assert asyncio.run(reader.aget("q")) == [1.0, 2.0]  # now in memory
+    assert asyncio.run(reader.aget("missing")) is None
+    assert offloaded == ["_get_disk", "_get_disk"]
+    assert (reader.hits, reader.disk_hits, reader.misses) == (1, 1, 1)
@@ -0,0 +1,55 @@
+import base64
+import json
+import struct
+
+import pytest
+
+from tools import embedding_codec
+from tools.embedding_codec import (
+    BINARY_MEDIA_TYPE, decode_base64, decode_binary, decode_embed_response, pack_header
+)
+
+ROWS = [[0.5, -1.0, 2.0], [0.0, 0.25, -0.125]]
+
+
+def payload(dtype: str) -> bytes:
+    fmt = "<f" if dtype == "float32" else "<e"
+    return b"".join(struct.pack(fmt, v) for row in ROWS for v in row)
+
+
+@pytest.fixture(params=["numpy", "stdlib"])
+def decoder(request, monkeypatch):
+    if request.param == "stdlib":
+        monkeypatch.setattr(embedding_codec, "np", None)
+    elif embedding_codec.np is None:
+        pytest.skip("numpy not installed")
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_binary_round_trip(decoder, dtype):
+    body = pack_header(dtype, 2, 3) + payload(dtype)
+    assert len(pack_header(dtype, 2, 3)) == 16
+    assert decode_binary(body) == ROWS
+    assert decode_embed_response(body, f"{BINARY_MEDIA_TYPE}; charset=binary") == ROWS
+
+
+def test_base64_round_trip(decoder):
+    obj = {"dtype": "float16", "shape": [2, 3], "data": base64.b64encode(payload("float16")).decode()}
+    assert decode_base64(obj) == ROWS
+    assert decode_embed_response(json.dumps(obj).encode(), "application/json") == ROWS
+
+
+def test_plain_json_shapes():
+    assert decode_embed_response(json.dumps({"embedding": ROWS[0]}).encode(), "application/json") == [ROWS[0]]
+    assert decode_embed_response(json.dumps({"embeddings": ROWS}).encode(), None) == ROWS
+    with pytest.raises(ValueError):
+        decode_embed_response(b'{"other": 1}', "application/json")
+
+
+def test_rejects_bad_headers_and_truncated_payloads(decoder):
+    with pytest.raises(ValueError):
+        decode_binary(b"short")
+    with pytest.raises(ValueError):
+        decode_binary(b"NOPE" + pack_header("float32", 2, 3)[4:] + payload("float32"))
+    with pytest.raises(ValueError):
+        decode_binary(pack_header("float32", 2, 3) + payload("float32")[:-4])
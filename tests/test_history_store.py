@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+import pytest
+
+from tools.history_store import (
+    HistoryStore, InMemoryHistoryStore, UpstashHistoryStore, create_history_store, parse_history, turn_commands
+)
+
+
+def message(i: int) -> dict:
+    return {"role": "user" if i % 2 == 0 else "assistant", "content": f"m{i}"}
+
+
+def test_turn_commands_push_trim_and_expire_in_one_batch():
+    commands = turn_commands("chat:s", [message(0), "plain"], max_len=20, ttl=60)
+    assert commands == [
+        ["LPUSH", "chat:s", json.dumps(message(0)), "plain"],
+        ["LTRIM", "chat:s", "0", "19"],
+        ["EXPIRE", "chat:s", "60"],
+    ]
+    assert turn_commands("k", [message(0)], None, None) == [["LPUSH", "k", json.dumps(message(0))]]
+
+
+def test_parse_history_is_chronological_and_tolerates_plain_strings():
+    raw = [json.dumps(message(1)), "hello"]  # LRANGE order: newest first
+    assert parse_history(raw) == [{"role": "user", "content": "hello"}, message(1)]
+    assert parse_history(None) == []
+
+
+def test_append_and_load_round_trip_with_trim():
+    store = InMemoryHistoryStore()
+    for i in range(0, 6, 2):
+        store.append("k", [message(i), message(i + 1)], max_len=4, ttl=60)
+    assert store.load("k", 10) == [message(i) for i in range(2, 6)]
+    assert store.load("k", 2) == [message(4), message(5)]
+    assert store.round_trips == 5
+
+
+def test_load_with_runs_extra_commands_in_the_same_round_trip():
+    store = InMemoryHistoryStore()
+    store.pipeline([["SET", "summary", "short"]])
+    history, extra = store.load_with("k", 5, [["GET", "summary"]])
+    assert history == [] and extra == ["short"]
+    assert store.round_trips == 2
+
+
+def test_reads_do_not_create_keys():
+    store = InMemoryHistoryStore()
+    store.load("missing", 5)
+    store.pipeline([["EXPIRE", "missing", "10"], ["LTRIM", "missing", "0", "1"]])
+    assert "missing" not in store.lists and not store.expires
+
+
+def test_async_api_matches_sync():
+    store = InMemoryHistoryStore()
+    asyncio.run(store.aappend("k", [message(0)], max_len=5, extra=[["SET", "summary", "short"]]))
+    assert asyncio.run(store.aload("k", 5)) == [message(0)]
+    assert store.strings["summary"] == "short"
+    assert store.round_trips == 2
+
+
+def test_stores_must_implement_both_pipelines():
+    class SyncOnly(HistoryStore):
+        def pipeline(self, commands):
+            return []
+
+    with pytest.raises(TypeError):
+        SyncOnly()
+
+
+def test_history_is_off_without_redis_configuration():
+    assert create_history_store(None, None) is None
+    assert create_history_store("https://redis.example", "") is None
+    store = create_history_store("https://redis.example/", "token", transaction=True)
+    assert isinstance(store, UpstashHistoryStore)
+    assert store.url == "https://redis.example/multi-exec"
+
+
+def test_upstash_results_unwrap_and_raise_command_errors():
+    assert UpstashHistoryStore._results([{"result": 2}, {"result": "OK"}]) == [2, "OK"]
+    with pytest.raises(RuntimeError):
+        UpstashHistoryStore._results([{"result": 1}, {"error": "WRONGTYPE"}])
+    with pytest.raises(RuntimeError):
+        UpstashHistoryStore._results({"error": "unauthorized"})
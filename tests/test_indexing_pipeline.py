@@ -0,0 +1,153 @@
+import json
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from tools.indexing_pipeline import (  # noqa: E402
+    Chunk, Embedder, LocalStoreSink, Sink, load_manifest, run_pipeline
+)
+from tools.vector_store import LocalVectorStore  # noqa: E402
+
+
+class FakeEmbedder(Embedder):
+    name = "fake-model"
+    batch_size = 1
+
+    def __init__(self, fail_on=()):
+        self.fail_on = set(fail_on)
+        self.embedded = []
+
+    def embed(self, texts):
+        if self.fail_on.intersection(texts):
+            raise RuntimeError("embedding failed")
+        self.embedded.extend(texts)
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+class MemorySink(Sink):
+    """Records writes; fails (stopping the run) once fail_after records were written"""
+
+    def __init__(self, manifest_path, fail_after=None):
+        super().__init__(manifest_path, "memory")
+        self.label = "memory"
+        self.fail_after = fail_after
+        self.vectors = {}
+        self.deleted = []
+
+    @property
+    def failed(self):
+        if self.fail_after is not None and self.written >= self.fail_after:
+            return "upload failed"
+        return None
+
+    def write(self, records):
+        for r in records:
+            self.vectors[r["id"]] = r["vector"]
+        self.written += len(records)
+
+    def delete(self, ids):
+        self.deleted.extend(ids)
+
+
+def chunks(texts):
+    return lambda: [Chunk(id=cid, text=text, metadata={"content": text}) for cid, text in texts.items()]
+
+
+def test_base_classes_are_abstract():
+    with pytest.raises(TypeError):
+        Embedder()
+    with pytest.raises(TypeError):
+        Sink("m.json", "t")
+    assert FakeEmbedder().batch_size == 1 and Embedder.batch_size == 64
+
+
+def test_second_run_only_embeds_changes_and_deletes_removed(tmp_path):
+    sink = MemorySink(tmp_path / "m.json")
+    run_pipeline(chunks({"a": "one", "b": "two", "c": "three"}), FakeEmbedder(), [sink])
+    assert set(sink.vectors) == {"a", "b", "c"}
+
+    embedder = FakeEmbedder()
+    sink = MemorySink(tmp_path / "m.json")
+    stats = run_pipeline(chunks({"a": "one", "b": "TWO", "d": "four"}), embedder, [sink])
+    assert sorted(embedder.embedded) == ["TWO", "four"]
+    assert sink.deleted == ["c"]
+    assert stats["embedded"] == 2
+    assert set(load_manifest(tmp_path / "m.json", "fake-model", "memory")) == {"a", "b", "d"}
+
+
+def test_dry_run_writes_nothing(tmp_path):
+    sink = MemorySink(tmp_path / "m.json")
+    stats = run_pipeline(chunks({"a": "one"}), FakeEmbedder(), [sink], dry_run=True)
+    assert stats["todo"] == 1 and not sink.vectors
+    assert not (tmp_path / "m.json").exists()
+
+
+def test_failed_embeddings_are_retried_next_run(tmp_path):
+    sink = MemorySink(tmp_path / "m.json")
+    run_pipeline(chunks({"a": "one", "b": "two"}), FakeEmbedder(fail_on={"two"}), [sink])
+    assert set(load_manifest(tmp_path / "m.json", "fake-model", "memory")) == {"a"}
+
+    embedder = FakeEmbedder()
+    run_pipeline(chunks({"a": "one", "b": "two"}), embedder, [MemorySink(tmp_path / "m.json")])
+    assert embedder.embedded == ["two"]
+
+
+def test_stopped_run_keeps_old_vectors_marked_stale(tmp_path):
+    prefix = tmp_path / "store"
+    texts = {"a": "one", "b": "two", "c": "three"}
+    run_pipeline(chunks(texts), FakeEmbedder(), [LocalStoreSink(prefix)])
+
+    # Every chunk changes, but the other sink fails after the first batch
+    changed = {cid: text.upper() for cid, text in texts.items()}
+    local = LocalStoreSink(prefix)
+    run_pipeline(chunks(changed), FakeEmbedder(), [MemorySink(tmp_path / "m.json", fail_after=1), local])
+    manifest = json.loads((tmp_path / "store.manifest.json").read_text())["chunks"]
+    store = LocalVectorStore.load(prefix)
+    assert store.ids == ["a", "b", "c"]  # old vectors kept for b and c
+
+    # The next run re-embeds exactly the chunks the stopped run never reached
+    embedder = FakeEmbedder()
+    run_pipeline(chunks(changed), embedder, [LocalStoreSink(prefix)])
+    assert sorted(embedder.embedded) == ["THREE", "TWO"]
+    assert manifest != json.loads((tmp_path / "store.manifest.json").read_text())["chunks"]
+
+
+def test_a_failing_sink_does_not_stop_the_others_from_finishing(tmp_path):
+    class FailingFinish(MemorySink):
+        def complete(self):
+            raise RuntimeError("2 upload batches failed")
+
+    prefix = tmp_path / "store"
+    with pytest.raises(RuntimeError, match="memory: 2 upload batches failed"):
+        run_pipeline(chunks({"a": "one", "b": "two"}), FakeEmbedder(),
+                     [FailingFinish(tmp_path / "m.json"), LocalStoreSink(prefix)])
+    assert LocalVectorStore.load(prefix).ids == ["a", "b"]
+
+    # The local store saved its manifest, so it has nothing left to embed
+    embedder = FakeEmbedder()
+    run_pipeline(chunks({"a": "one", "b": "two"}), embedder, [LocalStoreSink(prefix)])
+    assert embedder.embedded == []
+
+
+def test_openai_inputs_over_the_limit_become_a_mean_of_windows(monkeypatch):
+    from tools import indexing_pipeline
+
+    monkeypatch.setattr(indexing_pipeline, "OPENAI_MAX_TOKENS_PER_INPUT", 4)
+    embedder = indexing_pipeline.OpenAIEmbedder()
+    embedder.count_tokens = lambda text: len(text.split())
+    requests = []
+
+    def create(texts):
+        requests.append(texts)
+        return [[1.0, 0.0] if t.startswith("a") else [0.0, 1.0] for t in texts]
+
+    embedder._create = create
+    long_text = "a1 a2 a3 a4 b1 b2 b3 b4"
+    batch = next(embedder.batches([Chunk(id="short", text="a b"), Chunk(id="long", text=long_text)]))
+    assert [c.id for c in batch] == ["short", "long"]  # nothing is skipped
+
+    short, long_vector = embedder.embed(["a b", long_text])
+    assert requests == [["a b", "a1 a2 a3 a4", "b1 b2 b3 b4"]]
+    assert short == [1.0, 0.0]
+    assert long_vector == pytest.approx([2 ** -0.5, 2 ** -0.5])
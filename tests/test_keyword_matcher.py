@@ -0,0 +1,35 @@
+from tools.keyword_matcher import KeywordMatcher
+from tools.portfolio_tools import extract_technologies
+
+
+def test_finds_overlapping_and_nested_patterns():
+    matcher = KeywordMatcher([(p, p) for p in ("he", "she", "his", "hers")])
+    assert matcher.scan("ushers") == {"he", "she", "hers"}
+    assert matcher.scan("this") == {"his"}
+
+
+def test_is_case_insensitive_and_substring_based():
+    matcher = KeywordMatcher([("Next.js", "next"), ("ui", "ui")])
+    assert matcher.scan("Built the NEXT.JS build pipeline") == {"next", "ui"}
+
+
+def test_patterns_can_share_payloads_and_payloads_can_share_patterns():
+    matcher = KeywordMatcher([("api", ("skills", "backend")), ("api", ("tech", None)), ("rest", ("tech", None))])
+    assert matcher.scan("a rest api") == {("skills", "backend"), ("tech", None)}
+
+
+def test_failure_links_recover_after_partial_match():
+    matcher = KeywordMatcher([("abcd", 1), ("bce", 2)])
+    assert matcher.scan("abce") == {2}
+    assert matcher.scan("abcabcd") == {1}
+
+
+def test_empty_patterns_and_text():
+    matcher = KeywordMatcher([("", "empty"), ("x", "x")])
+    assert matcher.payloads == ["x"]
+    assert matcher.scan("") == set()
+
+
+def test_extract_technologies_keeps_display_order():
+    item = {"action": "Wrote TypeScript and React with Redis", "result": "Deployed on Vercel"}
+    assert extract_technologies(item) == ["React", "TypeScript", "Redis", "Vercel"]
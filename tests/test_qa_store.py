@@ -0,0 +1,158 @@
+import asyncio
+import json
+import os
+import threading
+
+from tools import interview_tools
+from tools.qa_store import HEADER, QAStore, key_hash, normalize_question, to_epoch
+
+
+def record(i: int, session: str = "s1", question: str = None) -> dict:
+    return {
+        "timestamp": f"2026-01-{i % 28 + 1:02d}T10:00:00",
+        "session": session,
+        "question": question or f"Question {i}?",
+        "response": f"Answer {i}"
+    }
+
+
+def write_log(path, records, mode="a"):
+    with open(path, mode, encoding="utf-8") as f:
+        for r in records:
+            f.write(json.dumps(r) + "\n")
+
+
+def test_pages_without_a_limit_return_everything(tmp_path):
+    log = tmp_path / "qa.jsonl"
+    write_log(log, [record(i) for i in range(7)])
+    store = QAStore(log)
+    total, records = store.query()
+    assert total == 7 and [r["response"] for r in records] == [f"Answer {i}" for i in range(7)]
+    total, records = store.query(offset=5, limit=10)
+    assert total == 7 and [r["response"] for r in records] == ["Answer 5", "Answer 6"]
+    assert store.query(offset=2, limit=0) == (7, [])
+
+
+def test_filters_combine_and_count_every_match(tmp_path):
+    log = tmp_path / "qa.jsonl"
+    write_log(log, [record(i, session="a" if i % 2 else "b") for i in range(10)]
+              + [record(20, question="  what are your SKILLS? ")])
+    store = QAStore(log)
+    total, page = store.query(session="a", offset=1, limit=2)
+    assert total == 5 and [r["response"] for r in page] == ["Answer 3", "Answer 5"]
+    total, page = store.query(question="What are your skills?")
+    assert total == 1 and page[0]["response"] == "Answer 20"
+    total, _ = store.query(since="2026-01-03T00:00:00", until=to_epoch("2026-01-05T23:00:00"))
+    assert total == 3
+
+
+def test_index_is_extended_incrementally_and_reused(tmp_path):
+    log = tmp_path / "qa.jsonl"
+    write_log(log, [record(i) for i in range(3)])
+    store = QAStore(log)
+    assert store.refresh() == 3 and store.refresh() == 0
+    with open(log, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record(3)) + "\n" + "not json\n" + '{"partial": ')
+    assert store.refresh() == 1  # bad line skipped, unfinished line left for later
+    with open(log, "a", encoding="utf-8") as f:
+        f.write('1}\n')
+    assert store.refresh() == 1
+    # A second store (another process) picks the index up from its header
+    other = QAStore(log)
+    assert other.refresh() == 0 and other.count == 5
+
+
+def test_replaced_log_rebuilds_with_a_new_generation(tmp_path):
+    log = tmp_path / "qa.jsonl"
+    write_log(log, [record(i) for i in range(5)])
+    store = QAStore(log)
+    store.refresh()
+    generation = store.generation
+    write_log(log, [record(9)], mode="w")
+    total, records = store.query()
+    assert total == 1 and records[0]["response"] == "Answer 9"
+    assert store.generation != generation
+
+
+def test_same_size_replacement_is_detected(tmp_path):
+    log = tmp_path / "qa.jsonl"
+    write_log(log, [record(1)])
+    store = QAStore(log)
+    assert store.query()[1][0]["response"] == "Answer 1"
+    write_log(log, [record(2)], mode="w")  # same length, different content
+    os.utime(log, ns=(1, 1))
+    assert store.query()[1][0]["response"] == "Answer 2"
+
+
+def test_replacement_sharing_the_first_bytes_is_detected(tmp_path):
+    log = tmp_path / "qa.jsonl"
+    head = [record(i, question="x" * 300) for i in range(20)]
+    write_log(log, head + [record(1)])
+    store = QAStore(log)
+    store.refresh()
+    write_log(log, head + [record(2), record(3)], mode="w")
+    total, records = store.query()
+    assert total == 22 and [r["response"] for r in records[-2:]] == ["Answer 2", "Answer 3"]
+
+
+def test_keyed_filters_read_only_their_entries(tmp_path, monkeypatch):
+    log = tmp_path / "qa.jsonl"
+    write_log(log, [record(i, session=f"s{i % 50}") for i in range(500)])
+    store = QAStore(log)
+    store.query(session="s0")  # posting lists built once
+    scans = []
+    scan = store._scan
+    monkeypatch.setattr(store, "_scan", lambda start=0: scans.append(start) or scan(start))
+    read = []
+    entries_at = store._entries_at
+    monkeypatch.setattr(store, "_entries_at", lambda positions: read.append(len(positions)) or entries_at(positions))
+    total, page = store.query(session="s7", question="Question 57?")
+    assert total == 1 and page[0]["response"] == "Answer 57"
+    assert read == [1]  # the question's list is the shorter one
+    write_log(log, [record(1000, session="s7")])
+    assert store.query(session="s7")[0] == 11
+    assert scans == [500, 500]  # only appended entries are added to the lists
+
+
+def test_corrupt_index_is_discarded(tmp_path):
+    log = tmp_path / "qa.jsonl"
+    write_log(log, [record(i) for i in range(2)])
+    QAStore(log).refresh()
+    (tmp_path / "qa.jsonl.idx").write_bytes(b"garbage" * 20)
+    assert QAStore(log).query()[0] == 2
+    assert len((tmp_path / "qa.jsonl.idx").read_bytes()) >= HEADER.size
+
+
+def test_concurrent_refreshes_index_each_record_once(tmp_path):
+    log = tmp_path / "qa.jsonl"
+    stores = [QAStore(log) for _ in range(4)]
+
+    def work(n: int):
+        for i in range(25):
+            write_log(log, [record(n * 100 + i)])
+            stores[n].refresh()
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    total, records = QAStore(log).query()
+    assert total == 100
+    assert len({r["response"] for r in records}) == 100
+
+
+def test_key_helpers():
+    assert normalize_question("  What  IS\nthis ") == "what is this"
+    assert key_hash("a") != key_hash("b") and len(key_hash("a")) == 8
+    assert to_epoch(None) is None and to_epoch("not a date") is None and to_epoch(5) == 5.0
+
+
+def test_get_prepared_answers_returns_all_by_default(tmp_path, monkeypatch):
+    log = tmp_path / "qa.jsonl"
+    write_log(log, [record(i) for i in range(60)])
+    monkeypatch.setattr(interview_tools, "DEFAULT_QA_PATH", log)
+    result = asyncio.run(interview_tools.get_prepared_answers({}))
+    assert result["total_answers"] == 60 and len(result["prepared_answers"]) == 60
+    page = asyncio.run(interview_tools.get_prepared_answers({}, offset=50, limit=5))
+    assert [a["answer"] for a in page["prepared_answers"]] == [f"Answer {i}" for i in range(50, 55)]
@@ -0,0 +1,53 @@
+from tools.search_index import PortfolioIndex, build_index, tokenize
+
+PROFILE = {
+    "star_items": [
+        {
+            "title": "Accessible Portfolio",
+            "situation": "The site failed WCAG audits",
+            "task": "Make the Next.js portfolio accessible",
+            "action": "Added ARIA labels and keyboard navigation",
+            "result": "Lighthouse accessibility score reached 100"
+        },
+        {
+            "title": "Chat Backend",
+            "situation": "Recruiters wanted quick answers",
+            "task": "Build a chat API in Python",
+            "action": "Wrote a FastAPI service backed by Redis",
+            "result": "Answers in under a second"
+        },
+    ]
+}
+
+
+def test_tokenize_keeps_dotted_and_suffixed_names():
+    assert tokenize("Built with Next.js, Node.js and C#!") == ["built", "with", "next.js", "node.js", "and", "c#"]
+    assert tokenize("") == []
+
+
+def test_postings_count_term_frequency_per_field():
+    index = PortfolioIndex(PROFILE)
+    assert len(index) == 2
+    assert index.postings["accessible"] == {0: {"title": 1, "task": 1}}
+    assert index.postings["python"] == {1: {"task": 1}}
+
+
+def test_docs_for_can_restrict_fields():
+    index = PortfolioIndex(PROFILE)
+    assert index.docs_for("accessible") == {0}
+    assert index.docs_for("accessible", fields=["action"]) == set()
+    assert index.docs_for("missing") == set()
+
+
+def test_star_view_is_a_copy():
+    index = PortfolioIndex(PROFILE)
+    view = index.star_view(0)
+    view["title"] = "changed"
+    assert index.star_view(0)["title"] == "Accessible Portfolio"
+
+
+def test_build_index_keeps_its_source():
+    profile = {"star_items": list(PROFILE["star_items"])}
+    index = build_index(profile)
+    assert index.source is profile
+    assert build_index(profile) is not index
@@ -0,0 +1,114 @@
+import asyncio
+
+from tools.history_store import InMemoryHistoryStore, SessionHistoryCache
+
+
+def turn(i: int) -> list:
+    return [{"role": "user", "content": f"q{i}"}, {"role": "assistant", "content": f"a{i}"}]
+
+
+class FailingStore(InMemoryHistoryStore):
+    """Fails every pipeline that writes, so flushed messages stay pending"""
+
+    def __init__(self):
+        super().__init__()
+        self.fail_writes = True
+
+    def pipeline(self, commands):
+        if self.fail_writes and any(c[0] == "LPUSH" for c in commands):
+            raise RuntimeError("redis down")
+        return super().pipeline(commands)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_repeat_loads_are_served_from_memory():
+    async def scenario():
+        store = InMemoryHistoryStore()
+        store.append("k", turn(0))
+        cache = SessionHistoryCache(store, max_history=10)
+        assert await cache.load("k") == turn(0)
+        await cache.append("k", turn(1))
+        assert await cache.load("k") == turn(0) + turn(1)
+        return store, cache
+
+    store, cache = run(scenario())
+    assert (cache.hits, cache.misses) == (1, 1)
+    # Nothing was written yet: the turn waits for a flush
+    assert store.load("k", 10) == turn(0)
+
+
+def test_flush_coalesces_sessions_into_one_request():
+    async def scenario():
+        store = InMemoryHistoryStore()
+        cache = SessionHistoryCache(store, max_history=4, ttl=60)
+        for key in ("a", "b"):
+            await cache.append(key, turn(0))
+            await cache.append(key, turn(1))
+        before = store.round_trips
+        await cache.flush()
+        return store, before
+
+    store, before = run(scenario())
+    assert store.round_trips == before + 1
+    assert store.load("a", 10) == turn(0) + turn(1)
+    assert "a" in store.expires
+
+
+def test_history_is_trimmed_in_memory_and_in_redis():
+    async def scenario():
+        store = InMemoryHistoryStore()
+        cache = SessionHistoryCache(store, max_history=4)
+        for i in range(3):
+            await cache.append("k", turn(i))
+        await cache.flush()
+        return store, await cache.load("k")
+
+    store, history = run(scenario())
+    assert history == turn(1) + turn(2)
+    assert store.load("k", 10) == turn(1) + turn(2)
+
+
+def test_reloading_an_evicted_session_sees_its_unflushed_turns():
+    async def scenario():
+        store = InMemoryHistoryStore()
+        cache = SessionHistoryCache(store, max_history=10, max_sessions=1)
+        await cache.append("a", turn(0))
+        await cache.load("b")  # evicts "a" with its turn still pending
+        return await cache.load("a")
+
+    assert run(scenario()) == turn(0)
+
+
+def test_evicted_turns_survive_a_failed_flush():
+    async def scenario():
+        store = FailingStore()
+        cache = SessionHistoryCache(store, max_history=10, max_sessions=1)
+        await cache.append("a", turn(0))
+        await cache.load("b")
+        history = await cache.load("a")  # flush fails; the turn is adopted back
+        store.fail_writes = False
+        await cache.load("b")
+        await cache.flush()
+        return store, cache, history
+
+    store, cache, history = run(scenario())
+    assert history == turn(0)
+    assert cache.flush_errors == 1
+    assert store.load("a", 10) == turn(0)
+
+
+def test_stop_flushes_everything_pending():
+    async def scenario():
+        store = InMemoryHistoryStore()
+        cache = SessionHistoryCache(store, max_history=10, flush_interval=60)
+        cache.start()
+        await cache.append("k", turn(0))
+        await cache.stop()
+        return store, cache
+
+    store, cache = run(scenario())
+    assert store.load("k", 10) == turn(0)
+    assert cache.stats()["pending_messages"] == 0
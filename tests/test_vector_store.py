@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from tools import vector_store  # noqa: E402
+from tools.vector_store import LocalVectorStore, get_local_store  # noqa: E402
+
+
+def make_store(model="m"):
+    return LocalVectorStore.build(
+        ["a", "b", "c"],
+        [[1.0, 0.0], [0.0, 2.0], [1.0, 1.0]],
+        [{"n": 1}, {"n": 2}, {"n": 3}],
+        model=model
+    )
+
+
+def test_rows_are_normalized_and_query_ranks_by_cosine():
+    store = make_store()
+    assert np.allclose(np.linalg.norm(store.matrix, axis=1), 1.0)
+    hits = store.query([0.0, 5.0], top_k=2)
+    assert [h["id"] for h in hits] == ["b", "c"]
+    assert hits[0]["score"] == pytest.approx(1.0)
+    assert hits[0]["metadata"] == {"n": 2}
+
+
+def test_query_checks_dimension():
+    with pytest.raises(ValueError):
+        make_store().query([1.0, 0.0, 0.0])
+
+
+def test_empty_store_builds_saves_and_queries(tmp_path):
+    store = LocalVectorStore.build([], [], [], model="m")
+    assert len(store) == 0
+    assert store.query([1.0, 2.0]) == []
+    store.save(tmp_path / "empty")
+    assert len(LocalVectorStore.load(tmp_path / "empty")) == 0
+
+
+def test_save_names_its_matrix_and_prunes_old_versions(tmp_path):
+    prefix = tmp_path / "portfolio"
+    for _ in range(3):
+        make_store().save(prefix)
+    sidecar = json.loads((tmp_path / "portfolio.json").read_text())
+    matrices = sorted(p.name for p in tmp_path.glob("portfolio.*.npy"))
+    # The current matrix plus the previous one for readers mid-swap
+    assert len(matrices) == 2
+    assert sidecar["matrix"] in matrices
+    loaded = LocalVectorStore.load(prefix)
+    assert loaded.ids == ["a", "b", "c"]
+    assert loaded.query([1.0, 0.0], top_k=1)[0]["id"] == "a"
+
+
+def test_loads_stores_written_before_versioned_matrices(tmp_path):
+    store = make_store()
+    np.save(tmp_path / "old.npy", store.matrix)
+    (tmp_path / "old.json").write_text(json.dumps({"model": "m", "dim": 2, "ids": store.ids, "metadata": store.metadata}))
+    assert LocalVectorStore.load(tmp_path / "old").ids == ["a", "b", "c"]
+
+
+def test_get_local_store_reloads_after_rewrite(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_store, "_LOADED", None)
+    prefix = tmp_path / "portfolio"
+    make_store().save(prefix)
+    first = get_local_store(prefix)
+    assert get_local_store(prefix) is first
+    LocalVectorStore.build(["z"], [[0.0, 1.0]], [{}]).save(prefix)
+    assert get_local_store(prefix).ids == ["z"]